@@ -60,6 +60,15 @@ def build_alerts_bell(page: ft.Page, modal) -> ft.Control:
     # Atualiza badge na criação
     refresh_badge()
 
+    # Recalcula quando licitações/certidões mudam (services/events.py),
+    # inclusive gravações de jobs em segundo plano
+    try:
+        from services import events  # type: ignore
+        for tb in ("licitacoes", "certidoes"):
+            events.subscribe(tb, lambda _ev: refresh_badge(), key=("alerts_bell", tb, id(page)))
+    except Exception:
+        pass
+
     # Expor método para uso externo (ex.: ao trocar de página)
     setattr(bell_stack, "refresh_badge", refresh_badge)
 
@@ -1,6 +1,11 @@
 from __future__ import annotations
 import flet as ft
 
+try:
+    from services import events as _events
+except Exception:
+    _events = None
+
 class SimpleTable:
     """
     Tabela simples e estável para Flet 0.28.3.
@@ -33,6 +38,54 @@ class SimpleTable:
         self._selected_ids = {rid for rid in self._selected_ids if rid in alive}
         self._refresh()
 
+    def upsert_rows(self, rows: list[dict], new_on_top: bool = False):
+        """
+        Atualiza/insere só as linhas informadas (casadas por "id"), sem
+        reconstruir a tabela inteira. Linhas novas vão para o fim (ou topo).
+        """
+        if not rows:
+            return
+        pos = {r.get("id"): i for i, r in enumerate(self._rows_data)}
+        novos = []
+        for r in rows:
+            i = pos.get(r.get("id"))
+            if i is None:
+                novos.append(r)
+                continue
+            self._rows_data[i] = r
+            if self._dt and i < len(self._dt.rows):
+                self._dt.rows[i] = self._make_row(r, i % 2 == 1)
+        if novos:
+            if new_on_top:
+                self._rows_data[0:0] = novos
+                if self._dt:
+                    self._dt.rows[0:0] = [self._make_row(r, False) for r in novos]
+            else:
+                start = len(self._rows_data)
+                self._rows_data.extend(novos)
+                if self._dt:
+                    self._dt.rows.extend(self._make_row(r, False) for r in novos)
+            self._restripe(0 if new_on_top else start)
+        self._push()
+
+    def remove_rows(self, ids):
+        """Remove as linhas com esses IDs (e tira da seleção)."""
+        drop = set(ids or [])
+        drop |= {str(i) for i in drop}
+        if not drop:
+            return
+        keep_idx = [i for i, r in enumerate(self._rows_data)
+                    if r.get("id") not in drop and str(r.get("id")) not in drop]
+        if len(keep_idx) == len(self._rows_data):
+            return
+        first = next((i for i, k in enumerate(keep_idx) if i != k), len(keep_idx))
+        self._rows_data = [self._rows_data[i] for i in keep_idx]
+        if self._dt:
+            self._dt.rows = [self._dt.rows[i] for i in keep_idx if i < len(self._dt.rows)]
+        self._selected_ids = {rid for rid in self._selected_ids if rid not in drop and str(rid) not in drop}
+        self._restripe(first)
+        self._push()
+
     def selected_ids(self) -> list:
         return list(self._selected_ids)
 
@@ -81,31 +134,39 @@ class SimpleTable:
         )
         self._refresh()
 
-    def _refresh(self):
-        if not self._dt:
+    def _zebra_color(self, alt: bool):
+        return ft.Colors.with_opacity(0.03, ft.Colors.ON_SURFACE) if (self.zebra and alt) else None
+
+    def _make_row(self, r: dict, alt: bool) -> ft.DataRow:
+        rid = r.get("id")
+        cb = ft.Checkbox(value=(rid in self._selected_ids))
+        cb.on_change = self._mk_row_toggle(rid)
+
+        cells = []
+        if self.include_master:
+            cells.append(ft.DataCell(cb))
+        for h in self.headers:
+            cells.append(ft.DataCell(ft.Text(str(r.get(h, "")))))
+        return ft.DataRow(cells=cells, color=self._zebra_color(alt))
+
+    def _restripe(self, start: int = 0):
+        # só recolore a partir de `start` (inserção/remoção desloca a zebra)
+        if not (self._dt and self.zebra):
             return
-        rows = []
-        alt = False
-        for r in self._rows_data:
-            rid = r.get("id")
-            cb = ft.Checkbox(value=(rid in self._selected_ids))
-            cb.on_change = self._mk_row_toggle(rid)
-
-            cells = []
-            if self.include_master:
-                cells.append(ft.DataCell(cb))
-            for h in self.headers:
-                cells.append(ft.DataCell(ft.Text(str(r.get(h, "")))))
-
-            color = ft.Colors.with_opacity(0.03, ft.Colors.ON_SURFACE) if (self.zebra and alt) else None
-            alt = not alt
-            rows.append(ft.DataRow(cells=cells, color=color))
-
-        self._dt.rows = rows
+        for i in range(max(0, start), len(self._dt.rows)):
+            self._dt.rows[i].color = self._zebra_color(i % 2 == 1)
+
+    def _push(self):
         try: self._dt.update()
         except Exception: pass
         self._update_master_cb()
 
+    def _refresh(self):
+        if not self._dt:
+            return
+        self._dt.rows = [self._make_row(r, i % 2 == 1) for i, r in enumerate(self._rows_data)]
+        self._push()
+
     def _mk_row_toggle(self, rid):
         def _h(e):
             if rid is None:
@@ -139,3 +200,39 @@ class SimpleTable:
             self._master_cb.value = want
             try: self._master_cb.update()
             except Exception: pass
+
+
+def bind_live(tbl: SimpleTable, table: str, fetch, adapt, reload, key, new_on_top: bool = False, after=None) -> bool:
+    """
+    Liga a tabela aos eventos de alteração de `table` (services/events.py):
+      - delete        -> remove_rows(ids)
+      - insert/update -> fetch(ids) com os filtros da tela; adapta e faz upsert_rows;
+                         IDs que não voltam (não passam mais no filtro) saem da tabela
+      - reload        -> reload()
+    `after()` roda depois de cada delta (ex.: atualizar contador).
+    Retorna False se o barramento não está disponível (a tela segue com load()).
+    """
+    if _events is None:
+        return False
+
+    def _on(ev):
+        try:
+            if ev.op == _events.DELETE and ev.ids:
+                tbl.remove_rows(ev.ids)
+            elif ev.op in (_events.INSERT, _events.UPDATE) and ev.ids:
+                rows = fetch(list(ev.ids)) or []
+                adapted = [adapt(r) for r in rows]
+                tbl.upsert_rows(adapted, new_on_top=new_on_top)
+                vistos = {a.get("id") for a in adapted}
+                tbl.remove_rows([i for i in ev.ids if i not in vistos])
+            else:
+                reload()
+                return
+            if after:
+                after()
+        except Exception:
+            try: reload()
+            except Exception: pass
+
+    _events.subscribe(table, _on, key=key)
+    return True
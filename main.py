@@ -1,3 +1,5 @@
+import os
+
 import flet as ft
 
 # -------------------------------------------------
@@ -68,6 +70,20 @@ except Exception:
             page.update()
         return type("AlertsModalStub", (), {"open": open_modal})()
 
+# -------------------------------------------------
+# Backup diário do data.db (SOS_BACKUP_AT="HH:MM", padrão 12:30; "off" desliga)
+# -------------------------------------------------
+def _start_backup_job():
+    at = (os.getenv("SOS_BACKUP_AT") or "12:30").strip().lower()
+    if at in ("", "0", "off", "no", "false"):
+        return
+    try:
+        from services import backup
+        hour, _, minute = at.partition(":")
+        backup.start_daily_job(hour=int(hour), minute=int(minute or 0))
+    except Exception:
+        pass
+
 # -------------------------------------------------
 # APP
 # -------------------------------------------------
@@ -84,6 +100,8 @@ def main(page: ft.Page):
         except Exception:
             pass
 
+    _start_backup_job()
+
     # Estado
     sidebar_expanded = True
     alerts_modal = build_alerts_modal(page)
@@ -10,6 +10,11 @@ except Exception:
     def export_csv(*a, **k): return False
     def export_xlsx(*a, **k): return False
 
+try:
+    from services.imports import import_banco_precos
+except Exception:
+    import_banco_precos = None
+
 try:
     from services import db
 except Exception:
@@ -22,6 +27,16 @@ except Exception:
     class SimpleTable(ft.UserControl):
         def build(self): return ft.Container(ft.Text("Tabela indisponível"))
 
+try:
+    from services import adb  # consultas fora da thread da UI
+except Exception:
+    adb = None
+
+try:
+    from components.tableview import bind_live
+except Exception:
+    def bind_live(*a, **k): return False
+
 try:
     from components.forms import FieldRow, snack_ok, snack_err, text_input, date_input, money_input
 except Exception:
@@ -153,43 +168,78 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
 
     lbl_count = ft.Text("", size=12)
 
+    def _filtros() -> dict:
+        return {"categoria": dd_categoria.value, "tipo_origem": dd_tipo.value}
+
+    def adapt(r) -> dict:
+        pr = r.get("preco")
+        if isinstance(pr, (int, float)):
+            pr_fmt = f"R$ {pr:,.2f}".replace(",", "X").replace(".", ",").replace("X",".")
+        elif pr:
+            pr_fmt = str(pr)
+        else:
+            pr_fmt = ""
+        return {
+            "id": r.get("id"),
+            "ID": r.get("id"),
+            "Produto": r.get("produto") or "",
+            "Categoria": r.get("categoria") or "",
+            "Tipo": r.get("tipo_origem") or "",
+            "Origem": r.get("origem_nome") or "",
+            "Marca": r.get("marca") or "",
+            "Unidade": r.get("unidade") or "",
+            "Embalagem": r.get("embalagem") or "",
+            "Preço": pr_fmt,
+            "Data": r.get("data_coleta") or "",
+            "Link": r.get("link") or "",
+            "Observações": r.get("observacoes") or "",
+        }
+
     def load():
+        filtros = _filtros()
+        q = (txt_busca.value or "").strip()
         try:
-            rows_src = db.list_banco_precos({
-                "categoria": dd_categoria.value,
-                "tipo_origem": dd_tipo.value,
-                "q": txt_busca.value,
-            }) or []
+            if q and hasattr(db, "search_banco_precos"):
+                # FTS5 + BM25: mais relevantes primeiro, sem acento, por prefixo
+                rows_src = db.search_banco_precos(q, filtros) or []
+            else:
+                rows_src = db.list_banco_precos({**filtros, "q": q}) or []
         except Exception:
             rows_src = []
-        rows = []
-        for r in rows_src:
-            pr = r.get("preco")
-            if isinstance(pr, (int, float)):
-                pr_fmt = f"R$ {pr:,.2f}".replace(",", "X").replace(".", ",").replace("X",".")
-            elif pr:
-                pr_fmt = str(pr)
-            else:
-                pr_fmt = ""
-            rows.append({
-                "id": r.get("id"),
-                "ID": r.get("id"),
-                "Produto": r.get("produto") or "",
-                "Categoria": r.get("categoria") or "",
-                "Tipo": r.get("tipo_origem") or "",
-                "Origem": r.get("origem_nome") or "",
-                "Marca": r.get("marca") or "",
-                "Unidade": r.get("unidade") or "",
-                "Embalagem": r.get("embalagem") or "",
-                "Preço": pr_fmt,
-                "Data": r.get("data_coleta") or "",
-                "Link": r.get("link") or "",
-                "Observações": r.get("observacoes") or "",
-            })
+        rows = [adapt(r) for r in rows_src]
         tbl.set_rows(rows)
         lbl_count.value = f"{len(rows)} registro(s)"
         page.update()
 
+    async def load_async(e=None):
+        # busca no executor do adb; a digitação nova substitui a consulta anterior
+        if adb is None:
+            return _load_and_count()
+        filtros = _filtros()
+        q = (txt_busca.value or "").strip()
+        fila = adb.latest(("banco_precos", id(page)))
+        try:
+            if q and hasattr(db, "search_banco_precos"):
+                rows_src = await fila.search_banco_precos(q, filtros) or []
+            else:
+                rows_src = await fila.list_banco_precos({**filtros, "q": q}) or []
+        except adb.Superseded:
+            return
+        except Exception:
+            rows_src = []
+        rows = [adapt(r) for r in rows_src]
+        tbl.set_rows(rows)
+        lbl_count.value = f"{len(rows)} registro(s)"
+        _update_count()
+
+    txt_busca.on_change = load_async
+    txt_busca.on_submit = load_async
+
+    def fetch_ids(ids):
+        # delta: mesmos filtros da tela, restritos aos IDs do evento
+        q = (txt_busca.value or "").strip()
+        return db.list_banco_precos({**_filtros(), "q": q, "ids": ids}) or []
+
     # formulário (igual)
     def _form(rec: dict | None = None) -> ft.Control:
         produto   = text_input("", "", width=420); produto.hint_text = "Ex.: Arroz tipo 1"
@@ -274,7 +324,8 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
                 return snack_err(page, "Informe o produto.")
             try:
                 db.add_banco_preco(data)
-                close(); snack_ok(page, "Registro criado."); load()
+                close(); snack_ok(page, "Registro criado.")
+                if not live: load()
             except Exception as ex:
                 close(); snack_err(page, f"Erro ao salvar: {ex}")
         _dialog(page, "➕ Novo preço", frm, save)
@@ -294,7 +345,8 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
                 return snack_err(page, "Informe o produto.")
             try:
                 db.upd_banco_preco(rid, data)
-                close(); snack_ok(page, "Registro atualizado."); load()
+                close(); snack_ok(page, "Registro atualizado.")
+                if not live: load()
             except Exception as ex:
                 close(); snack_err(page, f"Erro: {ex}")
         _dialog(page, "✏️ Editar preço", frm, save)
@@ -310,7 +362,8 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
                     db.del_banco_preco(_id); ok += 1
                 except Exception:
                     fail += 1
-            snack_ok(page, f"Excluídos: {ok} • Falhas: {fail}"); load()
+            snack_ok(page, f"Excluídos: {ok} • Falhas: {fail}")
+            if not live: load()
         _confirm_dialog(page, "Excluir preços", f"Confirmar exclusão de {len(ids)} registro(s)?", do_confirm)
 
     # ---------- Calculadora ----------
@@ -384,6 +437,40 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
         fp.on_result = _save
         fp.save_file(file_name="banco_precos.xlsx")
 
+    # ---------- Import (prévia + gravação em lote) ----------
+    def _import_file(_=None):
+        if import_banco_precos is None:
+            return snack_err(page, "Importação indisponível neste ambiente.")
+        def _picked(e: ft.FilePickerResultEvent):
+            if not e.files: return
+            path = e.files[0].path
+            try:
+                prev = import_banco_precos(path, dry_run=True)
+            except Exception as ex:
+                return snack_err(page, f"Falha ao ler arquivo: {ex}")
+            chk_upsert = ft.Checkbox(label="Atualizar existentes (produto + origem + data)", value=True)
+            linhas = [
+                ft.Text(f"Linhas lidas: {prev['total']} • válidas: {prev['valid']} • com erro: {prev['invalid']}"),
+                chk_upsert,
+            ]
+            for r in prev["preview"][:5]:
+                linhas.append(ft.Text(f"• {r.get('produto')} — {r.get('origem_nome') or '-'} — {r.get('preco')} — {r.get('data_coleta') or '-'}", size=12))
+            for ln, msg in prev["errors"][:8]:
+                linhas.append(ft.Text(f"Linha {ln}: {msg}", size=12, color=ft.Colors.RED_400))
+            frm = ft.Container(width=560, content=ft.Column(tight=True, spacing=6, scroll=ft.ScrollMode.AUTO, controls=linhas))
+            def save(close):
+                if not prev["valid"]:
+                    close(); return snack_err(page, "Nenhuma linha válida para importar.")
+                try:
+                    res = import_banco_precos(path, upsert=bool(chk_upsert.value))
+                    close(); snack_ok(page, f"Importados: {res['inserted']} • atualizados: {res['updated']} • ignorados: {res['invalid']}")
+                    if not live: _load_and_count()
+                except Exception as ex:
+                    close(); snack_err(page, f"Erro na importação: {ex}")
+            _dialog(page, "📥 Importar planilha — prévia", frm, save)
+        fp.on_result = _picked
+        fp.pick_files(allow_multiple=False, allowed_extensions=["csv", "xlsx"])
+
     # ====== TOPO COM DUAS LINHAS COMPACTAS ======
     # Linha 1: Filtros + Filtrar/Limpar (NÃO QUEBRA; scroll horizontal se precisar)
     filtros_row = ft.Row(
@@ -393,7 +480,7 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
             FieldRow("Categoria", dd_categoria, 260),
             FieldRow("Tipo", dd_tipo, 180),
             FieldRow("Buscar", txt_busca, 260),
-            ft.OutlinedButton("Filtrar", on_click=lambda e: load(), style=BTN_COMPACT),
+            ft.OutlinedButton("Filtrar", on_click=load_async, style=BTN_COMPACT),
             ft.OutlinedButton(
                 "Limpar",
                 on_click=lambda e: (
@@ -418,6 +505,7 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
             ft.OutlinedButton("Calculadora de Margens", on_click=open_calc, style=BTN_COMPACT),
             ft.OutlinedButton("Exportar CSV", on_click=_export_left_csv, style=BTN_COMPACT),
             ft.OutlinedButton("Exportar Excel", on_click=_export_left_xlsx, style=BTN_COMPACT),
+            ft.OutlinedButton("Importar planilha", on_click=_import_file, style=BTN_COMPACT),
         ],
     )
 
@@ -483,9 +571,18 @@ def page_banco_precos(page: ft.Page) -> ft.Control:
     page.on_resized = _on_resized
     _on_resized(None)
 
-    def _load_and_count():
-        load()
+    def _update_count():
         set_count(f"{len(tbl._rows_data)} registro(s)")
         page.update()
+
+    def _load_and_count():
+        load()
+        _update_count()
+
+    live = bind_live(
+        tbl, "banco_precos", fetch=fetch_ids, adapt=adapt,
+        reload=_load_and_count, after=_update_count,
+        key=("banco_precos", id(page)), new_on_top=True,
+    )
     _load_and_count()
     return layout
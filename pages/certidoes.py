@@ -18,6 +18,11 @@ except Exception:
     class SimpleTable(ft.UserControl):
         def build(self): return ft.Container(ft.Text("Tabela indisponível"))
 
+try:
+    from components.tableview import bind_live
+except Exception:
+    def bind_live(*a, **k): return False
+
 try:
     from components.forms import FieldRow, snack_ok, snack_err, text_input, date_input
 except Exception:
@@ -205,52 +210,63 @@ def page_certidoes(page: ft.Page) -> ft.Control:
     lbl_count = ft.Text("", size=12)
     row_extras: dict[int, dict] = {}
 
-    def load():
-        row_extras.clear()
+    def _filtros() -> dict:
         try:
             emp_id = int(f_empresa.value) if (f_empresa.value not in ("", None)) else None
         except Exception:
             emp_id = None
-
-        rows_src = db.list_certidoes({
+        return {
             "empresa_id": emp_id,
             "situacao": f_situacao.value,
             "tipo": (f_tipo.value or "").strip() or "Todos",
             "q": (f_busca.value or "").strip(),
-        }) or []
-
-        rows = []
-        for r in rows_src:
-            cid   = int(r.get("id"))
-            link  = (r.get("link_consulta") or "").strip()
-            arq   = (r.get("arquivo") or "").strip()
-            pdf_norm = _to_assets_rel(arq)
-
-            emissao   = r.get("dt_emissao") or ""
-            validade  = r.get("dt_validade") or ""
-            situ_base = r.get("situacao") or ""
-            sit_col   = _situation_badge(validade, situ_base)
-
-            row_extras[cid] = {"link": link, "pdf": pdf_norm, "validade": validade}
-            rows.append({
-                "id": cid,
-                "ID": cid,
-                "Empresa": r.get("empresa") or "",
-                "Tipo": r.get("tipo") or "",
-                "Órgão": r.get("orgao_emissor") or "",
-                "Situação": sit_col,
-                "Número": r.get("numero") or "",
-                "Emissão": emissao,
-                "Validade": validade,
-                "Verificação": "🔗" if link else "",
-                "PDF": "📄" if bool(pdf_norm) else "",
-                "Observações": r.get("observacoes") or "",
-            })
-
-        tbl.set_rows(rows)
-        lbl_count.value = f"{len(rows)} registro(s)"
+        }
+
+    def adapt(r) -> dict:
+        cid   = int(r.get("id"))
+        link  = (r.get("link_consulta") or "").strip()
+        arq   = (r.get("arquivo") or "").strip()
+        pdf_norm = _to_assets_rel(arq)
+
+        emissao   = r.get("dt_emissao") or ""
+        validade  = r.get("dt_validade") or ""
+        situ_base = r.get("situacao") or ""
+        sit_col   = _situation_badge(validade, situ_base)
+
+        row_extras[cid] = {"link": link, "pdf": pdf_norm, "validade": validade}
+        return {
+            "id": cid,
+            "ID": cid,
+            "Empresa": r.get("empresa") or "",
+            "Tipo": r.get("tipo") or "",
+            "Órgão": r.get("orgao_emissor") or "",
+            "Situação": sit_col,
+            "Número": r.get("numero") or "",
+            "Emissão": emissao,
+            "Validade": validade,
+            "Verificação": "🔗" if link else "",
+            "PDF": "📄" if bool(pdf_norm) else "",
+            "Observações": r.get("observacoes") or "",
+        }
+
+    def update_count():
+        lbl_count.value = f"{len(tbl._rows_data)} registro(s)"
         page.update()
 
+    def load():
+        row_extras.clear()
+        rows_src = db.list_certidoes(_filtros()) or []
+        tbl.set_rows([adapt(r) for r in rows_src])
+        update_count()
+
+    # delta por evento (services/events.py): só as linhas alteradas
+    live = bind_live(
+        tbl, "certidoes",
+        fetch=lambda ids: db.list_certidoes({**_filtros(), "ids": ids}),
+        adapt=adapt, reload=load, after=update_count,
+        key=("certidoes", id(page)), new_on_top=True,
+    )
+
     # ---------- FilePickers ----------
     file_picker = ft.FilePicker()    # anexar
     save_picker = ft.FilePicker()    # salvar/baixar
@@ -467,7 +483,8 @@ def page_certidoes(page: ft.Page) -> ft.Control:
             if data["link_consulta"]:
                 data["link_consulta"] = _normalize_url(data["link_consulta"])
             try:
-                db.add_certidao(data); close(); _notify_ok("Certidão criada."); load()
+                db.add_certidao(data); close(); _notify_ok("Certidão criada.")
+                if not live: load()
             except Exception as ex:
                 close(); _notify_err(f"Erro ao salvar: {ex}")
         _dialog("➕ Nova certidão", frm, save)
@@ -486,7 +503,8 @@ def page_certidoes(page: ft.Page) -> ft.Control:
             if data["link_consulta"]:
                 data["link_consulta"] = _normalize_url(data["link_consulta"])
             try:
-                db.upd_certidao(rid, data); close(); _notify_ok("Certidão atualizada."); load()
+                db.upd_certidao(rid, data); close(); _notify_ok("Certidão atualizada.")
+                if not live: load()
             except Exception as ex:
                 close(); _notify_err(f"Erro: {ex}")
         _dialog("✏️ Editar certidão", frm, save)
@@ -512,7 +530,7 @@ def page_certidoes(page: ft.Page) -> ft.Control:
                 except Exception:
                     fail += 1
             _notify_ok(f"Excluídos: {okc} • PDFs removidos: {pdfc} • Falhas: {fail}")
-            load()
+            if not live: load()
         _confirm("Excluir certidões", msg, ok)
 
     # ---------- Resolver caminho local a partir do normalizado ----------
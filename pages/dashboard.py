@@ -47,6 +47,18 @@ def _safe_call(name: str, default):
     except Exception:
         return default
 
+def _safe_call_filtros(name: str, filtros: dict, default):
+    # list_* com filtros de período (consulta por índice); sem suporte, lista tudo
+    fn = getattr(db, name, None)
+    if not callable(fn):
+        return default
+    try:
+        return fn(filtros)
+    except TypeError:
+        return _safe_call(name, default)
+    except Exception:
+        return default
+
 def _count_try(list_names: list[str], count_names: list[str]) -> int:
     for nm in count_names:
         v = _safe_call(nm, None)
@@ -64,6 +76,17 @@ def _count_try(list_names: list[str], count_names: list[str]) -> int:
                 pass
     return 0
 
+def _kpis() -> dict | None:
+    # todos os contadores numa consulta (COUNT/SUM, cacheada no services.db)
+    fn = getattr(db, "kpis", None)
+    if not callable(fn):
+        return None
+    try:
+        k = fn(janelas=tuple(sorted(set(_LIC_THRESH.values()))), aviso_certidoes=_CER_THRESH["leve"])
+    except Exception:
+        return None
+    return k if isinstance(k, dict) and "licitacoes_futuras" in k else None
+
 def _join_text(*parts: str) -> str:
     parts = [p for p in parts if p and str(p).strip()]
     return " — ".join(parts) if parts else ""
@@ -133,7 +156,8 @@ def _info_box(title: str, message: str, surface, border, text_dim, min_h=_CARD_M
         ),
     )
 
-def _kpis_row(n_emp, n_cer, n_lic):
+def _kpis_row(n_emp, n_cer, n_lic, n_opo=None, notes: dict | None = None):
+    notes = notes or {}
     def _card_kpi(title, value, icon, bg, note: str | None = None):
         return ft.Container(
             expand=True, bgcolor=bg, border_radius=16, padding=16,
@@ -154,9 +178,10 @@ def _kpis_row(n_emp, n_cer, n_lic):
         spacing=12,
         controls=[
             _card_kpi("Empresas",      n_emp, ft.Icons.BUSINESS,     "#1565C0"),
-            _card_kpi("Certidões",     n_cer, ft.Icons.VERIFIED,     "#2E7D32"),
-            _card_kpi("Licitações",    n_lic, ft.Icons.DESCRIPTION,  "#4527A0"),
-            _card_kpi("Oportunidades", "—",   ft.Icons.WORK_HISTORY, "#EF6C00", note="Disp. na 1.0.1"),
+            _card_kpi("Certidões",     n_cer, ft.Icons.VERIFIED,     "#2E7D32", note=notes.get("certidoes")),
+            _card_kpi("Licitações",    n_lic, ft.Icons.DESCRIPTION,  "#4527A0", note=notes.get("licitacoes")),
+            (_card_kpi("Oportunidades", n_opo, ft.Icons.WORK_HISTORY, "#EF6C00") if n_opo is not None else
+             _card_kpi("Oportunidades", "—",   ft.Icons.WORK_HISTORY, "#EF6C00", note="Disp. na 1.0.1")),
         ],
     )
 
@@ -195,11 +220,13 @@ def _alertas_certidoes():
     prontos = _safe_call("certidoes_expirando", None)
     if isinstance(prontos, list) and prontos:
         return prontos
-    certs = (_safe_call("list_certidoes", []) or
-             _safe_call("certidoes_all", []) or
-             _safe_call("get_certidoes", []) or
-             [])
     hoje = _today()
+    ate = date.fromordinal(hoje.toordinal() + _CER_THRESH["leve"])
+    certs = _safe_call_filtros("list_certidoes", {"validade_ate": ate}, None)
+    if certs is None:
+        certs = (_safe_call("certidoes_all", []) or
+                 _safe_call("get_certidoes", []) or
+                 [])
     out = []
     for r in certs:
         validade = r.get("validade") or r.get("dt_validade") or r.get("vencimento") or ""
@@ -227,11 +254,13 @@ def _alertas_licitacoes():
     prontos = _safe_call("licitacoes_proximas", None)
     if isinstance(prontos, list) and prontos:
         return prontos
-    rows = (_safe_call("list_licitacoes", []) or
-            _safe_call("licitacoes_all", []) or
-            _safe_call("get_licitacoes", []) or
-            [])
     hoje = _today()
+    periodo = {"sessao_de": hoje, "sessao_ate": date.fromordinal(hoje.toordinal() + _LIC_THRESH["leve"])}
+    rows = _safe_call_filtros("list_licitacoes", periodo, None)
+    if rows is None:
+        rows = (_safe_call("licitacoes_all", []) or
+                _safe_call("get_licitacoes", []) or
+                [])
     out = []
     for r in rows:
         ds_raw = r.get("data_sessao") or r.get("data") or r.get("sessao_data")
@@ -261,18 +290,26 @@ def build(page: ft.Page) -> ft.Control:
     border = "#E0E0E0" if light else "#1E2A3B"
     text_dim = "#616161" if light else "#90A4AE"
 
-    n_emp = _count_try(
-        ["list_empresas", "empresas_all", "list_companies", "companies_all", "get_empresas"],
-        ["count_empresas", "empresas_count", "count_companies"]
-    )
-    n_cer = _count_try(
-        ["list_certidoes", "certidoes_all", "get_certidoes"],
-        ["count_certidoes", "certidoes_count"]
-    )
-    n_lic = _count_try(
-        ["list_licitacoes", "licitacoes_all", "get_licitacoes"],
-        ["count_licitacoes", "licitacoes_count"]
-    )
+    k = _kpis()
+    kpi_notes = {}
+    if k is not None:
+        n_emp, n_cer, n_lic, n_opo = k["empresas"], k["certidoes"], k["licitacoes"], k.get("oportunidades")
+        kpi_notes["certidoes"] = f"{k['certidoes_vencidas']} vencida(s) • {k['certidoes_vencendo']} vencendo"
+        kpi_notes["licitacoes"] = f"{k.get('licitacoes_%dd' % _LIC_THRESH['leve'], 0)} sessão(ões) em {_LIC_THRESH['leve']}d"
+    else:
+        n_opo = None
+        n_emp = _count_try(
+            ["list_empresas", "empresas_all", "list_companies", "companies_all", "get_empresas"],
+            ["count_empresas", "empresas_count", "count_companies"]
+        )
+        n_cer = _count_try(
+            ["list_certidoes", "certidoes_all", "get_certidoes"],
+            ["count_certidoes", "certidoes_count"]
+        )
+        n_lic = _count_try(
+            ["list_licitacoes", "licitacoes_all", "get_licitacoes"],
+            ["count_licitacoes", "licitacoes_count"]
+        )
 
     recentes_emp = _recentes_empresas()
     recentes_lic = _recentes_licitacoes(limit=12)
@@ -310,7 +347,7 @@ def build(page: ft.Page) -> ft.Control:
     if not lic_list_controls:
         lic_list_controls = [ft.Text("— nenhum alerta —", italic=True, color=text_dim)]
 
-    kpis = _kpis_row(n_emp, n_cer, n_lic)
+    kpis = _kpis_row(n_emp, n_cer, n_lic, n_opo, kpi_notes)
 
     # ESQUERDA: Empresas (em cima) + Oportunidades da semana (embaixo)
     left_grid = ft.Column(
@@ -57,6 +57,11 @@ except Exception:
                 ),
             )
 
+try:
+    from components.tableview import bind_live
+except Exception:
+    def bind_live(*a, **k): return False
+
 try:
     from components.forms import (
         FieldRow, snack_ok, snack_err, text_input, email_input, phone_input, cep_input, uf_input
@@ -517,6 +522,22 @@ def page_empresas(page: ft.Page) -> ft.Control:
 
     rows_cache: list[dict] = []  # cache do último load
 
+    def adapt(r) -> dict:
+        return {
+            "id": _get(r, "id"),
+            "ID": _get(r, "id", ""),
+            "Nome": _name_from(r),
+            "CNPJ": _val(r, "cnpj"),
+            "Telefone": _telefone_from(r),
+            "E-mail": _val(r, "email"),
+            "Cidade": _cidade_from(r),
+            "UF": _uf_from(r),
+        }
+
+    def update_count():
+        lbl_count.value = f"{len(tbl._rows_data)} registro(s)."
+        page.update()
+
     # carregar
     def load():
         nonlocal rows_cache
@@ -531,21 +552,21 @@ def page_empresas(page: ft.Page) -> ft.Control:
             except Exception:
                 rows = []
         rows_cache = rows[:]  # mantém bruto para ver mais / credenciais
-        adapted = []
-        for r in rows:
-            adapted.append({
-                "id": _get(r, "id"),
-                "ID": _get(r, "id", ""),
-                "Nome": _name_from(r),
-                "CNPJ": _val(r, "cnpj"),
-                "Telefone": _telefone_from(r),
-                "E-mail": _val(r, "email"),
-                "Cidade": _cidade_from(r),
-                "UF": _uf_from(r),
-            })
-        tbl.set_rows(adapted)
-        lbl_count.value = f"{len(adapted)} registro(s)."
-        page.update()
+        tbl.set_rows([adapt(r) for r in rows])
+        update_count()
+
+    def fetch_ids(ids):
+        # delta: busca só as empresas do evento e mantém o rows_cache coerente
+        nonlocal rows_cache
+        got = db.list_companies_page(limit=len(ids), filtros={"ids": ids})["rows"]
+        wanted = {int(i) for i in ids}
+        rows_cache = [r for r in rows_cache if _get(r, "id") not in wanted] + [dict(r) for r in got]
+        return got
+
+    live = False
+    if hasattr(db, "list_companies_page"):
+        live = bind_live(tbl, "companies", fetch=fetch_ids, adapt=adapt, reload=load,
+                         after=update_count, key=("companies", id(page)))
 
     def _find_rec_by_id(rid):
         for r in rows_cache:
@@ -564,7 +585,8 @@ def page_empresas(page: ft.Page) -> ft.Control:
                 close(); return snack_err(page, "add_company() indisponível no DB.")
             try:
                 funcs["add"](payload)
-                close(); snack_ok(page, "Empresa criada."); load()
+                close(); snack_ok(page, "Empresa criada.")
+                if not live: load()
             except Exception as ex:
                 close(); snack_err(page, f"Erro: {ex}")
         _dialog(page, "➕ Nova empresa", frm, save)
@@ -600,7 +622,8 @@ def page_empresas(page: ft.Page) -> ft.Control:
                 close(); return snack_err(page, "upd_company() indisponível no DB.")
             try:
                 funcs["upd"](rid, payload)
-                close(); snack_ok(page, "Empresa atualizada."); load()
+                close(); snack_ok(page, "Empresa atualizada.")
+                if not live: load()
             except Exception as ex:
                 close(); snack_err(page, f"Erro: {ex}")
         _dialog(page, "✏️ Editar empresa", frm, save)
@@ -619,7 +642,8 @@ def page_empresas(page: ft.Page) -> ft.Control:
                     funcs["del"](rid); ok += 1
                 except Exception:
                     fail += 1
-            snack_ok(page, f"Excluídos: {ok} • Falhas: {fail}"); load()
+            snack_ok(page, f"Excluídos: {ok} • Falhas: {fail}")
+            if not live: load()
         _confirm_dialog(page, "Excluir empresas", f"Confirmar exclusão de {len(ids)} registro(s)?", do_confirm)
 
     header = ft.Row(
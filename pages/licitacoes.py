@@ -17,6 +17,11 @@ except Exception:
         def __init__(self, *a, **k): super().__init__()
         def build(self): return ft.Container(ft.Text("Tabela indisponível"))
 
+try:
+    from components.tableview import bind_live
+except Exception:
+    def bind_live(*a, **k): return False
+
 # 🔒 Forms (text_input, date_input, FieldRow, snack_ok/err)
 try:
     from components.forms import FieldRow, snack_ok, snack_err, text_input, date_input
@@ -302,6 +307,33 @@ def page_licitacoes(page: ft.Page) -> ft.Control:
     lbl_count = ft.Text("", size=12)
     rows_cache: list[dict] = []
 
+    def adapt(r) -> dict:
+        rid = _get(r, "id")
+        cents = _get(r, "valor_estimado_centavos")
+        valor_fmt = _val(r, "valor_estimado", "valor")
+        if cents is not None:
+            # valor canônico em centavos (mantido pelo banco): sem re-parse do texto
+            valor_fmt = _format_brl_from_digits(str(int(cents))) if int(cents) >= 0 else valor_fmt
+        elif valor_fmt:
+            try:
+                valor_fmt = _format_brl_from_digits("".join(ch for ch in str(valor_fmt) if ch.isdigit()))
+            except Exception:
+                pass
+        return {
+            "id": rid,
+            "ID": rid,
+            "Empresa": _val(r, "empresa_nome", "empresa"),
+            "Órgão": _val(r, "orgao"),
+            "Modalidade": _val(r, "modalidade"),
+            "Processo": _val(r, "processo"),
+            "Data da sessão": _val(r, "data_sessao", "data"),
+            "Hora": _val(r, "hora"),
+            "Qtd Itens": _val(r, "qtd_itens"),
+            "Valor estimado": valor_fmt or _val(r, "valor_estimado", "valor"),
+            "Tem lotes": "Sim" if str(_get(r, "tem_lotes", 0)).lower() in ("1", "true", "sim") else "Não",
+            "Link": _val(r, "link", "url"),
+        }
+
     # Igual à página EMPRESAS: lista de dicts + set_rows(adapted)
     def load():
         nonlocal rows_cache
@@ -314,38 +346,32 @@ def page_licitacoes(page: ft.Page) -> ft.Control:
                 rows = []
         rows_cache = rows[:]
 
-        adapted = []
-        for r in rows:
-            rid = _get(r, "id")
-            valor_fmt = _val(r, "valor_estimado", "valor")
-            if valor_fmt:
-                try:
-                    valor_fmt = _format_brl_from_digits("".join(ch for ch in str(valor_fmt) if ch.isdigit()))
-                except Exception:
-                    pass
-            adapted.append({
-                "id": rid,
-                "ID": rid,
-                "Empresa": _val(r, "empresa_nome", "empresa"),
-                "Órgão": _val(r, "orgao"),
-                "Modalidade": _val(r, "modalidade"),
-                "Processo": _val(r, "processo"),
-                "Data da sessão": _val(r, "data_sessao", "data"),
-                "Hora": _val(r, "hora"),
-                "Qtd Itens": _val(r, "qtd_itens"),
-                "Valor estimado": valor_fmt or _val(r, "valor_estimado", "valor"),
-                "Tem lotes": "Sim" if str(_get(r, "tem_lotes", 0)).lower() in ("1", "true", "sim") else "Não",
-                "Link": _val(r, "link", "url"),
-            })
-
-        tbl.set_rows(adapted)
-        lbl_count.value = f"{len(adapted)} registro(s)."
+        tbl.set_rows([adapt(r) for r in rows])
+        update_count()
+
+    def update_count():
+        lbl_count.value = f"{len(tbl._rows_data)} registro(s)."
+        if hasattr(db, "licitacoes_valores"):
+            try:
+                tot = (db.licitacoes_valores(None) or [{}])[0]
+                if tot.get("soma_centavos"):
+                    lbl_count.value += f" Total estimado: {_format_brl_from_digits(str(int(tot['soma_centavos'])))}"
+            except Exception:
+                pass
         try:
             lbl_count.update()
             page.update()
         except Exception:
             pass
 
+    # delta por evento (services/events.py): só as linhas alteradas
+    live = bind_live(
+        tbl, "licitacoes",
+        fetch=lambda ids: db.list_licitacoes({"ids": ids}),
+        adapt=adapt, reload=load, after=update_count,
+        key=("licitacoes", id(page)),
+    )
+
     # ações
     def new():
         frm = _form()
@@ -357,7 +383,7 @@ def page_licitacoes(page: ft.Page) -> ft.Control:
                 funcs["add"](payload)
                 snack_ok(page, "Licitação criada.")
                 close()
-                load()
+                if not live: load()
             except Exception as ex:
                 snack_err(page, f"Erro ao salvar: {ex}")
         _dialog(page, "➕ Nova licitação", frm, save)
@@ -388,7 +414,7 @@ def page_licitacoes(page: ft.Page) -> ft.Control:
                 funcs["upd"](rid, payload)
                 snack_ok(page, "Licitação atualizada.")
                 close()
-                load()
+                if not live: load()
             except Exception as ex:
                 snack_err(page, f"Erro: {ex}")
         _dialog(page, "✏️ Editar licitação", frm, save)
@@ -412,7 +438,7 @@ def page_licitacoes(page: ft.Page) -> ft.Control:
                 except Exception:
                     fail += 1
             snack_ok(page, f"Excluídos: {ok} • Falhas: {fail}")
-            load()
+            if not live: load()
         _confirm_dialog(page, "Excluir licitações", f"Confirmar exclusão de {len(ids)} registro(s)?", do_confirm)
 
     # Header/Toolbar (sem “Ver mais”)
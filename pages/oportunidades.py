@@ -151,14 +151,22 @@ def page_oportunidades(page: ft.Page) -> ft.Control:
     def ac_buscar(_=None):
         lbl_status.value = "Buscando no PNCP…"
         page.update()
+        total = 0
         try:
             filters = _current_filters()
-            rows = pncp.search_opportunities(filters)
-            tbl.set_rows(_adapt_rows(rows))
-            lbl_status.value = f"{len(rows)} oportunidade(s) encontradas."
+            # página a página: a tabela cresce enquanto as próximas ainda estão chegando
+            tbl.set_rows([])
+            for batch in pncp.iter_opportunities(filters):
+                tbl.upsert_rows(_adapt_rows(batch))   # só acrescenta as linhas novas
+                total += len(batch)
+                lbl_status.value = f"Buscando no PNCP… {total} até agora."
+                page.update()
+            lbl_status.value = f"{total} oportunidade(s) encontradas."
             page.update()
         except Exception as ex:
-            lbl_status.value = f"Erro na busca: {ex}"
+            # as páginas que já chegaram continuam na tabela
+            lbl_status.value = (f"Busca interrompida após {total} oportunidade(s): {ex}"
+                                if total else f"Erro na busca: {ex}")
             page.update()
 
     def ac_salvar_filtro(_=None):
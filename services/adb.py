@@ -0,0 +1,173 @@
+# services/adb.py — fachada assíncrona do services.db (handlers Flet sem travar a UI)
+from __future__ import annotations
+
+"""
+`await adb.list_licitacoes(filtros)` roda `db.list_licitacoes(filtros)` num
+executor dedicado e devolve o mesmo resultado (mesmas linhas/dicts), então as
+páginas reaproveitam os adaptadores de linha que já têm.
+
+- Executor próprio com SOS_ADB_WORKERS threads (padrão 2): concorrência
+  limitada e cada thread usa a sua conexão persistente (services/connection.py).
+- "Só a mais recente": `await adb.latest(chave).search_banco_precos(q, f)`.
+  Uma chamada nova com a mesma chave substitui a anterior: se a anterior ainda
+  está na fila, nem roda; se já está no SQLite, leva conn.interrupt(). Quem
+  aguardava a substituída recebe `Superseded` (subclasse de CancelledError).
+  Use chave só em leituras — interromper uma escrita desfaz a transação.
+- Cancelar a task que aguarda (task.cancel()) também interrompe a consulta.
+"""
+
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from . import connection as _pool
+from . import db as _db
+from .storage import DB_PATH
+
+
+class Superseded(asyncio.CancelledError):
+    """A chamada foi substituída por outra mais nova com a mesma chave."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, "") or default))
+    except Exception:
+        return default
+
+MAX_WORKERS = _env_int("SOS_ADB_WORKERS", 2)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_exec_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _exec_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="adb")
+    return _executor
+
+
+class _Job:
+    """Estado de uma chamada: fila -> rodando (conn conhecida) -> fim."""
+    __slots__ = ("lock", "state", "conn")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = "queued"      # queued | running | done | cancelled
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def cancel(self) -> None:
+        with self.lock:
+            if self.state == "queued":
+                self.state = "cancelled"
+            elif self.state == "running" and self.conn is not None:
+                # sob o lock o worker não pode ter passado para outra tarefa
+                try:
+                    self.conn.interrupt()
+                except Exception:
+                    pass
+                self.state = "cancelled"
+
+
+_latest: Dict[Hashable, _Job] = {}
+_latest_lock = threading.Lock()
+
+
+def _run_job(job: _Job, fn: Callable[..., Any], args, kwargs) -> Any:
+    with job.lock:
+        if job.state == "cancelled":
+            raise Superseded()
+        job.state = "running"
+        job.conn = _pool.get_connection(DB_PATH)
+    try:
+        return fn(*args, **kwargs)
+    except sqlite3.OperationalError as ex:
+        if job.state == "cancelled" and "interrupt" in str(ex).lower():
+            raise Superseded() from ex
+        raise
+    finally:
+        with job.lock:
+            if job.state == "running":
+                job.state = "done"
+            job.conn = None
+
+
+async def run(fn: Callable[..., Any], *args, key: Optional[Hashable] = None, **kwargs) -> Any:
+    """
+    Executa `fn(*args, **kwargs)` no executor do adb e aguarda o resultado.
+    Com `key`, cancela/interrompe a chamada anterior de mesma chave.
+    """
+    job = _Job()
+    if key is not None:
+        with _latest_lock:
+            old = _latest.get(key)
+            _latest[key] = job
+        if old is not None:
+            old.cancel()
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(_get_executor(), functools.partial(_run_job, job, fn, args, kwargs))
+    try:
+        res = await fut
+    except asyncio.CancelledError:
+        job.cancel()
+        raise
+    finally:
+        if key is not None:
+            with _latest_lock:
+                if _latest.get(key) is job:
+                    _latest.pop(key, None)
+    if job.state == "cancelled":
+        raise Superseded()   # terminou, mas já existe chamada mais nova
+    return res
+
+
+def _db_fn(name: str) -> Callable[..., Any]:
+    fn = getattr(_db, name)
+    if not callable(fn):
+        raise AttributeError(f"services.db.{name} não é chamável")
+    return fn
+
+
+class _Latest:
+    """Proxy de `latest(chave)`: `await adb.latest(k).nome_da_funcao(...)`."""
+    __slots__ = ("_key",)
+
+    def __init__(self, key: Hashable):
+        self._key = key
+
+    def __getattr__(self, name: str):
+        fn = _db_fn(name)
+        async def _call(*args, **kwargs):
+            return await run(fn, *args, key=self._key, **kwargs)
+        _call.__name__ = name
+        return _call
+
+
+def latest(key: Hashable) -> _Latest:
+    return _Latest(key)
+
+
+def cancel(key: Hashable) -> None:
+    """Descarta/interrompe a chamada pendente de `key` (ex.: ao sair da página)."""
+    with _latest_lock:
+        job = _latest.pop(key, None)
+    if job is not None:
+        job.cancel()
+
+
+def __getattr__(name: str):
+    # adb.list_licitacoes(...) -> corrotina que roda db.list_licitacoes(...) no executor
+    if name.startswith("__"):
+        raise AttributeError(name)
+    fn = _db_fn(name)
+    async def _call(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    _call.__name__ = name
+    return _call
@@ -86,11 +86,27 @@ def _is_inactive(it: Dict[str, Any]) -> bool:
     return False
 
 # --------------------- Coletas ---------------------
+def _call_ranged(f, filtros: Dict[str, Any]) -> list:
+    # list_* novos aceitam filtros de período (colunas *_iso indexadas);
+    # nomes alternativos sem parâmetro caem na listagem completa.
+    # A coluna ISO só entende datas no início do texto: as linhas que ela
+    # deixou NULL ("Vence 10/10/2025") vêm numa 2ª consulta e passam pelo _to_date.
+    try:
+        rows = list(f(filtros) or [])
+    except TypeError:
+        return f() or []
+    try:
+        rows.extend(f({"sem_data_iso": True}) or [])
+    except Exception:
+        pass
+    return rows
+
 def _listar_licitacoes() -> List[Dict[str, Any]]:
     f = _pick("list_licitacoes", "licitacoes_all", "get_licitacoes", "listar_licitacoes", "lic_all")
     if f:
         try:
-            return [_as_dict(x) for x in (f() or [])]
+            ate = date.today() + timedelta(days=LIC_LEVE)
+            return [_as_dict(x) for x in _call_ranged(f, {"sessao_ate": ate})]
         except Exception:
             return []
     return []
@@ -102,7 +118,8 @@ def _listar_certidoes() -> List[Dict[str, Any]]:
     )
     if f:
         try:
-            return [_as_dict(x) for x in (f() or [])]
+            ate = date.today() + timedelta(days=CER_LEVE)
+            return [_as_dict(x) for x in _call_ranged(f, {"validade_ate": ate})]
         except Exception:
             return []
     return []
@@ -133,12 +150,12 @@ def _titulo_licitacao(it: Dict[str, Any]) -> str:
 
 # --------------------- Datas dos itens ---------------------
 _CER_DATE_CANDIDATES = [
-    "vencimento", "validade", "data_validade", "venc", "venc_em", "validade_em",
+    "dt_validade_iso", "vencimento", "validade", "data_validade", "venc", "venc_em", "validade_em",
     "data_venc", "data_vencimento", "vencimento_em", "expira", "expira_em",
     "expires_at", "expiry", "expiry_date",
 ]
 _LIC_DATE_CANDIDATES = [
-    "data_sessao", "sessao", "data_abertura", "abertura", "data_entrega",
+    "data_sessao_iso", "data_sessao", "sessao", "data_abertura", "abertura", "data_entrega",
     "prazo", "limite", "limite_entrega",
 ]
 
@@ -0,0 +1,241 @@
+# services/archive.py — arquivo morto: tira das tabelas quentes o que já é histórico
+from __future__ import annotations
+
+"""
+licitacoes, certidoes e banco_precos só crescem; listas, alertas e buscas
+pagavam por anos de sessões encerradas e certidões vencidas.
+
+- archive(): move para `<tabela>_archive` as linhas cuja data ISO
+  (sessão / validade / coleta) é anterior ao horizonte, em lotes — cada lote
+  numa transação curta (INSERT ... SELECT + DELETE). Linhas sem data ficam.
+- As tabelas quentes (e seus índices, FTS e triggers) ficam pequenas; o
+  histórico continua acessível pela view `<tabela>_all` e pelo filtro
+  `include_archived` das listas de services.db (list_*, list_*_page, count_*).
+- IDs arquivados não são reutilizados: o piso de IDs (id_alloc.id_floor)
+  sobe e os IDs saem da free-list.
+- unarchive() devolve linhas para a tabela quente.
+- Tabelas e views: migração 9 (migrations.ensure_archive_tables).
+
+Horizontes (dias) por variável de ambiente:
+  SOS_ARCHIVE_LICITACOES_DIAS  (padrão 730)   — data da sessão
+  SOS_ARCHIVE_CERTIDOES_DIAS   (padrão 365)   — validade
+  SOS_ARCHIVE_PRECOS_DIAS      (padrão 1095)  — data de coleta
+
+Linha de comando:
+  python -m services.archive [--dry-run] [--tabela licitacoes] [--dias 365]
+  python -m services.archive --restaurar licitacoes 10 11 12
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import connection as _pool
+from . import events as _events
+from . import id_alloc as _ids
+from . import migrations as _migrations
+from .storage import DB_PATH
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+# tabela -> coluna de data ISO (migração 4) que decide a idade
+DATE_COLUMNS: Dict[str, str] = {t: col for t, col, _idx in _migrations.ARCHIVE_TABLES}
+
+HORIZON_DAYS: Dict[str, int] = {
+    "licitacoes":   _env_int("SOS_ARCHIVE_LICITACOES_DIAS", 730),
+    "certidoes":    _env_int("SOS_ARCHIVE_CERTIDOES_DIAS", 365),
+    "banco_precos": _env_int("SOS_ARCHIVE_PRECOS_DIAS", 1095),
+}
+
+BATCH = 1000
+
+
+def _conn() -> sqlite3.Connection:
+    return _pool.get_connection(DB_PATH)
+
+def _check_table(table: str) -> str:
+    if table not in DATE_COLUMNS:
+        raise ValueError(f"tabela sem arquivo morto: {table!r} (use {', '.join(DATE_COLUMNS)})")
+    return table
+
+def _cutoff(table: str, horizon_days: Optional[int], hoje: Any) -> str:
+    days = HORIZON_DAYS[table] if horizon_days is None else int(horizon_days)
+    if hoje is None:
+        base = date.today()
+    elif isinstance(hoje, datetime):
+        base = hoje.date()
+    elif isinstance(hoje, date):
+        base = hoje
+    else:
+        base = date.fromisoformat(str(hoje)[:10])
+    return (base - timedelta(days=max(0, days))).isoformat()
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    cur = conn.cursor()
+    cur.row_factory = None
+    return [r[1] for r in cur.execute(f"PRAGMA table_info({table})")]
+
+def _notify(table: str, op: str, ids: List[int]) -> None:
+    # mesmo caminho das escritas de services.db: invalida o cache de leitura e avisa as telas
+    db = sys.modules.get("services.db")
+    if db is not None:
+        try:
+            db.invalidate(table)
+        except Exception:
+            pass
+    if ids:
+        _events.publish(table, op, ids)
+
+
+def candidates(table: str, horizon_days: Optional[int] = None, hoje: Any = None) -> int:
+    """Quantas linhas de `table` seriam arquivadas agora (sem mover nada)."""
+    _check_table(table)
+    cur = _conn().cursor()
+    cur.row_factory = None
+    row = cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {DATE_COLUMNS[table]} < ?",
+                      (_cutoff(table, horizon_days, hoje),)).fetchone()
+    return int(row[0] or 0)
+
+def archive(tables: Optional[Iterable[str]] = None, horizon_days: Optional[int] = None,
+            hoje: Any = None, batch: int = BATCH) -> Dict[str, int]:
+    """
+    Move para o arquivo as linhas mais antigas que o horizonte de cada tabela
+    (ou `horizon_days` para todas). Devolve {tabela: linhas movidas}.
+    """
+    conn = _conn()
+    out: Dict[str, int] = {}
+    if conn.in_transaction:
+        conn.commit()
+    with _pool.connection(DB_PATH, sqlite3.Row) as c:
+        c.execute("BEGIN IMMEDIATE")
+        _migrations.ensure_archive_tables(c)   # colunas novas / views em dia
+        c.commit()
+    cur = conn.cursor()
+    cur.row_factory = None
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for table in (tables or DATE_COLUMNS):
+        _check_table(table)
+        cutoff = _cutoff(table, horizon_days, hoje)
+        cols = ", ".join(_columns(conn, table))
+        moved: List[int] = []
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [r[0] for r in cur.execute(
+                    f"SELECT id FROM {table} WHERE {DATE_COLUMNS[table]} < ? ORDER BY id LIMIT ?",
+                    (cutoff, max(1, int(batch))))]
+                if not ids:
+                    conn.rollback()
+                    break
+                qms = ",".join("?" * len(ids))
+                cur.execute(f"""
+                    INSERT INTO {table}_archive ({cols}, archived_at)
+                    SELECT {cols}, ? FROM {table} WHERE id IN ({qms})
+                """, [stamp] + ids)
+                cur.execute(f"DELETE FROM {table} WHERE id IN ({qms})", ids)
+                # o trigger de DELETE pôs os IDs na free-list: arquivados não voltam a circular
+                cur.execute(f"DELETE FROM id_freelist WHERE tabela=? AND id IN ({qms})", [table] + ids)
+                _ids.raise_floor(conn, table, max(ids))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            moved.extend(ids)
+        out[table] = len(moved)
+        if moved:
+            _notify(table, _events.DELETE, moved)
+    return out
+
+def unarchive(table: str, ids: Iterable[int]) -> int:
+    """Devolve as linhas `ids` do arquivo para a tabela quente. Retorna quantas voltaram."""
+    _check_table(table)
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
+    conn = _conn()
+    cur = conn.cursor()
+    cur.row_factory = None
+    cols = ", ".join(_columns(conn, table))
+    back: List[int] = []
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for i in range(0, len(ids), BATCH):
+            part = ids[i:i + BATCH]
+            qms = ",".join("?" * len(part))
+            found = [r[0] for r in cur.execute(
+                f"SELECT id FROM {table}_archive WHERE id IN ({qms})", part)]
+            if not found:
+                continue
+            fq = ",".join("?" * len(found))
+            cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {table}_archive "
+                        f"WHERE id IN ({fq})", found)
+            cur.execute(f"DELETE FROM {table}_archive WHERE id IN ({fq})", found)
+            back.extend(found)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if back:
+        _notify(table, _events.INSERT, back)
+    return len(back)
+
+def sizes() -> Dict[str, Dict[str, int]]:
+    """{tabela: {"quente": n, "arquivo": n}}."""
+    cur = _conn().cursor()
+    cur.row_factory = None
+    out = {}
+    for table in DATE_COLUMNS:
+        hot = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        try:
+            cold = cur.execute(f"SELECT COUNT(*) FROM {table}_archive").fetchone()[0]
+        except sqlite3.OperationalError:
+            cold = 0
+        out[table] = {"quente": int(hot or 0), "arquivo": int(cold or 0)}
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="python -m services.archive",
+                                 description="Arquivo morto de licitações, certidões e preços")
+    ap.add_argument("--tabela", action="append", choices=list(DATE_COLUMNS),
+                    help="só esta tabela (pode repetir)")
+    ap.add_argument("--dias", type=int, default=None, help="horizonte em dias (todas as tabelas)")
+    ap.add_argument("--dry-run", action="store_true", help="só conta o que seria arquivado")
+    ap.add_argument("--restaurar", nargs="+", metavar=("TABELA", "ID"),
+                    help="devolve IDs do arquivo para a tabela quente")
+    args = ap.parse_args(argv)
+
+    from . import db  # noqa: F401  (migrações + cache/eventos do services.db)
+    try:
+        if args.restaurar:
+            table, *ids = args.restaurar
+            print(f"{table}: {unarchive(table, ids)} linha(s) restaurada(s)")
+            return 0
+        tables = args.tabela or list(DATE_COLUMNS)
+        if args.dry_run:
+            for t in tables:
+                print(f"{t}: {candidates(t, args.dias)} linha(s) a arquivar "
+                      f"(antes de {_cutoff(t, args.dias, None)})")
+            return 0
+        for t, n in archive(tables, args.dias).items():
+            print(f"{t}: {n} linha(s) arquivada(s)")
+        for t, s in sizes().items():
+            print(f"  {t}: quente={s['quente']} arquivo={s['arquivo']}")
+        return 0
+    except (ValueError, sqlite3.Error) as ex:
+        print(f"erro: {ex}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
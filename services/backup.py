@@ -0,0 +1,353 @@
+# services/backup.py — backup online do data.db (API de backup do SQLite) + restauração
+from __future__ import annotations
+
+"""
+Cópia consistente do banco sem parar o app e sem segurar os escritores.
+
+- backup(): sqlite3.Connection.backup em passos de `pages` páginas, com
+  `sleep` segundos entre eles. Com WAL os leitores/escritores seguem
+  normalmente; o SQLite reinicia a cópia se outra conexão escrever no meio —
+  após MAX_RESTARTS reinícios copiamos o restante num passo só (é leitura,
+  não bloqueia quem escreve).
+- O arquivo copiado passa por PRAGMA quick_check e vira
+  backups/sos-AAAAMMDD-HHMMSS.db.gz (gzip, gravado em .tmp + os.replace).
+  Mantemos os KEEP mais recentes.
+- restore(): descompacta, confere e copia para o data.db pela mesma API,
+  sobre uma conexão própria (as conexões persistentes das threads continuam
+  válidas e enxergam o conteúdo novo). Antes faz um backup "pre-restore".
+  Depois reaplica as migrações (snapshot antigo) e avisa as telas (RELOAD).
+- Agendamento diário no mesmo modelo de services/pncp.py
+  (start_daily_job/stop_daily_job, thread daemon).
+- `progress(copiadas, total)` recebe o andamento; sem callback, vai para o log.
+
+Linha de comando:
+  python -m services.backup [backup]            # novo snapshot
+  python -m services.backup list
+  python -m services.backup restore ARQUIVO.db.gz
+
+Ajustes por variável de ambiente (opcionais):
+  SOS_BACKUP_DIR     (padrão <projeto>/backups)
+  SOS_BACKUP_KEEP    (padrão 7)
+  SOS_BACKUP_PAGES   (padrão 1024 páginas por passo)
+  SOS_BACKUP_SLEEP   (padrão 0.05 s entre passos)
+"""
+
+import datetime as dt
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .storage import BASE_DIR, DB_PATH
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+BACKUP_DIR = os.getenv("SOS_BACKUP_DIR") or os.path.join(BASE_DIR, "backups")
+KEEP = max(1, _env_int("SOS_BACKUP_KEEP", 7))
+PAGES = max(1, _env_int("SOS_BACKUP_PAGES", 1024))
+SLEEP = max(0.0, _env_float("SOS_BACKUP_SLEEP", 0.05))
+MAX_RESTARTS = 3
+PREFIX = "sos-"
+LOG_PATH = os.path.join(BASE_DIR, "data", "backup_job.log")
+
+Progress = Callable[[int, int], None]
+
+# tabelas que as telas assinam (services/events.py) — recarregar após restore
+_RELOAD_TABLES = ("companies", "licitacoes", "certidoes", "banco_precos")
+
+
+class BackupError(Exception):
+    """Snapshot inválido ou cópia que não passou no quick_check."""
+
+
+class _Restarted(Exception):
+    pass
+
+
+# ----------------------------- utilitários -----------------------------
+def _log(msg: str) -> None:
+    ts = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+        with open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(f"[{ts}] {msg}\n")
+    except Exception:
+        pass
+
+def _log_progress(prefix: str) -> Progress:
+    last = [-1]
+    def _cb(done: int, total: int) -> None:
+        pct = int(done * 100 / total) if total else 100
+        if pct // 25 != last[0] // 25 or pct == 100:   # 0/25/50/75/100 %
+            last[0] = pct
+            _log(f"{prefix}: {done}/{total} páginas ({pct}%)")
+    return _cb
+
+def _quick_check(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    cur.row_factory = None
+    res = [r[0] for r in cur.execute("PRAGMA quick_check").fetchall()]
+    if res != ["ok"]:
+        raise BackupError("quick_check falhou: " + "; ".join(map(str, res[:5])))
+
+def _copy(src: sqlite3.Connection, dst: sqlite3.Connection, pages: int, sleep: float,
+          progress: Optional[Progress]) -> None:
+    """src.backup(dst) em passos; reinícios demais -> termina num passo só."""
+    state = {"remaining": None, "restarts": 0}
+
+    def _step(status: int, remaining: int, total: int) -> None:
+        prev = state["remaining"]
+        if prev is not None and remaining > prev:
+            state["restarts"] += 1      # outra conexão escreveu: o SQLite recomeçou
+            if state["restarts"] > MAX_RESTARTS:
+                raise _Restarted()
+        state["remaining"] = remaining
+        if progress is not None:
+            progress(total - remaining, total)
+
+    if pages > 0:
+        try:
+            src.backup(dst, pages=pages, progress=_step, sleep=sleep)
+            return
+        except _Restarted:
+            _log(f"backup reiniciado {MAX_RESTARTS}x por escritas concorrentes; copiando de uma vez")
+    src.backup(dst, pages=-1, progress=_step)
+
+def _stamp() -> str:
+    return dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+
+# ----------------------------- backup -----------------------------
+def list_backups(dest_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Snapshots existentes, do mais novo para o mais antigo: [{"path","size","mtime"}]."""
+    out = []
+    for p in glob.glob(os.path.join(dest_dir or BACKUP_DIR, PREFIX + "*.db.gz")):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        out.append({"path": p, "size": st.st_size, "mtime": st.st_mtime})
+    out.sort(key=lambda b: (b["mtime"], os.path.basename(b["path"])), reverse=True)
+    return out
+
+def rotate(keep: int = KEEP, dest_dir: Optional[str] = None) -> List[str]:
+    """Apaga os snapshots além dos `keep` mais recentes. Devolve os removidos."""
+    removed = []
+    for b in list_backups(dest_dir)[max(1, int(keep)):]:
+        try:
+            os.remove(b["path"])
+            removed.append(b["path"])
+        except OSError:
+            pass
+    return removed
+
+def backup(dest_dir: Optional[str] = None, *, db_path: Optional[str] = None,
+           pages: int = PAGES, sleep: float = SLEEP, keep: Optional[int] = KEEP,
+           progress: Optional[Progress] = None, tag: str = "") -> str:
+    """
+    Snapshot compactado de `db_path` (padrão data.db) em `dest_dir`.
+    Devolve o caminho do .db.gz. `keep=None` não rotaciona.
+    """
+    dest_dir = dest_dir or BACKUP_DIR
+    src_path = db_path or DB_PATH
+    os.makedirs(dest_dir, exist_ok=True)
+    base = PREFIX + _stamp() + (f"-{tag}" if tag else "")
+    name, n = base, 1
+    while os.path.exists(os.path.join(dest_dir, name + ".db.gz")):   # mesmo segundo
+        name, n = f"{base}.{n}", n + 1
+    raw = os.path.join(dest_dir, name + ".db.tmp")
+    final = os.path.join(dest_dir, name + ".db.gz")
+    t0 = time.perf_counter()
+    # conexões próprias: não disputam transação com a conexão persistente da thread
+    src = sqlite3.connect(src_path, timeout=30)
+    try:
+        dst = sqlite3.connect(raw)
+        try:
+            _copy(src, dst, pages, sleep, progress or _log_progress("backup"))
+            _quick_check(dst)
+        finally:
+            dst.close()
+    except BaseException:
+        _silent_remove(raw)
+        raise
+    finally:
+        src.close()
+    try:
+        with open(raw, "rb") as fin, gzip.open(final + ".tmp", "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        os.replace(final + ".tmp", final)
+    except BaseException:
+        _silent_remove(final + ".tmp")
+        raise
+    finally:
+        _silent_remove(raw)
+    if keep is not None:
+        rotate(keep, dest_dir)
+    _log(f"backup ok: {final} ({os.path.getsize(final)} bytes, {time.perf_counter() - t0:.1f}s)")
+    return final
+
+def _silent_remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# ----------------------------- restauração -----------------------------
+def restore(snapshot: str, *, db_path: Optional[str] = None, safety_backup: bool = True,
+            progress: Optional[Progress] = None) -> str:
+    """
+    Substitui o conteúdo de `db_path` (padrão data.db) pelo de `snapshot`
+    (.db.gz ou .db). Com `safety_backup`, guarda antes um snapshot
+    "pre-restore" do estado atual. Devolve o caminho dele ("" sem ele).
+    """
+    if not os.path.isfile(snapshot):
+        raise BackupError(f"snapshot não encontrado: {snapshot}")
+    target = db_path or DB_PATH
+    safety = ""
+    if safety_backup and os.path.exists(target):
+        safety = backup(db_path=target, keep=None, tag="pre-restore")
+
+    tmp = os.path.join(os.path.dirname(os.path.abspath(target)), f".restore-{_stamp()}.db")
+    try:
+        if snapshot.endswith(".gz"):
+            with gzip.open(snapshot, "rb") as fin, open(tmp, "wb") as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+        else:
+            shutil.copyfile(snapshot, tmp)
+        src = sqlite3.connect(tmp)
+        try:
+            try:
+                _quick_check(src)
+            except sqlite3.DatabaseError as ex:
+                raise BackupError(f"snapshot inválido: {ex}") from ex
+            dst = sqlite3.connect(target, timeout=30)
+            try:
+                # um passo só: a base de destino fica travada até o fim de qualquer forma
+                _copy(src, dst, -1, 0.0, progress or _log_progress("restore"))
+            finally:
+                dst.close()
+        finally:
+            src.close()
+    finally:
+        _silent_remove(tmp)
+    _after_restore(target)
+    _log(f"restore ok: {snapshot} -> {target}" + (f" (anterior em {safety})" if safety else ""))
+    return safety
+
+def _after_restore(target: str) -> None:
+    # snapshot de versão antiga do esquema: reaplica as migrações pendentes
+    from . import migrations
+    migrations._done.discard(target)
+    migrations._done.discard(os.path.abspath(target))
+    migrations.migrate(target)
+    # o cache de leitura do services.db já invalida por PRAGMA data_version;
+    # limpamos mesmo assim e avisamos as telas abertas
+    db = sys.modules.get("services.db")
+    if db is not None:
+        try:
+            db.cache_clear()
+        except Exception:
+            pass
+    from . import events
+    for t in _RELOAD_TABLES:
+        events.publish(t, events.RELOAD)
+
+# ----------------------------- Agendamento diário -----------------------------
+_job_thread: Optional[threading.Thread] = None
+_job_stop = threading.Event()
+
+def _seconds_until(hour: int, minute: int) -> int:
+    now = dt.datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target = target + dt.timedelta(days=1)
+    return int((target - now).total_seconds())
+
+def _job_loop(hour: int, minute: int):
+    _log(f"Backup job iniciado (diário {hour:02d}:{minute:02d}).")
+    while not _job_stop.is_set():
+        if _job_stop.wait(_seconds_until(hour, minute)):
+            break
+        try:
+            backup()
+        except Exception as ex:
+            _log(f"Backup job erro: {ex}")
+
+def start_daily_job(hour: int = 12, minute: int = 30) -> None:
+    """Inicia o backup diário. Idempotente."""
+    global _job_thread
+    if _job_thread and _job_thread.is_alive():
+        _log("Backup job já estava em execução.")
+        return
+    _job_stop.clear()
+    _job_thread = threading.Thread(target=_job_loop, args=(hour, minute), daemon=True,
+                                   name="backup-job")
+    _job_thread.start()
+
+def stop_daily_job() -> None:
+    _job_stop.set()
+    _log("Backup job parado.")
+
+# ----------------------------- CLI -----------------------------
+def _cli_progress(label: str) -> Progress:
+    def _cb(done: int, total: int) -> None:
+        pct = int(done * 100 / total) if total else 100
+        sys.stderr.write(f"\r{label}: {done}/{total} páginas ({pct}%)")
+        if done >= total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+    return _cb
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="python -m services.backup",
+                                 description="Backup/restauração do data.db")
+    ap.add_argument("cmd", nargs="?", default="backup", choices=("backup", "list", "restore"))
+    ap.add_argument("snapshot", nargs="?", help="arquivo .db.gz/.db (restore)")
+    ap.add_argument("--dir", default=None, help=f"pasta dos snapshots (padrão {BACKUP_DIR})")
+    ap.add_argument("--db", default=None, help=f"banco (padrão {DB_PATH})")
+    ap.add_argument("--keep", type=int, default=KEEP)
+    ap.add_argument("--pages", type=int, default=PAGES)
+    ap.add_argument("--sleep", type=float, default=SLEEP)
+    ap.add_argument("--no-safety", action="store_true", help="restore sem snapshot pre-restore")
+    args = ap.parse_args(argv)
+
+    try:
+        if args.cmd == "list":
+            for b in list_backups(args.dir):
+                ts = dt.datetime.fromtimestamp(b["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+                print(f"{ts}  {b['size']:>12}  {b['path']}")
+            return 0
+        if args.cmd == "restore":
+            if not args.snapshot:
+                ap.error("restore precisa do arquivo do snapshot")
+            safety = restore(args.snapshot, db_path=args.db, safety_backup=not args.no_safety,
+                             progress=_cli_progress("restore"))
+            print(f"restaurado: {args.snapshot}" + (f" (anterior em {safety})" if safety else ""))
+            return 0
+        path = backup(args.dir, db_path=args.db, pages=args.pages, sleep=args.sleep,
+                      keep=args.keep, progress=_cli_progress("backup"))
+        print(path)
+        return 0
+    except (BackupError, sqlite3.Error, OSError) as ex:
+        print(f"erro: {ex}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
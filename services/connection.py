@@ -0,0 +1,119 @@
+# services/connection.py — conexões SQLite persistentes (uma por thread)
+"""
+Gerenciador de conexões compartilhado pelos módulos de DB
+(db.py, db_legacy.py, credentials.py, migrations.py).
+
+- Cada thread recebe UMA conexão de longa duração por arquivo de banco;
+  nada de connect/close a cada CRUD.
+- Na abertura aplicamos os PRAGMAs de desempenho: WAL, synchronous=NORMAL,
+  busy_timeout, mmap_size, cache_size e foreign_keys=ON.
+- `connection(row_factory=...)` empresta a conexão da thread com o
+  row_factory pedido e restaura o anterior na saída (chamadas aninhadas ok).
+
+Ajustes por variável de ambiente (opcionais):
+  SOS_DB_BUSY_TIMEOUT_MS (padrão 5000)
+  SOS_DB_MMAP_MB         (padrão 64)
+  SOS_DB_CACHE_KB        (padrão 16384)
+  SOS_SQL_PROFILE=1      conexões instrumentadas (services/sqlprof.py)
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .storage import DB_PATH
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+
+BUSY_TIMEOUT_MS = _env_int("SOS_DB_BUSY_TIMEOUT_MS", 5000)
+MMAP_SIZE = _env_int("SOS_DB_MMAP_MB", 64) * 1024 * 1024
+CACHE_KB = _env_int("SOS_DB_CACHE_KB", 16384)
+PROFILE = os.getenv("SOS_SQL_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+
+_local = threading.local()
+
+# --------------------- abertura ---------------------
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    # WAL é persistente no arquivo; em bases read-only/memória apenas ignora.
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.DatabaseError:
+        pass
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA mmap_size={int(MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size=-{int(CACHE_KB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA foreign_keys=ON")
+
+
+def _open(path: str) -> sqlite3.Connection:
+    if PROFILE:
+        from . import sqlprof  # só carregado com o perfil ligado
+        conn = sqlprof.connect(path, timeout=BUSY_TIMEOUT_MS / 1000.0)
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000.0)
+    _apply_pragmas(conn)
+    return conn
+
+
+def _thread_conns() -> Dict[str, sqlite3.Connection]:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = {}
+        _local.conns = conns
+    return conns
+
+# --------------------- API pública ---------------------
+def get_connection(path: Optional[str] = None) -> sqlite3.Connection:
+    """Conexão persistente da thread atual para `path` (padrão: storage.DB_PATH)."""
+    key = os.path.abspath(path or DB_PATH)
+    conns = _thread_conns()
+    conn = conns.get(key)
+    if conn is None:
+        conn = _open(key)
+        conns[key] = conn
+    return conn
+
+
+@contextmanager
+def connection(path: Optional[str] = None,
+               row_factory: Optional[Callable[..., Any]] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Empresta a conexão da thread. NÃO fecha na saída; se sair por exceção
+    com transação aberta, faz rollback para não deixar lixo na conexão.
+    """
+    conn = get_connection(path)
+    prev = conn.row_factory
+    conn.row_factory = row_factory
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        raise
+    finally:
+        conn.row_factory = prev
+
+
+def close_thread_connections() -> None:
+    """Fecha as conexões da thread atual (ex.: ao encerrar um worker)."""
+    conns = _thread_conns()
+    for conn in list(conns.values()):
+        try:
+            conn.close()
+        except Exception:
+            pass
+    conns.clear()
@@ -3,11 +3,12 @@ from __future__ import annotations
 import sqlite3
 from typing import Optional, List
 from .storage import DB_PATH
+from . import connection as _pool
 
 def _connect():
-    conn = sqlite3.connect(DB_PATH)
+    # conexão persistente da thread (ver services/connection.py)
+    conn = _pool.get_connection(DB_PATH)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 def list_company_credentials(company_id: int) -> List[sqlite3.Row]:
@@ -4,7 +4,8 @@ from __future__ import annotations
 """
 DB unificado do projeto "Novo 5 atual" — compatível com Flet 0.28.3.
 
-- Importa TUDO do legado (services/db_legacy.py) para não quebrar outras páginas.
+- Nomes do legado (services/db_legacy.py) e aliases antigos são resolvidos sob
+  demanda (seção 1): import leve, e cada chamada vai direto para a função.
 - Fornece CRUD de EMPRESAS (compat PT/EN + credenciais + campos extras do sócio
   + e-mail principal da empresa).
 - Fornece CRUD de LICITAÇÕES com FK para companies e ON DELETE SET NULL.
@@ -12,26 +13,140 @@ DB unificado do projeto "Novo 5 atual" — compatível com Flet 0.28.3.
 """
 
 import os
+import re
 import sqlite3
+import sys
 from contextlib import contextmanager
-from datetime import date
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from . import connection as _pool
+from . import migrations as _migrations
+from . import id_alloc as _ids
+from . import events as _events
 
 # -----------------------------------------------------------------------------
-# 1) IMPORTA O DB LEGADO (mantém tudo que já existia nas outras páginas)
+# 1) COMPAT: ALIASES + LEGADO, RESOLVIDOS SOB DEMANDA
 # -----------------------------------------------------------------------------
+# Antes o módulo copiava dir(db_legacy) inteiro nos globals no import e
+# mantinha dezenas de funções-alias. Agora:
+#   - COMPAT_ALIASES mapeia alias -> nome canônico deste módulo;
+#   - o resto cai no db_legacy, importado só no primeiro acesso;
+#   - o __getattr__ do módulo resolve uma vez e grava em globals(): as
+#     próximas chamadas são diretas (sem wrapper no meio).
+# Uso de alias/legado e sondagens sem resposta (hasattr em nomes que não
+# existem) ficam registrados: compat_report(). Com SOS_DB_COMPAT_REPORT=1
+# o relatório sai no stderr ao encerrar (ou vai para o arquivo indicado) e
+# cada acesso é contado (nada é gravado em globals).
+COMPAT_ALIASES: Dict[str, str] = {
+    # Empresas
+    "companies_all": "list_companies", "list_company": "list_companies",
+    "empresas_all": "list_companies", "get_empresas": "list_companies",
+    "empresas_list": "list_companies", "list_empresas": "list_companies",
+    "add_empresa": "add_company", "nova_empresa": "add_company", "empresa_add": "add_company",
+    "upd_empresa": "upd_company", "update_empresa": "upd_company", "edit_empresa": "upd_company",
+    "del_empresa": "del_company", "empresa_del": "del_company",
+    "delete_empresa": "del_company", "remove_empresa": "del_company",
+    "company_get": "get_company",
+    "count_empresas": "count_companies",
+    # Licitações
+    "licitacoes_all": "list_licitacoes", "get_licitacoes": "list_licitacoes",
+    "licitacao_add": "add_licitacao", "nova_licitacao": "add_licitacao",
+    "update_licitacao": "upd_licitacao", "licitacao_upd": "upd_licitacao",
+    "delete_licitacao": "del_licitacao", "licitacao_del": "del_licitacao",
+    "licitacoes_count": "count_licitacoes",
+    # Certidões
+    "certidoes_count": "count_certidoes",
+}
+
 _legacy = None
-try:
-    from . import db_legacy as _legacy  # type: ignore
-    for _name in dir(_legacy):
-        if _name.startswith("_"):
-            continue
-        # Não sobrescreve nomes que definimos aqui
-        if _name in globals():
-            continue
-        globals()[_name] = getattr(_legacy, _name)
-except Exception:
-    pass
+_COMPAT_TRACK = os.getenv("SOS_DB_COMPAT_REPORT", "").strip()
+_COMPAT_MAX_CALLERS = 20
+_compat_used: Dict[str, Dict[str, Any]] = {}     # nome -> {"target","kind","count","callers"}
+_compat_missing: Dict[str, Dict[str, Any]] = {}  # nome -> {"count","callers"}
+
+
+def _legacy_mod():
+    global _legacy
+    if _legacy is None:
+        try:
+            from . import db_legacy as _mod  # type: ignore
+        except Exception:
+            _mod = False
+        _legacy = _mod
+    return _legacy or None
+
+
+def _compat_note(book: Dict[str, Dict[str, Any]], name: str, **info) -> None:
+    f = sys._getframe(2)
+    caller = f"{f.f_globals.get('__name__', '?')}:{f.f_lineno}"
+    ent = book.setdefault(name, dict(info, count=0, callers=[]))
+    ent["count"] += 1
+    if caller not in ent["callers"] and len(ent["callers"]) < _COMPAT_MAX_CALLERS:
+        ent["callers"].append(caller)
+
+
+def __getattr__(name: str):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    target = COMPAT_ALIASES.get(name)
+    if target is not None and target in globals():
+        obj, kind = globals()[target], "alias"
+    else:
+        mod = _legacy_mod()
+        obj = getattr(mod, target or name, None) if mod is not None and not name.startswith("_") else None
+        if obj is None or type(obj) is type(sys):
+            _compat_note(_compat_missing, name)
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        kind = "legacy"
+    _compat_note(_compat_used, name, target=target or name, kind=kind)
+    if not _COMPAT_TRACK:
+        globals()[name] = obj
+    return obj
+
+
+def __dir__():
+    names = set(globals()) | set(COMPAT_ALIASES)
+    mod = _legacy_mod()
+    if mod is not None:
+        names |= {n for n in dir(mod) if not n.startswith("_")}
+    return sorted(names)
+
+
+def compat_report() -> Dict[str, Any]:
+    """
+    Uso da camada de compat neste processo:
+      {"aliases": {nome: {"target","kind","count","callers"}},
+       "missing": {nome: {"count","callers"}}}
+    kind = "alias" (COMPAT_ALIASES) ou "legacy" (services/db_legacy.py).
+    Sem SOS_DB_COMPAT_REPORT, count é de resoluções (1ª vez por nome).
+    """
+    cp = lambda book: {k: dict(v, callers=list(v["callers"])) for k, v in sorted(book.items())}
+    return {"aliases": cp(_compat_used), "missing": cp(_compat_missing)}
+
+
+def _compat_dump() -> None:
+    rep = compat_report()
+    lines = ["# services.db — uso de compat"]
+    for n, e in rep["aliases"].items():
+        lines.append(f"{e['kind']:6} {n} -> {e['target']} x{e['count']}  ({', '.join(e['callers'])})")
+    for n, e in rep["missing"].items():
+        lines.append(f"miss   {n} x{e['count']}  ({', '.join(e['callers'])})")
+    txt = "\n".join(lines) + "\n"
+    try:
+        if _COMPAT_TRACK in ("1", "true", "yes", "stderr"):
+            sys.stderr.write(txt)
+        else:
+            with open(_COMPAT_TRACK, "w", encoding="utf-8") as fh:
+                fh.write(txt)
+    except Exception:
+        pass
+
+
+if _COMPAT_TRACK:
+    import atexit
+    atexit.register(_compat_dump)
 
 # -----------------------------------------------------------------------------
 # 2) CONEXÃO / CAMINHO DO DB
@@ -61,136 +176,29 @@ DB_PATH = _load_db_path()
 def _dict_factory(cursor: sqlite3.Cursor, row: sqlite3.Row) -> Dict[str, Any]:
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
+_on_connect: List[Any] = []    # ganchos na entrada de _connect (o cache de leitura, seção 4b)
+
 @contextmanager
 def _connect():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        conn.row_factory = _dict_factory
+    # Conexão persistente da thread (WAL + PRAGMAs em services/connection.py)
+    with _pool.connection(DB_PATH, row_factory=_dict_factory) as conn:
+        for hook in _on_connect:
+            hook(conn)
         yield conn
-    finally:
-        conn.close()
 
 # -----------------------------------------------------------------------------
 # 3) ESQUEMAS / MIGRAÇÕES
-#    (empresas + licitações, idempotentes)
+#    (registro versionado em services/migrations.py; roda uma vez no import)
 # -----------------------------------------------------------------------------
-SCHEMA_SQL_EMPRESAS = """
-CREATE TABLE IF NOT EXISTS companies (
-    id                      INTEGER PRIMARY KEY,
-    -- empresa
-    name                    TEXT,
-    cnpj                    TEXT,
-    ie                      TEXT,
-    im                      TEXT,
-    phone                   TEXT,
-    email                   TEXT,
-    email_principal_login   TEXT,  -- login da caixa de e-mail principal
-    email_principal_senha   TEXT,  -- senha da caixa de e-mail principal
-    -- endereço
-    address_street          TEXT,
-    address_number          TEXT,
-    address_bairro          TEXT,
-    address_cidade          TEXT,
-    address_estado          TEXT,
-    address_cep             TEXT,
-    -- banco
-    bank_nome               TEXT,
-    bank_agencia            TEXT,
-    bank_conta              TEXT,
-    -- sócio
-    socio_nome              TEXT,
-    socio_estado_civil      TEXT,
-    socio_rg                TEXT,
-    socio_cpf               TEXT,
-    socio_endereco          TEXT,
-    socio_nascimento        TEXT,  -- dd/mm/aaaa
-    socio_pai               TEXT,
-    socio_mae               TEXT,
-    -- credenciais (portais)
-    comprasnet_login        TEXT,
-    comprasnet_senha        TEXT,
-    comprasnet_obs          TEXT,
-    pcp_login               TEXT,
-    pcp_senha               TEXT,
-    pcp_obs                 TEXT,
-    bnc_login               TEXT,
-    bnc_senha               TEXT,
-    bnc_obs                 TEXT,
-    licitanet_login         TEXT,
-    licitanet_senha         TEXT,
-    licitanet_obs           TEXT,
-    compraspara_login       TEXT,
-    compraspara_senha       TEXT,
-    compraspara_obs         TEXT,
-    created_at              TEXT
-);
-"""
-
-SCHEMA_SQL_LICITACOES = """
-CREATE TABLE IF NOT EXISTS licitacoes (
-    id              INTEGER PRIMARY KEY,
-    empresa_id      INTEGER,
-    orgao           TEXT,
-    modalidade      TEXT,
-    processo        TEXT,
-    data_sessao     TEXT,
-    hora            TEXT,
-    qtd_itens       TEXT,
-    valor_estimado  TEXT,
-    link            TEXT,
-    tem_lotes       INTEGER DEFAULT 0,
-    created_at      TEXT,
-    FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
-);
-"""
-
-def _ensure_company_columns(conn: sqlite3.Connection) -> None:
-    """Garante todas as colunas usadas na página Empresas (idempotente)."""
-    conn.executescript(SCHEMA_SQL_EMPRESAS)
-    # Adiciona colunas que possam faltar em bases antigas
-    info = conn.execute("PRAGMA table_info(companies)").fetchall()
-    have = {r["name"] for r in info}
-    need = [
-        "email_principal_login","email_principal_senha",
-        "address_street","address_number","address_bairro","address_cidade","address_estado","address_cep",
-        "bank_nome","bank_agencia","bank_conta",
-        "socio_nascimento","socio_pai","socio_mae",
-        "comprasnet_login","comprasnet_senha","comprasnet_obs",
-        "pcp_login","pcp_senha","pcp_obs",
-        "bnc_login","bnc_senha","bnc_obs",
-        "licitanet_login","licitanet_senha","licitanet_obs",
-        "compraspara_login","compraspara_senha","compraspara_obs",
-        "created_at",
-    ]
-    for c in need:
-        if c not in have:
-            conn.execute(f"ALTER TABLE companies ADD COLUMN {c} TEXT")
-    conn.commit()
-
-def _ensure_licitacoes(conn: sqlite3.Connection) -> None:
-    conn.executescript(SCHEMA_SQL_LICITACOES)
-    conn.commit()
-
 def init_db_empresas() -> None:
-    with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_company_columns(conn)
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_companies_cnpj ON companies(cnpj)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_companies_name ON companies(name)")
-        conn.commit()
+    _migrations.migrate(DB_PATH)
 
 def init_db_licitacoes() -> None:
-    with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_licitacoes(conn)
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_licitacoes_empresa ON licitacoes(empresa_id)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_licitacoes_data ON licitacoes(data_sessao)")
-        conn.commit()
+    _migrations.migrate(DB_PATH)
 
-# tenta inicializar, mas não falha o import
+# tenta migrar, mas não falha o import
 try:
-    init_db_empresas()
-    init_db_licitacoes()
+    _migrations.migrate(DB_PATH)
 except Exception:
     pass
 
@@ -198,15 +206,8 @@ except Exception:
 # 4) HELPERS
 # -----------------------------------------------------------------------------
 def _smallest_free_id(conn: sqlite3.Connection, table: str) -> int:
-    rows = conn.execute(f"SELECT id FROM {table} ORDER BY id ASC").fetchall()
-    used = [r["id"] for r in rows if r.get("id") is not None]
-    nxt = 1
-    for v in used:
-        if v == nxt:
-            nxt += 1
-        elif v > nxt:
-            break
-    return nxt
+    # free-list mantida por triggers (services/id_alloc.py): sem varrer a tabela
+    return _ids.next_id(conn, table)
 
 def _g(data: Dict[str, Any], *keys: str) -> str:
     """Primeiro valor não vazio (aceita aliases)."""
@@ -228,13 +229,242 @@ def _bool01(v) -> int:
     s = str(v or "").strip().lower()
     return 1 if s in ("1","true","t","yes","sim","y","on") else 0
 
+def _batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, max(1, int(size or 1))))
+        if not chunk:
+            return
+        yield chunk
+
+def _iso_day(v: Any) -> Optional[str]:
+    """date/datetime, 'dd/mm/aaaa' ou 'aaaa-mm-dd' -> 'aaaa-mm-dd' (filtros de período)."""
+    if v in (None, ""):
+        return None
+    if hasattr(v, "isoformat"):
+        return v.isoformat()[:10]
+    s = str(v).strip()[:10]
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+def _date_range(wh: List[str], args: List[Any], col: str, de: Any, ate: Any) -> None:
+    """Acrescenta `col BETWEEN de AND ate` (colunas *_iso, indexadas; limites inclusivos)."""
+    de, ate = _iso_day(de), _iso_day(ate)
+    if de:
+        wh.append(f"{col} >= ?"); args.append(de)
+    if ate:
+        wh.append(f"{col} <= ?"); args.append(ate)
+
+def _iso_missing(wh: List[str], col: str, iso_col: str, flag: Any) -> None:
+    """
+    Filtro `sem_data_iso`: só as linhas com data preenchida que a coluna *_iso
+    não entendeu (texto como "Vence 10/10/2025"); quem chama interpreta em Python.
+    """
+    if flag:
+        wh.append(f"{iso_col} IS NULL AND TRIM(COALESCE({col},'')) <> ''")
+
+def _ids_in(wh: List[str], args: List[Any], col: str, ids: Any) -> None:
+    """Filtro `ids` (lista de IDs): usado pelas telas para buscar só as linhas alteradas."""
+    if ids is None:
+        return
+    ids = [int(i) for i in (ids if isinstance(ids, (list, tuple, set)) else [ids])]
+    if not ids:
+        wh.append("0")
+        return
+    wh.append(f"{col} IN ({','.join('?' * len(ids))})"); args.extend(ids)
+
+def _with_archived(filtros: dict | None) -> bool:
+    """Filtro `include_archived`: lê a view <tabela>_all (quente + *_archive, services/archive.py)."""
+    return bool((filtros or {}).get("include_archived"))
+
+# ---- paginação por chave (keyset) ----
+# Cursor = [valor_da_ordenação, id] da última linha da página; a próxima
+# página continua com "(ordem, id) > (?, ?)" — usa índice, sem OFFSET.
+def _keyset_page(conn: sqlite3.Connection, columns_sql: str, from_sql: str,
+                 where: List[str], args: List[Any],
+                 sort_cols: Dict[str, str], id_col: str,
+                 after_key: Any = None, limit: int = 50,
+                 sort: str = "id", direction: str = "asc") -> Dict[str, Any]:
+    """
+    Executa uma página keyset. `sort_cols` é a whitelist {nome: expressão SQL};
+    ordenação desconhecida cai em `id`. Retorna {"rows": [...], "next_key": cursor|None}.
+    """
+    expr = sort_cols.get(sort or "id") or id_col
+    desc = str(direction or "asc").strip().lower() in ("desc", "d", "-1")
+    op, order = ("<", "DESC") if desc else (">", "ASC")
+    limit = max(1, min(int(limit or 50), 1000))
+
+    wh, params = list(where), list(args)
+    if after_key not in (None, "", [], ()):
+        if isinstance(after_key, (list, tuple)):
+            k_sort, k_id = after_key[0], after_key[-1]
+        else:
+            k_sort, k_id = after_key, after_key
+        if expr == id_col:
+            wh.append(f"{id_col} {op} ?"); params.append(int(k_id))
+        else:
+            wh.append(f"({expr}, {id_col}) {op} (?, ?)"); params.extend([k_sort, int(k_id)])
+
+    where_sql = ("WHERE " + " AND ".join(wh)) if wh else ""
+    order_sql = f"{id_col} {order}" if expr == id_col else f"{expr} {order}, {id_col} {order}"
+    rows = conn.execute(f"""
+        SELECT {columns_sql}, {expr} AS _pg_sort
+          FROM {from_sql}
+        {where_sql}
+      ORDER BY {order_sql}
+         LIMIT ?
+    """, params + [limit + 1]).fetchall() or []
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = [rows[-1].get("_pg_sort"), rows[-1].get("id")]
+    for r in rows:
+        r.pop("_pg_sort", None)
+    return {"rows": rows, "next_key": next_key}
+
+def _count_where(conn: sqlite3.Connection, from_sql: str, where: List[str], args: List[Any]) -> int:
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    cur = conn.cursor()
+    cur.row_factory = None
+    row = cur.execute(f"SELECT COUNT(*) FROM {from_sql} {where_sql}", list(args)).fetchone()
+    return int(row[0] or 0) if row else 0
+
+# -----------------------------------------------------------------------------
+# 4b) CACHE DE LEITURA (write-through, invalidação por geração)
+#
+# - Leituras decoradas com @_cached(tabelas...) guardam o resultado por
+#   (função, argumentos) junto com a "geração" das tabelas de que dependem.
+# - Toda escrita deste módulo chama _bump(conn, tabela...) após o commit:
+#   a geração sobe e a próxima leitura vai ao banco.
+# - Escritas que não passam por aqui (db_legacy, SQL manual, outra thread
+#   ou outro processo) são detectadas por PRAGMA data_version (outras
+#   conexões) + total_changes (esta conexão): invalida tudo. A checagem roda
+#   na entrada de todo _connect(), leitura ou escrita — assim uma escrita
+#   por fora seguida de uma escrita deste módulo não passa despercebida.
+# - As linhas devolvidas são compartilhadas entre chamadas: somente leitura.
+# - SOS_DB_CACHE=0 desliga o cache.
+# -----------------------------------------------------------------------------
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+_CACHE_ENABLED = (os.getenv("SOS_DB_CACHE", "1").strip().lower() not in ("0", "false", "off", "no"))
+_CACHE_MAX = 256
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+_gen: Dict[str, int] = {}
+_gen_all = [0]                  # sobe quando a mudança não tem tabela conhecida
+_seen = threading.local()       # (data_version, total_changes) vistos pela thread
+_cache_hits = [0, 0]            # [hits, misses]
+
+def _conn_state(conn: sqlite3.Connection) -> tuple:
+    cur = conn.cursor()
+    cur.row_factory = None
+    return (cur.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+
+def _cache_sync(conn: sqlite3.Connection) -> None:
+    """Invalida tudo se a base mudou por fora deste módulo desde a última olhada da thread."""
+    state = _conn_state(conn)
+    if getattr(_seen, "state", None) != state:
+        # primeira leitura da thread também invalida (não sabemos o que ela escreveu antes)
+        with _cache_lock:
+            _gen_all[0] += 1
+        _seen.state = state
+
+def _bump(conn: sqlite3.Connection, *tables: str) -> None:
+    """Chamar após o commit de uma escrita: invalida as leituras dessas tabelas."""
+    with _cache_lock:
+        for t in tables:
+            _gen[t] = _gen.get(t, 0) + 1
+    dv, tc = _conn_state(conn)
+    prev = getattr(_seen, "state", None)
+    if prev is not None and prev[0] != dv:
+        with _cache_lock:           # alguém de fora também escreveu
+            _gen_all[0] += 1
+    _seen.state = (dv, tc)
+
+def invalidate(*tables: str) -> None:
+    """
+    Descarta o cache de leitura dessas tabelas (sem argumentos: de todas).
+    Para módulos que escrevem no banco por conta própria (ex.: services/archive.py).
+    """
+    with _cache_lock:
+        if tables:
+            for t in tables:
+                _gen[t] = _gen.get(t, 0) + 1
+        else:
+            _gen_all[0] += 1
+
+if _CACHE_ENABLED:
+    _on_connect.append(_cache_sync)
+
+def _share(val: Any) -> Any:
+    # cópia rasa do contêiner: quem chama pode reordenar/filtrar sem afetar o cache
+    if isinstance(val, list):
+        return list(val)
+    if isinstance(val, dict):
+        return dict(val)
+    return val
+
+def _emit(table: str, op: str, ids: Any = ()) -> None:
+    """Publica a alteração (services/events.py) depois do commit + _bump."""
+    try:
+        _events.publish(table, op, ids if isinstance(ids, (list, tuple, set, range)) else (ids,))
+    except Exception:
+        pass
+
+def _cached(*tables: str):
+    def deco(fn):
+        name = fn.__name__
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _CACHE_ENABLED:
+                return fn(*args, **kwargs)
+            try:
+                key = (name, repr(args), repr(sorted(kwargs.items())))
+            except Exception:
+                return fn(*args, **kwargs)
+            with _connect():        # _cache_sync na entrada
+                pass
+            with _cache_lock:
+                token = (_gen_all[0],) + tuple(_gen.get(t, 0) for t in tables)
+                hit = _cache.get(key)
+                if hit is not None and hit[0] == token:
+                    _cache.move_to_end(key)
+                    _cache_hits[0] += 1
+                    val = hit[1]
+                    return _share(val)
+                _cache_hits[1] += 1
+            val = fn(*args, **kwargs)
+            with _cache_lock:
+                _cache[key] = (token, val)
+                _cache.move_to_end(key)
+                while len(_cache) > _CACHE_MAX:
+                    _cache.popitem(last=False)
+            return _share(val)
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return deco
+
+def cache_clear() -> None:
+    with _cache_lock:
+        _cache.clear()
+        _gen_all[0] += 1
+
+def cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return {"entries": len(_cache), "hits": _cache_hits[0], "misses": _cache_hits[1]}
+
 # -----------------------------------------------------------------------------
 # 5) CRUD EMPRESAS (compat com a página)
 # -----------------------------------------------------------------------------
 def add_company(data: Dict[str, Any]) -> int:
     with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_company_columns(conn)
 
         cid = _smallest_free_id(conn, "companies")
         now = date.today().isoformat()
@@ -301,12 +531,12 @@ def add_company(data: Dict[str, Any]) -> int:
         qms = ",".join(["?"]*len(cols))
         conn.execute(f"INSERT INTO companies ({','.join(cols)}) VALUES ({qms})", vals)
         conn.commit()
+        _bump(conn, "companies")
+        _emit("companies", _events.INSERT, cid)
         return cid
 
 def upd_company(cid: int, data: Dict[str, Any]) -> None:
     with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_company_columns(conn)
 
         sets = (
             "name","cnpj","ie","im","phone","email",
@@ -366,113 +596,216 @@ def upd_company(cid: int, data: Dict[str, Any]) -> None:
         sql = "UPDATE companies SET " + ", ".join([f"{k}=?" for k in sets]) + " WHERE id=?"
         conn.execute(sql, vals + [int(cid)])
         conn.commit()
+        _bump(conn, "companies")
+        _emit("companies", _events.UPDATE, int(cid))
 
 def del_company(cid: int) -> None:
     with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
         # Tenta deletar direto (ON DELETE SET NULL já deve resolver)
         try:
             conn.execute("DELETE FROM companies WHERE id=?", (int(cid),))
             conn.commit()
-            return
         except sqlite3.IntegrityError:
             # Bases antigas sem SET NULL: zera empresa_id nas licitações e tenta de novo
             conn.execute("UPDATE licitacoes SET empresa_id=NULL WHERE empresa_id=?", (int(cid),))
             conn.execute("DELETE FROM companies WHERE id=?", (int(cid),))
             conn.commit()
+        _bump(conn, "companies", "licitacoes", "certidoes")
+    _emit("companies", _events.DELETE, int(cid))
+    # licitações/certidões da empresa mudaram (SET NULL / CASCADE) sem IDs conhecidos
+    _emit("licitacoes", _events.RELOAD)
+    _emit("certidoes", _events.RELOAD)
 
 def get_company(cid: int) -> Optional[Dict[str, Any]]:
     with _connect() as conn:
         row = conn.execute("SELECT * FROM companies WHERE id=?", (int(cid),)).fetchone()
         return row if row else None
 
+@_cached("companies")
 def list_companies() -> List[Dict[str, Any]]:
     with _connect() as conn:
         cur = conn.execute("SELECT * FROM companies ORDER BY id ASC")
         return cur.fetchall()
 
-# ALIASES (compat)
-def companies_all() -> List[Dict[str, Any]]: return list_companies()
-def list_company() -> List[Dict[str, Any]]: return list_companies()
-def empresas_all() -> List[Dict[str, Any]]: return list_companies()
-def get_empresas() -> List[Dict[str, Any]]: return list_companies()
-def empresas_list() -> List[Dict[str, Any]]: return list_companies()
+_COMPANY_SORT = {
+    "id": "id",
+    "name": "COALESCE(name,'')",
+    "cnpj": "COALESCE(cnpj,'')",
+    "created_at": "COALESCE(created_at,'')",
+}
 
-def add_empresa(data: Dict[str, Any]) -> int: return add_company(data)
-def nova_empresa(data: Dict[str, Any]) -> int: return add_company(data)
-def empresa_add(data: Dict[str, Any]) -> int: return add_company(data)
+def _company_where(filtros: dict | None):
+    """filtros: q (busca em nome/CNPJ/cidade)."""
+    filtros = filtros or {}
+    wh, args = [], []
+    q = filtros.get("q")
+    if q:
+        like = f"%{str(q).strip()}%"
+        wh.append("(name LIKE ? OR cnpj LIKE ? OR address_cidade LIKE ?)")
+        args.extend([like, like, like])
+    _ids_in(wh, args, "id", filtros.get("ids"))
+    return wh, args
 
-def upd_empresa(cid: int, data: Dict[str, Any]) -> None: return upd_company(cid, data)
-def update_empresa(cid: int, data: Dict[str, Any]) -> None: return upd_company(cid, data)
-def edit_empresa(cid: int, data: Dict[str, Any]) -> None: return upd_company(cid, data)
+@_cached("companies")
+def list_companies_page(after_key: Any = None, limit: int = 50, sort: str = "id",
+                        direction: str = "asc", filtros: dict | None = None) -> Dict[str, Any]:
+    """Página keyset de empresas: {"rows": [...], "next_key": cursor|None}."""
+    wh, args = _company_where(filtros)
+    with _connect() as conn:
+        return _keyset_page(conn, "*", "companies", wh, args, _COMPANY_SORT, "id",
+                            after_key, limit, sort, direction)
 
-def empresa_del(cid: int) -> None: return del_company(cid)
-def delete_empresa(cid: int) -> None: return del_company(cid)
-def remove_empresa(cid: int) -> None: return del_company(cid)
+@_cached("companies")
+def count_companies(filtros: dict | None = None) -> int:
+    wh, args = _company_where(filtros)
+    with _connect() as conn:
+        return _count_where(conn, "companies", wh, args)
 
-def company_get(cid: int) -> Optional[Dict[str, Any]]: return get_company(cid)
+# aliases (empresas_all, add_empresa, ...): COMPAT_ALIASES, seção 1
 
 # -----------------------------------------------------------------------------
 # 6) LICITAÇÕES — CRUD
 # -----------------------------------------------------------------------------
-def list_licitacoes() -> List[Dict[str, Any]]:
+_LICITACAO_COLS = """
+    L.id, L.empresa_id, C.name AS empresa_nome, L.orgao, L.modalidade, L.processo,
+    L.data_sessao, L.hora, L.qtd_itens, L.valor_estimado, L.link, L.tem_lotes, L.created_at,
+    L.data_sessao_iso, L.valor_estimado_centavos
+"""
+_LICITACAO_FROM = "licitacoes L LEFT JOIN companies C ON C.id = L.empresa_id"
+_LICITACAO_FROM_ALL = "licitacoes_all L LEFT JOIN companies C ON C.id = L.empresa_id"
+
+def _licitacao_source(filtros: dict | None):
+    """(colunas, FROM) — com include_archived, inclui as arquivadas (+ coluna `arquivada`)."""
+    if _with_archived(filtros):
+        return _LICITACAO_COLS + ", L.arquivada", _LICITACAO_FROM_ALL
+    return _LICITACAO_COLS, _LICITACAO_FROM
+_LICITACAO_SORT = {
+    "id": "L.id",
+    "orgao": "COALESCE(L.orgao,'')",
+    "modalidade": "COALESCE(L.modalidade,'')",
+    "processo": "COALESCE(L.processo,'')",
+    "empresa_nome": "COALESCE(C.name,'')",
+    "data_sessao": "COALESCE(L.data_sessao_iso,'')",
+    "valor_estimado": "COALESCE(L.valor_estimado_centavos,0)",
+    "created_at": "COALESCE(L.created_at,'')",
+}
+
+def _licitacao_where(filtros: dict | None):
+    """
+    filtros: empresa_id, modalidade (ou 'Todas'), q (órgão/processo/modalidade),
+             sessao_de / sessao_ate (período da sessão; date ou dd/mm/aaaa ou ISO),
+             sem_data_iso (só sessões em texto livre, fora da coluna ISO),
+             include_archived (também as do arquivo morto).
+    """
+    filtros = filtros or {}
+    wh, args = [], []
+    emp = filtros.get("empresa_id")
+    mod = filtros.get("modalidade")
+    q = filtros.get("q")
+    if emp not in (None, "", 0):
+        wh.append("L.empresa_id = ?"); args.append(emp)
+    if mod and mod not in ("Todas", "Todos"):
+        wh.append("L.modalidade = ?"); args.append(mod)
+    if q:
+        like = f"%{str(q).strip()}%"
+        wh.append("(L.orgao LIKE ? OR L.processo LIKE ? OR L.modalidade LIKE ?)")
+        args.extend([like, like, like])
+    _date_range(wh, args, "L.data_sessao_iso", filtros.get("sessao_de"), filtros.get("sessao_ate"))
+    _iso_missing(wh, "L.data_sessao", "L.data_sessao_iso", filtros.get("sem_data_iso"))
+    _ids_in(wh, args, "L.id", filtros.get("ids"))
+    return wh, args
+
+@_cached("licitacoes", "companies")
+def list_licitacoes(filtros: dict | None = None) -> List[Dict[str, Any]]:
+    """Todas as licitações (ou só as dos filtros de _licitacao_where), por ID."""
+    wh, args = _licitacao_where(filtros)
+    where = ("WHERE " + " AND ".join(wh)) if wh else ""
+    cols, src = _licitacao_source(filtros)
     with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_licitacoes(conn)
-        sql = """
-        SELECT
-            L.id,
-            L.empresa_id,
-            C.name AS empresa_nome,
-            L.orgao,
-            L.modalidade,
-            L.processo,
-            L.data_sessao,
-            L.hora,
-            L.qtd_itens,
-            L.valor_estimado,
-            L.link,
-            L.tem_lotes,
-            L.created_at
-        FROM licitacoes L
-        LEFT JOIN companies C ON C.id = L.empresa_id
-        ORDER BY L.id ASC
-        """
-        return conn.execute(sql).fetchall() or []
+        return conn.execute(f"""
+            SELECT {cols}
+              FROM {src}
+            {where}
+          ORDER BY L.id ASC
+        """, args).fetchall() or []
+
+@_cached("licitacoes", "companies")
+def list_licitacoes_page(after_key: Any = None, limit: int = 50, sort: str = "id",
+                         direction: str = "asc", filtros: dict | None = None) -> Dict[str, Any]:
+    """Página keyset de licitações (mesmas colunas de list_licitacoes)."""
+    wh, args = _licitacao_where(filtros)
+    cols, src = _licitacao_source(filtros)
+    with _connect() as conn:
+        return _keyset_page(conn, cols, src, wh, args,
+                            _LICITACAO_SORT, "L.id", after_key, limit, sort, direction)
+
+@_cached("licitacoes")
+def count_licitacoes(filtros: dict | None = None) -> int:
+    wh, args = _licitacao_where(filtros)
+    # os filtros só tocam colunas de L: dispensa o JOIN
+    with _connect() as conn:
+        return _count_where(conn, "licitacoes_all L" if _with_archived(filtros) else "licitacoes L",
+                            wh, args)
+
+_LICITACAO_FIELDS = ("id","empresa_id","orgao","modalidade","processo",
+                     "data_sessao","hora","qtd_itens","valor_estimado",
+                     "link","tem_lotes","created_at")
+
+def _licitacao_values(data: Dict[str, Any]) -> tuple:
+    """Valores de empresa_id..tem_lotes (ordem de _LICITACAO_FIELDS sem id/created_at)."""
+    return (
+        int((data.get("empresa_id") or 0) or 0) or None,
+        _g(data,"orgao"),
+        _g(data,"modalidade"),
+        _g(data,"processo"),
+        _g(data,"data_sessao","data"),
+        _g(data,"hora"),
+        _g(data,"qtd_itens","itens"),
+        _g(data,"valor_estimado","valor"),
+        _g(data,"link","url"),
+        _bool01(data.get("tem_lotes",0)),
+    )
 
 def add_licitacao(data: Dict[str, Any]) -> int:
     with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_licitacoes(conn)
 
         lid = _smallest_free_id(conn, "licitacoes")
         now = date.today().isoformat()
-        fields = ("id","empresa_id","orgao","modalidade","processo",
-                  "data_sessao","hora","qtd_itens","valor_estimado",
-                  "link","tem_lotes","created_at")
-        payload = (
-            lid,
-            int((data.get("empresa_id") or 0) or 0) or None,
-            _g(data,"orgao"),
-            _g(data,"modalidade"),
-            _g(data,"processo"),
-            _g(data,"data_sessao","data"),
-            _g(data,"hora"),
-            _g(data,"qtd_itens","itens"),
-            _g(data,"valor_estimado","valor"),
-            _g(data,"link","url"),
-            _bool01(data.get("tem_lotes",0)),
-            now
-        )
-        qmarks = ",".join(["?"]*len(fields))
-        conn.execute(f"INSERT INTO licitacoes ({','.join(fields)}) VALUES ({qmarks})", payload)
+        payload = (lid,) + _licitacao_values(data) + (now,)
+        qmarks = ",".join(["?"]*len(_LICITACAO_FIELDS))
+        conn.execute(f"INSERT INTO licitacoes ({','.join(_LICITACAO_FIELDS)}) VALUES ({qmarks})", payload)
         conn.commit()
+        _bump(conn, "licitacoes")
+        _emit("licitacoes", _events.INSERT, lid)
         return lid
 
+def add_licitacoes_bulk(rows, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Insere muitas licitações numa única transação (executemany por lote).
+    Mesmos campos/aliases de add_licitacao. Retorna {"inserted": n, "ids": [...]}.
+    """
+    ids: List[int] = []
+    now = date.today().isoformat()
+    qmarks = ",".join(["?"]*len(_LICITACAO_FIELDS))
+    with _connect() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for chunk in _batched(rows, batch_size):
+            chunk = [d for d in chunk if d]
+            new_ids = _ids.next_ids(conn, "licitacoes", len(chunk))
+            conn.executemany(
+                f"INSERT INTO licitacoes ({','.join(_LICITACAO_FIELDS)}) VALUES ({qmarks})",
+                [(lid,) + _licitacao_values(d) + (now,) for lid, d in zip(new_ids, chunk)],
+            )
+            ids.extend(new_ids)
+        conn.commit()
+        _bump(conn, "licitacoes")
+    if ids:
+        _emit("licitacoes", _events.INSERT, ids)
+    return {"inserted": len(ids), "ids": ids}
+
 def upd_licitacao(lid: int, data: Dict[str, Any]) -> None:
     with _connect() as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        _ensure_licitacoes(conn)
         sets = [
             ("empresa_id", int((data.get("empresa_id") or 0) or 0) or None),
             ("orgao", _g(data,"orgao")),
@@ -489,21 +822,17 @@ def upd_licitacao(lid: int, data: Dict[str, Any]) -> None:
         params = [v for _,v in sets] + [int(lid)]
         conn.execute(sql, params)
         conn.commit()
+        _bump(conn, "licitacoes")
+        _emit("licitacoes", _events.UPDATE, int(lid))
 
 def del_licitacao(lid: int) -> None:
     with _connect() as conn:
         conn.execute("DELETE FROM licitacoes WHERE id=?", (int(lid),))
         conn.commit()
+        _bump(conn, "licitacoes")
+        _emit("licitacoes", _events.DELETE, int(lid))
 
-# aliases compat
-def licitacoes_all() -> List[Dict[str, Any]]: return list_licitacoes()
-def get_licitacoes() -> List[Dict[str, Any]]: return list_licitacoes()
-def licitacao_add(data: Dict[str, Any]) -> int: return add_licitacao(data)
-def nova_licitacao(data: Dict[str, Any]) -> int: return add_licitacao(data)
-def update_licitacao(lid: int, data: Dict[str, Any]) -> None: return upd_licitacao(lid, data)
-def licitacao_upd(lid: int, data: Dict[str, Any]) -> None: return upd_licitacao(lid, data)
-def delete_licitacao(lid: int) -> None: return del_licitacao(lid)
-def licitacao_del(lid: int) -> None: return del_licitacao(lid)
+# aliases (licitacoes_all, nova_licitacao, ...): COMPAT_ALIASES, seção 1
 
 # ============================
 # Banco de Preços — CRUD nativo
@@ -511,65 +840,6 @@ def licitacao_del(lid: int) -> None: return del_licitacao(lid)
 import sqlite3
 from services.storage import DB_PATH  # já deve existir no arquivo; mantém por segurança
 
-def _bp__table_exists(conn, name: str) -> bool:
-    return conn.execute(
-        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
-    ).fetchone() is not None
-
-def _bp__columns(conn, table: str) -> set[str]:
-    try:
-        info = conn.execute(f"PRAGMA table_info({table})").fetchall() or []
-        return { (r[1] if isinstance(r, tuple) else r["name"]) for r in info }
-    except Exception:
-        return set()
-
-def _bp__ensure_banco_precos():
-    """Defensivo: garante a existência/colunas/índices mesmo sem rodar migrations."""
-    con = sqlite3.connect(DB_PATH)
-    try:
-        if not _bp__table_exists(con, "banco_precos"):
-            con.executescript("""
-                CREATE TABLE IF NOT EXISTS banco_precos (
-                    id INTEGER PRIMARY KEY,
-                    produto TEXT NOT NULL,
-                    categoria TEXT,
-                    tipo_origem TEXT,
-                    origem_nome TEXT,
-                    marca TEXT,
-                    unidade TEXT,
-                    embalagem TEXT,
-                    preco REAL,
-                    data_coleta TEXT,
-                    link TEXT,
-                    observacoes TEXT,
-                    created_at TEXT DEFAULT (datetime('now'))
-                );
-                CREATE INDEX IF NOT EXISTS idx_preco_produto  ON banco_precos(produto);
-                CREATE INDEX IF NOT EXISTS idx_preco_categoria ON banco_precos(categoria);
-                CREATE INDEX IF NOT EXISTS idx_preco_tipo      ON banco_precos(tipo_origem);
-                CREATE INDEX IF NOT EXISTS idx_preco_origem    ON banco_precos(origem_nome);
-                CREATE INDEX IF NOT EXISTS idx_preco_data      ON banco_precos(data_coleta);
-            """); con.commit()
-        else:
-            cols = _bp__columns(con, "banco_precos")
-            want = {
-                "produto":"TEXT","categoria":"TEXT","tipo_origem":"TEXT","origem_nome":"TEXT",
-                "marca":"TEXT","unidade":"TEXT","embalagem":"TEXT","preco":"REAL",
-                "data_coleta":"TEXT","link":"TEXT","observacoes":"TEXT","created_at":"TEXT"
-            }
-            for c, typ in want.items():
-                if c not in cols:
-                    con.execute(f"ALTER TABLE banco_precos ADD COLUMN {c} {typ}")
-            con.executescript("""
-                CREATE INDEX IF NOT EXISTS idx_preco_produto  ON banco_precos(produto);
-                CREATE INDEX IF NOT EXISTS idx_preco_categoria ON banco_precos(categoria);
-                CREATE INDEX IF NOT EXISTS idx_preco_tipo      ON banco_precos(tipo_origem);
-                CREATE INDEX IF NOT EXISTS idx_preco_origem    ON banco_precos(origem_nome);
-                CREATE INDEX IF NOT EXISTS idx_preco_data      ON banco_precos(data_coleta);
-            """); con.commit()
-    finally:
-        con.close()
-
 def _bp__money_to_float(v):
     if v is None: return None
     if isinstance(v, (int,float)): return float(v)
@@ -577,44 +847,157 @@ def _bp__money_to_float(v):
     try: return float(s)
     except Exception: return None
 
-# -------- LIST --------
-def list_banco_precos(filtros: dict | None = None):
+# ---- busca textual (FTS5, criado pela migração 3) ----
+_bp__fts_state: Dict[str, bool] = {}
+
+def _bp__fts_ready() -> bool:
+    """True se a base tem o índice banco_precos_fts (SQLite com FTS5)."""
+    ok = _bp__fts_state.get(DB_PATH)
+    if ok is None:
+        try:
+            with _connect() as con:
+                ok = con.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='banco_precos_fts'"
+                ).fetchone() is not None
+        except Exception:
+            ok = False
+        _bp__fts_state[DB_PATH] = ok
+    return ok
+
+def _bp__fts_query(q: str) -> str:
     """
-    Lista registros do banco de preços.
-    filtros opcionais:
-      - categoria: str | "Todas"
-      - tipo_origem: str | "Todos"
-      - q: str (busca em produto/origem_nome/marca)
+    Converte o texto digitado numa consulta FTS5 segura: cada palavra vira
+    um termo de prefixo entre aspas ("arr" "tip" -> "arr"* AND "tip"*).
     """
-    _bp__ensure_banco_precos()
+    terms = re.findall(r"\w+", str(q or ""), flags=re.UNICODE)
+    return " ".join(f'"{t}"*' for t in terms)
+
+def _bp__values(data: dict) -> tuple:
+    """Valores na ordem das colunas de INSERT/UPDATE (preço normalizado)."""
+    return (
+        data.get("produto"),
+        data.get("categoria"),
+        data.get("tipo_origem"),
+        data.get("origem_nome"),
+        data.get("marca"),
+        data.get("unidade"),
+        data.get("embalagem"),
+        _bp__money_to_float(data.get("preco")),
+        data.get("data_coleta"),
+        data.get("link"),
+        data.get("observacoes"),
+    )
+
+def _bp__where(filtros: dict | None, alias: str = ""):
+    """Condições dos filtros do banco de preços; `alias` qualifica as colunas (ex.: "b" num JOIN)."""
     filtros = filtros or {}
     categoria = filtros.get("categoria")
     tipo      = filtros.get("tipo_origem")
     q         = filtros.get("q")
+    c = f"{alias}." if alias else ""
 
     where, args = [], []
     if categoria and categoria != "Todas":
-        where.append("categoria = ?"); args.append(categoria)
+        where.append(f"{c}categoria = ?"); args.append(categoria)
     if tipo and tipo != "Todos":
-        where.append("tipo_origem = ?"); args.append(tipo)
+        where.append(f"{c}tipo_origem = ?"); args.append(tipo)
     if q:
-        like = f"%{q.strip()}%"
-        where.append("(produto LIKE ? OR origem_nome LIKE ? OR marca LIKE ?)")
-        args.extend([like, like, like])
+        # o índice FTS só cobre a tabela quente: com arquivo, LIKE
+        match = _bp__fts_query(q) if _bp__fts_ready() and not _with_archived(filtros) else None
+        if match:
+            where.append(f"{c}id IN (SELECT rowid FROM banco_precos_fts WHERE banco_precos_fts MATCH ?)")
+            args.append(match)
+        else:
+            like = f"%{q.strip()}%"
+            where.append(f"({c}produto LIKE ? OR {c}origem_nome LIKE ? OR {c}marca LIKE ?)")
+            args.extend([like, like, like])
+    _date_range(where, args, f"{c}data_coleta_iso", filtros.get("coleta_de"), filtros.get("coleta_ate"))
+    _ids_in(where, args, f"{c}id", filtros.get("ids"))
 
+    return where, args
+
+# -------- LIST --------
+@_cached("banco_precos")
+def list_banco_precos(filtros: dict | None = None):
+    """
+    Lista registros do banco de preços.
+    filtros opcionais:
+      - categoria: str | "Todas"
+      - tipo_origem: str | "Todos"
+      - q: str (busca em produto/origem_nome/marca)
+      - coleta_de / coleta_ate: período da data de coleta
+      - include_archived: também os registros do arquivo morto (+ coluna `arquivada`)
+    """
+    where, args = _bp__where(filtros)
     where_sql = ("WHERE " + " AND ".join(where)) if where else ""
-    con = sqlite3.connect(DB_PATH); con.row_factory = sqlite3.Row
-    try:
+    cols, src = _bp__source(filtros)
+    with _connect() as con:
         rows = con.execute(f"""
-            SELECT id, produto, categoria, tipo_origem, origem_nome, marca,
-                   unidade, embalagem, preco, data_coleta, link, observacoes
-            FROM banco_precos
+            SELECT {cols}
+            FROM {src}
             {where_sql}
             ORDER BY id DESC
         """, args).fetchall() or []
-        return [dict(r) for r in rows]
-    finally:
-        con.close()
+        return rows
+
+_BP_COLS = """id, produto, categoria, tipo_origem, origem_nome, marca,
+              unidade, embalagem, preco, data_coleta, link, observacoes"""
+
+def _bp__source(filtros: dict | None):
+    if _with_archived(filtros):
+        return _BP_COLS + ", arquivada", "banco_precos_all"
+    return _BP_COLS, "banco_precos"
+
+_BP_SORT = {
+    "id": "id",
+    "produto": "COALESCE(produto,'')",
+    "categoria": "COALESCE(categoria,'')",
+    "origem_nome": "COALESCE(origem_nome,'')",
+    "marca": "COALESCE(marca,'')",
+    "preco": "COALESCE(preco,0)",
+    "data_coleta": "COALESCE(data_coleta_iso,'')",
+}
+
+@_cached("banco_precos")
+def list_banco_precos_page(after_key=None, limit: int = 50, sort: str = "id",
+                           direction: str = "desc", filtros: dict | None = None) -> dict:
+    """Página keyset (mesmos filtros de list_banco_precos; padrão id DESC)."""
+    where, args = _bp__where(filtros)
+    cols, src = _bp__source(filtros)
+    with _connect() as con:
+        return _keyset_page(con, cols, src, where, args,
+                            _BP_SORT, "id", after_key, limit, sort, direction)
+
+@_cached("banco_precos")
+def count_banco_precos(filtros: dict | None = None) -> int:
+    where, args = _bp__where(filtros)
+    with _connect() as con:
+        return _count_where(con, _bp__source(filtros)[1], where, args)
+
+# -------- BUSCA (BM25) --------
+@_cached("banco_precos")
+def search_banco_precos(q: str, filtros: dict | None = None, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Busca por relevância (BM25) em produto/marca/origem/observações, sem
+    acento e por prefixo. Aceita os mesmos filtros de categoria/tipo_origem
+    de list_banco_precos. Sem FTS5 (ou sem termos), cai em list_banco_precos.
+    """
+    match = _bp__fts_query(q)
+    if not match or not _bp__fts_ready() or _with_archived(filtros):
+        rows = list_banco_precos({**(filtros or {}), "q": q})
+        return rows[:limit] if limit else rows
+    where, args = _bp__where({k: v for k, v in (filtros or {}).items() if k != "q"}, alias="b")
+    where = ["banco_precos_fts MATCH ?"] + where
+    with _connect() as con:
+        return con.execute(f"""
+            SELECT b.id, b.produto, b.categoria, b.tipo_origem, b.origem_nome, b.marca,
+                   b.unidade, b.embalagem, b.preco, b.data_coleta, b.link, b.observacoes
+              FROM banco_precos_fts
+              JOIN banco_precos b ON b.id = banco_precos_fts.rowid
+             WHERE {" AND ".join(where)}
+          ORDER BY bm25(banco_precos_fts, 10.0, 4.0, 3.0, 1.0), b.id DESC
+             LIMIT ?
+        """, [match] + args + [int(limit or -1)]).fetchall() or []
 
 # -------- ADD --------
 def add_banco_preco(data: dict) -> int:
@@ -623,71 +1006,120 @@ def add_banco_preco(data: dict) -> int:
     Campos aceitos: produto (obrigatório), categoria, tipo_origem, origem_nome, marca,
                     unidade, embalagem, preco, data_coleta, link, observacoes
     """
-    _bp__ensure_banco_precos()
-    con = sqlite3.connect(DB_PATH); cur = con.cursor()
-    try:
+    with _connect() as con:
+        # ID explícito acima do piso dos arquivados (id_alloc.top_id), sob o lock de escrita
+        if not con.in_transaction:
+            con.execute("BEGIN IMMEDIATE")
+        cur = con.cursor()
         cur.execute("""
             INSERT INTO banco_precos
-                (produto, categoria, tipo_origem, origem_nome, marca,
+                (id, produto, categoria, tipo_origem, origem_nome, marca,
                  unidade, embalagem, preco, data_coleta, link, observacoes)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?)
-        """, (
-            data.get("produto"),
-            data.get("categoria"),
-            data.get("tipo_origem"),
-            data.get("origem_nome"),
-            data.get("marca"),
-            data.get("unidade"),
-            data.get("embalagem"),
-            _bp__money_to_float(data.get("preco")),
-            data.get("data_coleta"),
-            data.get("link"),
-            data.get("observacoes"),
-        ))
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+        """, (_ids.top_id(con, "banco_precos") + 1,) + _bp__values(data))
         con.commit()
+        _bump(con, "banco_precos")
+        _emit("banco_precos", _events.INSERT, cur.lastrowid)
         return cur.lastrowid
-    finally:
-        con.close()
+
+# -------- BULK --------
+def add_banco_precos_bulk(rows: Iterable[dict], batch_size: int = 1000,
+                          upsert: bool = False) -> Dict[str, Any]:
+    """
+    Insere muitos registros numa ÚNICA transação (executemany em lotes de
+    `batch_size`; o iterável é consumido aos poucos). Mesmos campos e mesma
+    normalização de preço de add_banco_preco.
+
+    upsert=True: registro com a mesma chave natural (produto, origem_nome,
+    data_coleta) já existente é ATUALIZADO em vez de duplicado; repetições
+    dentro da carga valem pela última.
+
+    Retorna {"inserted": n, "updated": n, "ids": [ids inseridos, em ordem]}.
+    """
+    inserted, updated, ids, upd_ids = 0, 0, [], []
+    with _connect() as con:
+        if not con.in_transaction:
+            con.execute("BEGIN IMMEDIATE")
+        cur = con.cursor()
+        cur.row_factory = None
+        for chunk in _batched(rows, batch_size):
+            values = [_bp__values(d) for d in chunk if d]
+            if upsert:
+                values, upd = _bp__split_existing(cur, values)
+                if upd:
+                    cur.executemany("""
+                        UPDATE banco_precos
+                           SET produto=?, categoria=?, tipo_origem=?, origem_nome=?, marca=?,
+                               unidade=?, embalagem=?, preco=?, data_coleta=?, link=?, observacoes=?
+                         WHERE id=?
+                    """, upd)
+                    updated += len(upd)
+                    upd_ids.extend(v[-1] for v in upd)
+            if not values:
+                continue
+            # com o lock de escrita: IDs = topo (MAX(id) ou piso dos arquivados)+1 .. +n
+            top = _ids.top_id(con, "banco_precos")
+            cur.executemany("""
+                INSERT INTO banco_precos
+                    (id, produto, categoria, tipo_origem, origem_nome, marca,
+                     unidade, embalagem, preco, data_coleta, link, observacoes)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+            """, [(top + 1 + i,) + v for i, v in enumerate(values)])
+            ids.extend(range(top + 1, top + 1 + len(values)))
+            inserted += len(values)
+        con.commit()
+        _bump(con, "banco_precos")
+    if ids:
+        _emit("banco_precos", _events.INSERT, ids)
+    if upd_ids:
+        _emit("banco_precos", _events.UPDATE, upd_ids)
+    return {"inserted": inserted, "updated": updated, "ids": ids}
+
+def _bp__split_existing(cur: sqlite3.Cursor, values: List[tuple]):
+    """Separa um lote em (inserts, updates) pela chave (produto, origem_nome, data_coleta)."""
+    last: Dict[tuple, tuple] = {}
+    for v in values:  # repetidos no lote: vale o último
+        last[(v[0], v[3], v[8])] = v
+    existing: Dict[tuple, int] = {}
+    produtos = list({k[0] for k in last})
+    for part in _batched(produtos, 500):
+        qms = ",".join("?" * len(part))
+        for rid, produto, origem, data_c in cur.execute(f"""
+            SELECT id, produto, origem_nome, data_coleta FROM banco_precos
+             WHERE produto IN ({qms}) ORDER BY id
+        """, part):
+            existing.setdefault((produto, origem, data_c), rid)
+    inserts, updates = [], []
+    for key, v in last.items():
+        rid = existing.get(key)
+        if rid is None:
+            inserts.append(v)
+        else:
+            updates.append(v + (rid,))
+    return inserts, updates
 
 # -------- UPD --------
 def upd_banco_preco(row_id: int, data: dict) -> None:
     """Atualiza um registro por ID."""
-    _bp__ensure_banco_precos()
-    con = sqlite3.connect(DB_PATH)
-    try:
+    with _connect() as con:
         con.execute("""
             UPDATE banco_precos
                SET produto=?, categoria=?, tipo_origem=?, origem_nome=?, marca=?,
                    unidade=?, embalagem=?, preco=?, data_coleta=?, link=?, observacoes=?
              WHERE id=?
-        """, (
-            data.get("produto"),
-            data.get("categoria"),
-            data.get("tipo_origem"),
-            data.get("origem_nome"),
-            data.get("marca"),
-            data.get("unidade"),
-            data.get("embalagem"),
-            _bp__money_to_float(data.get("preco")),
-            data.get("data_coleta"),
-            data.get("link"),
-            data.get("observacoes"),
-            row_id
-        ))
+        """, _bp__values(data) + (row_id,))
         con.commit()
-    finally:
-        con.close()
+        _bump(con, "banco_precos")
+        _emit("banco_precos", _events.UPDATE, row_id)
 
 # -------- DEL --------
 def del_banco_preco(row_id: int) -> None:
     """Exclui um registro por ID."""
-    _bp__ensure_banco_precos()
-    con = sqlite3.connect(DB_PATH)
-    try:
+    with _connect() as con:
         con.execute("DELETE FROM banco_precos WHERE id=?", (row_id,))
         con.commit()
-    finally:
-        con.close()
+        _bump(con, "banco_precos")
+        _emit("banco_precos", _events.DELETE, row_id)
 
 # ============================
 # Certidões — CRUD nativo
@@ -695,60 +1127,7 @@ def del_banco_preco(row_id: int) -> None:
 import sqlite3
 from services.storage import DB_PATH
 
-def _ct__table_exists(conn, name: str) -> bool:
-    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
-
-def _ct__columns(conn, table: str) -> set[str]:
-    try:
-        info = conn.execute(f"PRAGMA table_info({table})").fetchall() or []
-        return {(r[1] if isinstance(r, tuple) else r["name"]) for r in info}
-    except Exception:
-        return set()
-
-def _ct__ensure():
-    con = sqlite3.connect(DB_PATH)
-    try:
-        if not _ct__table_exists(con, "certidoes"):
-            con.executescript("""
-                CREATE TABLE IF NOT EXISTS certidoes (
-                    id INTEGER PRIMARY KEY,
-                    empresa_id INTEGER,
-                    tipo TEXT,
-                    orgao_emissor TEXT,
-                    numero TEXT,
-                    situacao TEXT,
-                    dt_emissao TEXT,
-                    dt_validade TEXT,
-                    link_consulta TEXT,
-                    arquivo TEXT,
-                    observacoes TEXT,
-                    created_at TEXT DEFAULT (datetime('now'))
-                );
-                CREATE INDEX IF NOT EXISTS idx_cert_empresa  ON certidoes(empresa_id);
-                CREATE INDEX IF NOT EXISTS idx_cert_tipo     ON certidoes(tipo);
-                CREATE INDEX IF NOT EXISTS idx_cert_situacao ON certidoes(situacao);
-                CREATE INDEX IF NOT EXISTS idx_cert_validade ON certidoes(dt_validade);
-            """); con.commit()
-        else:
-            cols = _ct__columns(con, "certidoes")
-            need = {
-                "empresa_id":"INTEGER","tipo":"TEXT","orgao_emissor":"TEXT","numero":"TEXT",
-                "situacao":"TEXT","dt_emissao":"TEXT","dt_validade":"TEXT","link_consulta":"TEXT",
-                "arquivo":"TEXT","observacoes":"TEXT","created_at":"TEXT"
-            }
-            for c,t in need.items():
-                if c not in cols:
-                    con.execute(f"ALTER TABLE certidoes ADD COLUMN {c} {t}")
-            con.commit()
-    finally:
-        con.close()
-
-def list_certidoes(filtros: dict | None = None):
-    """
-    filtros: empresa_id, situacao (Válida|Vencida|Pendente ou 'Todas'),
-             tipo (string ou 'Todos'), q (busca: número/órgão/tipo)
-    """
-    _ct__ensure()
+def _ct__where(filtros: dict | None):
     filtros = filtros or {}
     wh, args = [], []
     emp = filtros.get("empresa_id")
@@ -765,44 +1144,85 @@ def list_certidoes(filtros: dict | None = None):
         like = f"%{q.strip()}%"
         wh.append("(c.numero LIKE ? OR c.orgao_emissor LIKE ? OR c.tipo LIKE ?)")
         args.extend([like, like, like])
+    _date_range(wh, args, "c.dt_validade_iso", filtros.get("validade_de"), filtros.get("validade_ate"))
+    _iso_missing(wh, "c.dt_validade", "c.dt_validade_iso", filtros.get("sem_data_iso"))
+    _ids_in(wh, args, "c.id", filtros.get("ids"))
+    return wh, args
+
+@_cached("certidoes", "companies")
+def list_certidoes(filtros: dict | None = None):
+    """
+    filtros: empresa_id, situacao (Válida|Vencida|Pendente ou 'Todas'),
+             tipo (string ou 'Todos'), q (busca: número/órgão/tipo),
+             validade_de / validade_ate (período da validade),
+             sem_data_iso (só validades em texto livre, fora da coluna ISO),
+             include_archived (também as do arquivo morto; colunas arquivada/archived_at)
+    """
+    wh, args = _ct__where(filtros)
     where = ("WHERE " + " AND ".join(wh)) if wh else ""
-    con = sqlite3.connect(DB_PATH); con.row_factory = sqlite3.Row
-    try:
+    with _connect() as con:
         rows = con.execute(f"""
             SELECT c.*, COALESCE(e.name,'') AS empresa
-              FROM certidoes c
+              FROM {_ct__table(filtros)} c
          LEFT JOIN companies e ON e.id = c.empresa_id
             {where}
           ORDER BY c.id DESC
         """, args).fetchall() or []
-        return [dict(r) for r in rows]
-    finally:
-        con.close()
+        return rows
+
+def _ct__table(filtros: dict | None) -> str:
+    return "certidoes_all" if _with_archived(filtros) else "certidoes"
+
+_CT_SORT = {
+    "id": "c.id",
+    "tipo": "COALESCE(c.tipo,'')",
+    "situacao": "COALESCE(c.situacao,'')",
+    "orgao_emissor": "COALESCE(c.orgao_emissor,'')",
+    "empresa": "COALESCE(e.name,'')",
+    "dt_validade": "COALESCE(c.dt_validade_iso,'')",
+}
+
+@_cached("certidoes", "companies")
+def list_certidoes_page(after_key=None, limit: int = 50, sort: str = "id",
+                        direction: str = "desc", filtros: dict | None = None) -> dict:
+    """Página keyset (mesmos filtros de list_certidoes; padrão id DESC)."""
+    wh, args = _ct__where(filtros)
+    with _connect() as con:
+        return _keyset_page(con, "c.*, COALESCE(e.name,'') AS empresa",
+                            f"{_ct__table(filtros)} c LEFT JOIN companies e ON e.id = c.empresa_id",
+                            wh, args, _CT_SORT, "c.id", after_key, limit, sort, direction)
+
+@_cached("certidoes")
+def count_certidoes(filtros: dict | None = None) -> int:
+    wh, args = _ct__where(filtros)
+    with _connect() as con:
+        return _count_where(con, f"{_ct__table(filtros)} c", wh, args)
+
 
 def add_certidao(data: dict) -> int:
-    _ct__ensure()
-    con = sqlite3.connect(DB_PATH); cur = con.cursor()
-    try:
+    with _connect() as con:
+        if not con.in_transaction:   # ID = topo + 1 (id_alloc.top_id) sob o lock de escrita
+            con.execute("BEGIN IMMEDIATE")
+        cur = con.cursor()
         cur.execute("""
             INSERT INTO certidoes
-                (empresa_id, tipo, orgao_emissor, numero, situacao,
+                (id, empresa_id, tipo, orgao_emissor, numero, situacao,
                  dt_emissao, dt_validade, link_consulta, arquivo, observacoes)
-            VALUES (?,?,?,?,?,?,?,?,?,?)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?)
         """, (
+            _ids.top_id(con, "certidoes") + 1,
             data.get("empresa_id"), data.get("tipo"), data.get("orgao_emissor"),
             data.get("numero"), data.get("situacao"), data.get("dt_emissao"),
             data.get("dt_validade"), data.get("link_consulta"),
             data.get("arquivo"), data.get("observacoes"),
         ))
         con.commit()
+        _bump(con, "certidoes")
+        _emit("certidoes", _events.INSERT, cur.lastrowid)
         return cur.lastrowid
-    finally:
-        con.close()
 
 def upd_certidao(row_id: int, data: dict) -> None:
-    _ct__ensure()
-    con = sqlite3.connect(DB_PATH)
-    try:
+    with _connect() as con:
         con.execute("""
             UPDATE certidoes
                SET empresa_id=?, tipo=?, orgao_emissor=?, numero=?, situacao=?,
@@ -815,14 +1235,135 @@ def upd_certidao(row_id: int, data: dict) -> None:
             data.get("arquivo"), data.get("observacoes"), row_id
         ))
         con.commit()
-    finally:
-        con.close()
+        _bump(con, "certidoes")
+        _emit("certidoes", _events.UPDATE, row_id)
 
 def del_certidao(row_id: int) -> None:
-    _ct__ensure()
-    con = sqlite3.connect(DB_PATH)
-    try:
+    with _connect() as con:
         con.execute("DELETE FROM certidoes WHERE id=?", (row_id,))
         con.commit()
-    finally:
-        con.close()
+        _bump(con, "certidoes")
+        _emit("certidoes", _events.DELETE, row_id)
+
+# ============================
+# Valores em centavos — agregações no SQLite
+# (colunas *_centavos mantidas por trigger; migração 5)
+# ============================
+def format_centavos(c) -> str:
+    """123456 -> 'R$ 1.234,56' (None/'' -> '')."""
+    if c in (None, ""):
+        return ""
+    n = int(c)
+    sinal, n = ("-" if n < 0 else ""), abs(n)
+    reais = f"{n // 100:,}".replace(",", ".")
+    return f"{sinal}R$ {reais},{n % 100:02d}"
+
+def _money_agg(conn: sqlite3.Connection, from_sql: str, cents_col: str,
+               group_expr: Optional[str], where: List[str], args: List[Any]) -> List[Dict[str, Any]]:
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    grupo = group_expr or "NULL"
+    tail = f"GROUP BY {group_expr} ORDER BY soma_centavos DESC" if group_expr else ""
+    return conn.execute(f"""
+        SELECT {grupo}                                   AS grupo,
+               COUNT(*)                                  AS qtd,
+               COUNT({cents_col})                        AS qtd_valor,
+               COALESCE(SUM({cents_col}), 0)             AS soma_centavos,
+               CAST(ROUND(AVG({cents_col})) AS INTEGER)  AS media_centavos,
+               MIN({cents_col})                          AS min_centavos,
+               MAX({cents_col})                          AS max_centavos
+          FROM {from_sql}
+        {where_sql}
+        {tail}
+    """, args).fetchall() or []
+
+_LIC_GROUPS = {
+    "empresa": "COALESCE(C.name,'')",
+    "empresa_id": "L.empresa_id",
+    "orgao": "COALESCE(L.orgao,'')",
+    "modalidade": "COALESCE(L.modalidade,'')",
+}
+
+@_cached("licitacoes", "companies")
+def licitacoes_valores(por: Optional[str] = "empresa", filtros: dict | None = None) -> List[Dict[str, Any]]:
+    """
+    Soma/média/mín/máx do valor estimado (em centavos), agrupado por
+    'empresa' | 'empresa_id' | 'orgao' | 'modalidade' (None = total geral).
+    Aceita os filtros de list_licitacoes (inclusive período da sessão).
+    """
+    wh, args = _licitacao_where(filtros)
+    group = _LIC_GROUPS.get(por) if por else None
+    with _connect() as conn:
+        return _money_agg(conn, _LICITACAO_FROM, "L.valor_estimado_centavos", group, wh, args)
+
+_BP_GROUPS = {
+    "categoria": "COALESCE(categoria,'')",
+    "produto": "produto",
+    "origem": "COALESCE(origem_nome,'')",
+    "tipo_origem": "COALESCE(tipo_origem,'')",
+}
+
+@_cached("banco_precos")
+def banco_precos_valores(por: Optional[str] = "categoria", filtros: dict | None = None) -> List[Dict[str, Any]]:
+    """
+    Estatísticas de preço (centavos) por 'categoria' | 'produto' | 'origem' |
+    'tipo_origem' (None = geral), com os filtros de list_banco_precos.
+    """
+    where, args = _bp__where(filtros)
+    group = _BP_GROUPS.get(por) if por else None
+    with _connect() as conn:
+        return _money_agg(conn, "banco_precos", "preco_centavos", group, where, args)
+
+# ============================
+# KPIs do dashboard — um único SELECT de COUNT/SUM
+# ============================
+_KPI_TABLES = ("companies", "certidoes", "licitacoes", "oportunidades")
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table','view') AND name=?", (name,)
+    ).fetchone() is not None
+
+@_cached(*_KPI_TABLES)
+def _kpis_at(hoje: str, janelas: tuple, aviso_certidoes: int) -> Dict[str, Any]:
+    d = lambda n: f"date(?, '+{int(n)} days')"
+    jan_sql = ",\n".join(
+        f"COALESCE(SUM(data_sessao_iso BETWEEN ? AND {d(n)}), 0) AS licitacoes_{int(n)}d"
+        for n in janelas)
+    jan_args: List[Any] = []
+    for _n in janelas:
+        jan_args += [hoje, hoje]
+    with _connect() as conn:
+        opo = ("(SELECT COUNT(*) AS oportunidades FROM oportunidades)"
+               if _table_exists(conn, "oportunidades") else "(SELECT NULL AS oportunidades)")
+        row = conn.execute(f"""
+            SELECT *
+              FROM (SELECT COUNT(*) AS empresas FROM companies),
+                   (SELECT COUNT(*)                                                    AS certidoes,
+                           COALESCE(SUM(dt_validade_iso IS NULL), 0)                   AS certidoes_sem_validade,
+                           COALESCE(SUM(dt_validade_iso < ?), 0)                       AS certidoes_vencidas,
+                           COALESCE(SUM(dt_validade_iso BETWEEN ? AND {d(aviso_certidoes)}), 0) AS certidoes_vencendo,
+                           COALESCE(SUM(dt_validade_iso > {d(aviso_certidoes)}), 0)    AS certidoes_validas
+                      FROM certidoes),
+                   (SELECT COUNT(*)                                                    AS licitacoes,
+                           COALESCE(SUM(data_sessao_iso >= ?), 0)                      AS licitacoes_futuras,
+                           COALESCE(SUM(CASE WHEN data_sessao_iso >= ?
+                                             THEN valor_estimado_centavos END), 0)     AS licitacoes_futuras_centavos,
+                           {jan_sql}
+                      FROM licitacoes),
+                   {opo}
+        """, [hoje, hoje, hoje, hoje, hoje, hoje] + jan_args).fetchone()
+    return dict(row or {})
+
+def kpis(hoje: Any = None, janelas: Iterable[int] = (1, 3, 7), aviso_certidoes: int = 15) -> Dict[str, Any]:
+    """
+    Contadores do dashboard numa ida ao banco (COUNT/SUM, nada de len(list_*())):
+      empresas; certidoes + certidoes_{vencidas,vencendo,validas,sem_validade}
+      (vencendo = validade entre hoje e hoje+aviso_certidoes);
+      licitacoes + licitacoes_futuras, licitacoes_futuras_centavos e
+      licitacoes_{n}d (sessão entre hoje e hoje+n, uma por janela);
+      oportunidades (None se a tabela não existe).
+    Fica no cache de leitura até companies/certidoes/licitacoes mudarem
+    (ou o dia virar: `hoje` faz parte da chave).
+    """
+    dia = _iso_day(hoje) or date.today().isoformat()
+    return _kpis_at(dia, tuple(sorted({int(n) for n in janelas})), int(aviso_certidoes))
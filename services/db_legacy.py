@@ -3,6 +3,9 @@ import sqlite3
 from datetime import date, timedelta, datetime
 from typing import List, Dict, Any, Optional, Tuple
 from .storage import DB_PATH
+from . import connection as _pool
+from . import id_alloc as _ids
+from . import money as _money
 
 SCHEMA_SQL = """
 PRAGMA foreign_keys = ON;
@@ -134,19 +137,15 @@ CREATE TABLE IF NOT EXISTS preco_registros (
 
 # --------------------- conexões util ---------------------
 def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    # Conexão persistente da thread (PRAGMAs aplicados uma única vez na abertura).
+    # `with _connect() as conn:` apenas delimita a transação; não fecha a conexão.
+    conn = _pool.get_connection(DB_PATH)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 def _smallest_free_id(conn: sqlite3.Connection, table: str) -> int:
-    cur = conn.execute(f"SELECT id FROM {table} ORDER BY id ASC")
-    used = [r[0] for r in cur.fetchall()]
-    i = 1
-    for v in used:
-        if v == i: i += 1
-        elif v > i: break
-    return i
+    # menor ID livre via free-list (services/id_alloc.py), sem varrer a tabela
+    return _ids.next_id(conn, table)
 
 # --------------------- inicialização/seed ----------------
 def init_db():
@@ -501,17 +500,66 @@ def del_cotacao_fornecedor(fid: int) -> None:
         conn.execute("DELETE FROM cotacao_fornecedores WHERE id=?", (fid,))
         conn.commit()
 
-# Respostas (preços)
+# Respostas (preços) — UNIQUE(fornecedor_id, item_id) desde a migração 7
+_RESPOSTA_UPSERT = """
+    INSERT INTO cotacao_respostas(id, fornecedor_id, item_id, preco_unit) VALUES (?,?,?,?)
+    ON CONFLICT(fornecedor_id, item_id) DO UPDATE SET preco_unit = excluded.preco_unit
+"""
+
 def set_preco_resposta(fornecedor_id: int, item_id: int, preco_unit: float) -> None:
     with _connect() as conn:
-        cur = conn.execute("SELECT id FROM cotacao_respostas WHERE fornecedor_id=? AND item_id=?", (fornecedor_id, item_id)).fetchone()
-        if cur:
-            conn.execute("UPDATE cotacao_respostas SET preco_unit=? WHERE id=?", (float(preco_unit), cur["id"]))
-        else:
-            rid = _smallest_free_id(conn, "cotacao_respostas")
-            conn.execute("INSERT INTO cotacao_respostas(id, fornecedor_id, item_id, preco_unit) VALUES (?,?,?,?)",
-                         (rid, fornecedor_id, item_id, float(preco_unit)))
+        conn.execute(_RESPOSTA_UPSERT, (_smallest_free_id(conn, "cotacao_respostas"),
+                                        fornecedor_id, item_id, float(preco_unit)))
+        conn.commit()
+
+def set_precos_resposta_matriz(matriz: Dict[int, Dict[int, Any]]) -> Dict[str, Any]:
+    """
+    Grava um bloco {fornecedor_id: {item_id: preço}} numa única transação
+    (planilha colada, várias colunas de fornecedor). Preço aceita 12.5,
+    "12,50" ou "R$ 1.234,56"; vazio/None apaga a resposta daquela célula.
+    Texto que não é preço ("N/A", "-") é ignorado — a resposta existente fica.
+    Retorna {"inserted", "updated", "deleted", "skipped",
+             "invalid": [(fornecedor_id, item_id, valor), ...]}.
+    """
+    inserted = updated = deleted = 0
+    invalid: List[Tuple[int, int, Any]] = []
+    with _connect() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for fid, precos in (matriz or {}).items():
+            fid = int(fid)
+            cells: Dict[int, float] = {}
+            limpar = []
+            for k, v in (precos or {}).items():
+                if v is None or (isinstance(v, str) and not v.strip()):
+                    limpar.append((fid, int(k)))
+                    continue
+                num = _preco_num(v)
+                if num is None:
+                    invalid.append((fid, int(k), v))
+                else:
+                    cells[int(k)] = num
+            if limpar:
+                deleted += conn.executemany(
+                    "DELETE FROM cotacao_respostas WHERE fornecedor_id=? AND item_id=?", limpar).rowcount
+            if not cells:
+                continue
+            existing = {r[0] for r in conn.execute(
+                "SELECT item_id FROM cotacao_respostas WHERE fornecedor_id=?", (fid,))}
+            novos = [k for k in cells if k not in existing]
+            new_ids = iter(_ids.next_ids(conn, "cotacao_respostas", len(novos)))
+            # id NULL nas existentes: o ON CONFLICT atualiza só o preço
+            conn.executemany(_RESPOSTA_UPSERT, [
+                (None if k in existing else next(new_ids), fid, k, v) for k, v in cells.items()])
+            inserted += len(novos)
+            updated += len(cells) - len(novos)
         conn.commit()
+    return {"inserted": inserted, "updated": updated, "deleted": deleted,
+            "skipped": len(invalid), "invalid": invalid}
+
+def set_precos_resposta_bulk(fornecedor_id: int, precos: Dict[int, Any]) -> Dict[str, Any]:
+    """Coluna inteira de um fornecedor {item_id: preço} numa transação (ver set_precos_resposta_matriz)."""
+    return set_precos_resposta_matriz({fornecedor_id: precos})
 
 def get_preco_resposta(fornecedor_id: int, item_id: int) -> Optional[float]:
     with _connect() as conn:
@@ -519,25 +567,119 @@ def get_preco_resposta(fornecedor_id: int, item_id: int) -> Optional[float]:
                          (fornecedor_id, item_id)).fetchone()
         return None if r is None else float(r["preco_unit"])
 
+# Ranking: um JOIN agregado (antes: 1 SELECT por par fornecedor×item).
+# Resposta sem item da mesma cotação não entra; item sem preço conta 0.
+_RANKING_SQL = """
+    SELECT f.cotacao_id                                        AS cotacao_id,
+           f.id                                                AS fornecedor_id,
+           f.nome                                              AS fornecedor,
+           COALESCE(SUM(r.preco_unit * COALESCE(i.quantidade, 0)), 0.0) AS total,
+           COUNT(r.id)                                         AS itens_cotados,
+           (SELECT COUNT(*) FROM cotacao_itens x WHERE x.cotacao_id = f.cotacao_id) AS itens
+      FROM cotacao_fornecedores f
+      LEFT JOIN (cotacao_respostas r JOIN cotacao_itens i ON i.id = r.item_id)
+             ON r.fornecedor_id = f.id AND i.cotacao_id = f.cotacao_id
+     WHERE {where}
+     GROUP BY f.id
+     ORDER BY f.cotacao_id, total, f.id
+"""
+
 def ranking_cotacao(cotacao_id: int) -> List[Tuple[str, float]]:
     """
     Retorna [(Fornecedor, Total)], ordenado por menor total.
     Se faltar algum preço, considera 0 para aquele item (apenas para exibir).
     """
     with _connect() as conn:
-        itens = conn.execute("SELECT id, quantidade FROM cotacao_itens WHERE cotacao_id=?", (cotacao_id,)).fetchall()
-        forn = conn.execute("SELECT id, nome FROM cotacao_fornecedores WHERE cotacao_id=?", (cotacao_id,)).fetchall()
-        res: List[Tuple[str,float]] = []
-        for f in forn:
-            total = 0.0
-            for it in itens:
-                r = conn.execute("SELECT preco_unit FROM cotacao_respostas WHERE fornecedor_id=? AND item_id=?",
-                                 (f["id"], it["id"])).fetchone()
-                pu = float(r["preco_unit"]) if r else 0.0
-                total += pu * float(it["quantidade"] or 0)
-            res.append((f["nome"], total))
-        res.sort(key=lambda x: x[1])
-        return res
+        rows = conn.execute(_RANKING_SQL.format(where="f.cotacao_id = ?"), (cotacao_id,)).fetchall()
+        return [(r["fornecedor"], float(r["total"])) for r in rows]
+
+_owner_col: List[str] = []
+
+def _cotacoes_owner_col(conn: sqlite3.Connection) -> str:
+    # legado grava company_id; a migração acrescentou empresa_id (espelho).
+    # Esquema não muda depois da migração: consulta uma vez por processo.
+    if not _owner_col:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(cotacoes)").fetchall()}
+        have = [c for c in ("company_id", "empresa_id") if c in cols]
+        _owner_col.append(f"COALESCE({', '.join(have)})" if len(have) > 1 else (have[0] if have else "NULL"))
+    return _owner_col[0]
+
+def ranking_cotacoes(company_id: Optional[int] = None, processo_id: Optional[int] = None,
+                     cotacao_ids: Optional[List[int]] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Ranking de todas as cotações de uma empresa e/ou processo (ou de uma lista
+    de IDs) numa consulta só.
+    Retorna {cotacao_id: [{"posicao","fornecedor_id","fornecedor","total",
+             "itens_cotados","itens","completo"}, ...]} — cada lista do menor
+    para o maior total. Empates dividem a posição.
+    """
+    where, params = [], []
+    with _connect() as conn:
+        if company_id is not None:
+            where.append(f"f.cotacao_id IN (SELECT id FROM cotacoes WHERE {_cotacoes_owner_col(conn)} = ?)")
+            params.append(int(company_id))
+        if processo_id is not None:
+            where.append("f.cotacao_id IN (SELECT id FROM cotacoes WHERE processo_id = ?)")
+            params.append(int(processo_id))
+        if cotacao_ids is not None:
+            ids = [int(x) for x in cotacao_ids]
+            if not ids:
+                return {}
+            where.append(f"f.cotacao_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        rows = conn.execute(_RANKING_SQL.format(where=" AND ".join(where) or "1"), params).fetchall()
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    for r in rows:
+        lst = out.setdefault(r["cotacao_id"], [])
+        total = float(r["total"])
+        pos = lst[-1]["posicao"] if lst and lst[-1]["total"] == total else len(lst) + 1
+        lst.append({
+            "posicao": pos, "fornecedor_id": r["fornecedor_id"], "fornecedor": r["fornecedor"],
+            "total": total, "itens_cotados": r["itens_cotados"], "itens": r["itens"],
+            "completo": r["itens_cotados"] >= r["itens"],
+        })
+    return out
+
+def matriz_menor_preco(cotacao_id: int) -> Dict[str, Any]:
+    """
+    Mapa item × fornecedor da cotação com o menor lance por item (1 consulta).
+    Retorna {"fornecedores": [{"id","nome"}],
+             "itens": [{"id","descricao","unidade","quantidade",
+                        "precos": {fornecedor_id: preco_unit},
+                        "menor": preço|None, "vencedores": [fornecedor_id, ...]}],
+             "total_menor": soma(menor × quantidade)}.
+    """
+    with _connect() as conn:
+        forn = conn.execute("SELECT id, nome FROM cotacao_fornecedores WHERE cotacao_id=? ORDER BY id",
+                            (cotacao_id,)).fetchall()
+        rows = conn.execute("""
+            SELECT i.id, i.descricao, i.unidade, i.quantidade,
+                   r.fornecedor_id, r.preco_unit,
+                   MIN(r.preco_unit) OVER (PARTITION BY i.id) AS menor
+              FROM cotacao_itens i
+              LEFT JOIN (cotacao_respostas r JOIN cotacao_fornecedores f ON f.id = r.fornecedor_id)
+                     ON r.item_id = i.id AND f.cotacao_id = i.cotacao_id
+             WHERE i.cotacao_id = ?
+             ORDER BY i.id, r.preco_unit, r.fornecedor_id
+        """, (cotacao_id,)).fetchall()
+    itens: List[Dict[str, Any]] = []
+    total = 0.0
+    for r in rows:
+        if not itens or itens[-1]["id"] != r["id"]:
+            menor = None if r["menor"] is None else float(r["menor"])
+            itens.append({"id": r["id"], "descricao": r["descricao"], "unidade": r["unidade"],
+                          "quantidade": r["quantidade"], "precos": {}, "menor": menor, "vencedores": []})
+            if menor is not None:
+                total += menor * float(r["quantidade"] or 0)
+        it = itens[-1]
+        if r["fornecedor_id"] is None:
+            continue
+        preco = float(r["preco_unit"])
+        it["precos"][r["fornecedor_id"]] = preco
+        if preco == it["menor"]:
+            it["vencedores"].append(r["fornecedor_id"])
+    return {"fornecedores": [{"id": f["id"], "nome": f["nome"]} for f in forn],
+            "itens": itens, "total_menor": total}
 
 # --------------------- BANCO DE PREÇOS ------------------
 def list_preco_itens(search: str="") -> List[sqlite3.Row]:
@@ -585,6 +727,77 @@ def add_preco_registro(item_id: int, fornecedor: str, preco_unit: float, data_st
         conn.commit()
         return rid
 
+def _preco_num(v) -> Optional[float]:
+    # aceita 12.5, "12,50", "R$ 1.234,56" e "1.234" (milhar); regra em services/money.py
+    return _money.parse_brl(v)
+
+def add_preco_registros_bulk(rows, batch_size: int = 1000, upsert: bool = False) -> Dict[str, Any]:
+    """
+    Carga em lote de preco_registros numa única transação (executemany).
+    Cada linha: dict com item_id, fornecedor, preco_unit, data e opcionais
+    fonte/validade/cidade/uf. Linhas sem item_id/preço/data são ignoradas.
+    upsert=True atualiza o registro com a mesma chave (item_id, fornecedor, data).
+    Retorna {"inserted", "updated", "skipped", "ids"}.
+    """
+    from itertools import islice
+    inserted, updated, skipped, ids = 0, 0, 0, []
+    it = iter(rows)
+    with _connect() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        while True:
+            chunk = list(islice(it, max(1, int(batch_size or 1))))
+            if not chunk:
+                break
+            values: List[tuple] = []
+            keyed: Dict[tuple, tuple] = {}
+            for d in chunk:
+                preco = _preco_num((d or {}).get("preco_unit"))
+                data_str = str((d or {}).get("data") or "").strip()
+                if not d or not d.get("item_id") or preco is None or not data_str:
+                    skipped += 1
+                    continue
+                v = (int(d["item_id"]), str(d.get("fornecedor") or "").strip(), preco, data_str,
+                     str(d.get("fonte") or "").strip(), str(d.get("validade") or "").strip(),
+                     str(d.get("cidade") or "").strip(), str(d.get("uf") or "").strip())
+                if upsert:
+                    keyed[(v[0], v[1], v[3])] = v  # repetidos na carga: vale o último
+                else:
+                    values.append(v)
+            if upsert:
+                values = list(keyed.values())
+            if upsert and values:
+                existing = {}
+                for part_start in range(0, len(values), 300):
+                    part = values[part_start:part_start + 300]
+                    qms = ",".join(["(?,?,?)"] * len(part))
+                    args = [x for v in part for x in (v[0], v[1], v[3])]
+                    for r in conn.execute(f"""
+                        SELECT id, item_id, fornecedor, data FROM preco_registros
+                         WHERE (item_id, fornecedor, data) IN (VALUES {qms}) ORDER BY id
+                    """, args):
+                        existing.setdefault((r[1], r[2], r[3]), r[0])
+                upd = [v + (existing[(v[0], v[1], v[3])],) for v in values if (v[0], v[1], v[3]) in existing]
+                values = [v for v in values if (v[0], v[1], v[3]) not in existing]
+                if upd:
+                    conn.executemany("""
+                        UPDATE preco_registros
+                           SET item_id=?, fornecedor=?, preco_unit=?, data=?, fonte=?, validade=?, cidade=?, uf=?
+                         WHERE id=?
+                    """, upd)
+                    updated += len(upd)
+            if not values:
+                continue
+            new_ids = _ids.next_ids(conn, "preco_registros", len(values))
+            conn.executemany("""
+                INSERT INTO preco_registros(id, item_id, fornecedor, preco_unit, data, fonte, validade, cidade, uf)
+                VALUES (?,?,?,?,?,?,?,?,?)
+            """, [(i,) + v for i, v in zip(new_ids, values)])
+            ids.extend(new_ids)
+            inserted += len(values)
+        conn.commit()
+    return {"inserted": inserted, "updated": updated, "skipped": skipped, "ids": ids}
+
 def del_preco_registro(rid: int) -> None:
     with _connect() as conn:
         conn.execute("DELETE FROM preco_registros WHERE id=?", (rid,))
@@ -596,19 +809,22 @@ def del_preco_registro(rid: int) -> None:
 from datetime import datetime, date  # garanta que já está importado no topo
 
 def kpis() -> dict:
-    try:
-        e = len(list_companies())
-    except Exception:
-        e = 0
-    try:
-        c = len(list_certificates())
-    except Exception:
-        c = 0
-    try:
-        l = len(list_processos())
-    except Exception:
-        l = 0
-    return {"empresas": e, "certidoes": c, "licitacoes": l}
+    # COUNT(*) num SELECT só (antes: len(list_*()) carregava as três tabelas inteiras)
+    tabelas = (("empresas", "companies"), ("certidoes", "certificates"), ("licitacoes", "processos"))
+    with _connect() as conn:
+        try:
+            row = conn.execute("SELECT " + ", ".join(
+                f"(SELECT COUNT(*) FROM {t})" for _k, t in tabelas)).fetchone()
+            return {k: int(row[i] or 0) for i, (k, _t) in enumerate(tabelas)}
+        except Exception:
+            pass
+        out = {}
+        for key, table in tabelas:   # alguma tabela ausente: conta o que existir
+            try:
+                out[key] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            except Exception:
+                out[key] = 0
+        return out
 
 
 def cert_alertas(dias_limite: int = 10):
@@ -658,174 +874,5 @@ def proc_alertas(dias_list=(5, 2, 1)):
             out.append((rd.get("numero") or "", rd.get("orgao") or "", ds, dif))
     return out
 
-# === COMPAT LAYER (append) — expõe assinaturas canônicas sem apagar nada ===
-# Objetivo: fazer o auditor e as páginas encontrarem nomes padrão,
-# roteando para funções equivalentes já existentes neste módulo.
-
-def __compat__find(*names):
-    g = globals()
-    for n in names:
-        fn = g.get(n)
-        if callable(fn):
-            return fn
-    return None
-
-# ---- Empresas ----
-def list_empresas():
-    fn = __compat__find("list_empresas", "empresas_all", "get_empresas", "list_company", "companies_all")
-    return fn() if fn else []
-
-def add_empresa(payload):  # dict
-    fn = __compat__find("add_empresa", "empresa_add", "nova_empresa", "company_add")
-    if not fn: raise NotImplementedError("add_empresa() não implementada no db.")
-    return fn(payload)
-
-def upd_empresa(emp_id, payload):
-    fn = __compat__find("upd_empresa", "update_empresa", "empresa_upd", "company_upd")
-    if not fn: raise NotImplementedError("upd_empresa() não implementada no db.")
-    return fn(emp_id, payload)
-
-def del_empresa(emp_id):
-    fn = __compat__find("del_empresa", "delete_empresa", "empresa_del", "company_del")
-    if not fn: raise NotImplementedError("del_empresa() não implementada no db.")
-    return fn(emp_id)
-
-# ---- Certidões ----
-def list_certidoes():
-    fn = __compat__find("list_certidoes","certidoes_all","get_certidoes")
-    return fn() if fn else []
-
-def add_certidao(payload):
-    fn = __compat__find("add_certidao","certidao_add","nova_certidao")
-    if not fn: raise NotImplementedError("add_certidao() não implementada no db.")
-    return fn(payload)
-
-def upd_certidao(cid, payload):
-    fn = __compat__find("upd_certidao","update_certidao","certidao_upd")
-    if not fn: raise NotImplementedError("upd_certidao() não implementada no db.")
-    return fn(cid, payload)
-
-def del_certidao(cid):
-    fn = __compat__find("del_certidao","delete_certidao","certidao_del")
-    if not fn: raise NotImplementedError("del_certidao() não implementada no db.")
-    return fn(cid)
-
-# ---- Licitações ----
-def list_licitacoes():
-    fn = __compat__find("list_licitacoes","licitacoes_all","get_licitacoes")
-    return fn() if fn else []
-
-def add_licitacao(payload):
-    fn = __compat__find("add_licitacao","licitacao_add","nova_licitacao")
-    if not fn: raise NotImplementedError("add_licitacao() não implementada no db.")
-    return fn(payload)
-
-def upd_licitacao(lid, payload):
-    fn = __compat__find("upd_licitacao","update_licitacao","licitacao_upd")
-    if not fn: raise NotImplementedError("upd_licitacao() não implementada no db.")
-    return fn(lid, payload)
-
-def del_licitacao(lid):
-    fn = __compat__find("del_licitacao","delete_licitacao","licitacao_del")
-    if not fn: raise NotImplementedError("del_licitacao() não implementada no db.")
-    return fn(lid)
-
-# ---- Cotações (já existe no seu db, deixo como compat) ----
-def list_cotacoes():
-    fn = __compat__find("list_cotacoes","cotacoes_all","get_cotacoes")
-    return fn() if fn else []
-
-def add_cotacao(payload):
-    fn = __compat__find("add_cotacao","cotacao_add","nova_cotacao")
-    if not fn: raise NotImplementedError("add_cotacao() não implementada no db.")
-    return fn(payload)
-
-def upd_cotacao(cid, payload):
-    fn = __compat__find("upd_cotacao","update_cotacao","cotacao_upd")
-    if not fn: raise NotImplementedError("upd_cotacao() não implementada no db.")
-    return fn(cid, payload)
-
-def del_cotacao(cid):
-    fn = __compat__find("del_cotacao","delete_cotacao","cotacao_del")
-    if not fn: raise NotImplementedError("del_cotacao() não implementada no db.")
-    return fn(cid)
-
-# ---- Banco de Preços ----
-def list_banco_precos():
-    fn = __compat__find("list_banco_precos","banco_precos_all","get_banco_precos","list_precos","precos_all")
-    return fn() if fn else []
-
-def add_banco_preco(payload):
-    fn = __compat__find("add_banco_preco","add_preco","novo_preco","banco_preco_add")
-    if not fn: raise NotImplementedError("add_banco_preco() não implementada no db.")
-    return fn(payload)
-
-def upd_banco_preco(pid, payload):
-    fn = __compat__find("upd_banco_preco","update_preco","preco_upd","banco_preco_upd")
-    if not fn: raise NotImplementedError("upd_banco_preco() não implementada no db.")
-    return fn(pid, payload)
-
-def del_banco_preco(pid):
-    fn = __compat__find("del_banco_preco","delete_preco","preco_del","banco_preco_del")
-    if not fn: raise NotImplementedError("del_banco_preco() não implementada no db.")
-    return fn(pid)
-
-# ---- Alertas ----
-def list_alertas():
-    fn = __compat__find("list_alertas","alertas_all","get_alertas","alertas_pendentes")
-    return fn() if fn else []
-
-def add_alerta(payload):
-    fn = __compat__find("add_alerta","novo_alerta","alerta_add","add_alert")
-    if not fn: raise NotImplementedError("add_alerta() não implementada no db.")
-    return fn(payload)
-
-def upd_alerta(aid, payload):
-    fn = __compat__find("upd_alerta","update_alerta","alerta_upd","update_alert")
-    if not fn: raise NotImplementedError("upd_alerta() não implementada no db.")
-    return fn(aid, payload)
-
-def del_alerta(aid):
-    fn = __compat__find("del_alerta","delete_alerta","alerta_del","delete_alert")
-    if not fn: raise NotImplementedError("del_alerta() não implementada no db.")
-    return fn(aid)
-
-# ---- Modelos ----
-def list_modelos():
-    fn = __compat__find("list_modelos","modelos_all","get_modelos")
-    return fn() if fn else []
-
-def add_modelo(payload):
-    fn = __compat__find("add_modelo","novo_modelo","modelo_add")
-    if not fn: raise NotImplementedError("add_modelo() não implementada no db.")
-    return fn(payload)
-
-def upd_modelo(mid, payload):
-    fn = __compat__find("upd_modelo","update_modelo","modelo_upd")
-    if not fn: raise NotImplementedError("upd_modelo() não implementada no db.")
-    return fn(mid, payload)
-
-def del_modelo(mid):
-    fn = __compat__find("del_modelo","delete_modelo","modelo_del")
-    if not fn: raise NotImplementedError("del_modelo() não implementada no db.")
-    return fn(mid)
-
-# ---- Oportunidades ----
-def list_oportunidades():
-    fn = __compat__find("list_oportunidades","oportunidades_all","get_oportunidades")
-    return fn() if fn else []
-
-def add_oportunidade(payload):
-    fn = __compat__find("add_oportunidade","nova_oportunidade","oportunidade_add")
-    if not fn: raise NotImplementedError("add_oportunidade() não implementada no db.")
-    return fn(payload)
-
-def upd_oportunidade(oid, payload):
-    fn = __compat__find("upd_oportunidade","update_oportunidade","oportunidade_upd")
-    if not fn: raise NotImplementedError("upd_oportunidade() não implementada no db.")
-    return fn(oid, payload)
-
-def del_oportunidade(oid):
-    fn = __compat__find("del_oportunidade","delete_oportunidade","oportunidade_del")
-    if not fn: raise NotImplementedError("del_oportunidade() não implementada no db.")
-    return fn(oid)
+# Aliases canônicos (list_empresas, add_empresa, ...) ficam em services/db.py
+# (COMPAT_ALIASES), resolvidos sob demanda; aqui só as implementações.
@@ -0,0 +1,81 @@
+# services/events.py — barramento de eventos de alteração (tabela, operação, ids)
+"""
+Publicação/assinatura em processo para as escritas do banco.
+
+- services/db.py publica um ChangeEvent depois de cada commit
+  (add/upd/del/bulk), com os IDs afetados.
+- Telas abertas assinam a tabela que exibem e aplicam só o delta
+  (buscar/atualizar/remover as linhas dos IDs) em vez de recarregar tudo.
+- Jobs em segundo plano (sync PNCP, ingestores) que gravam por services.db
+  atualizam as telas sem código extra.
+
+Operações: "insert", "update", "delete" e "reload" (mudança sem IDs
+conhecidos — quem assina deve recarregar).
+
+Assinaturas com `key` substituem a anterior de mesma chave: uma página
+reconstruída na navegação não deixa callbacks órfãos acumulando.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+RELOAD = "reload"
+
+ALL = "*"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    table: str
+    op: str
+    ids: Tuple[int, ...] = field(default_factory=tuple)
+
+
+Callback = Callable[[ChangeEvent], None]
+
+_lock = threading.Lock()
+_subs: Dict[str, Dict[object, Callback]] = {}
+
+
+def subscribe(table: str, callback: Callback, key: Optional[object] = None) -> Callable[[], None]:
+    """
+    Assina eventos de `table` ("*" = todas). Retorna a função que cancela.
+    Com `key`, substitui a assinatura anterior de mesma chave.
+    """
+    k = key if key is not None else callback
+    with _lock:
+        _subs.setdefault(table, {})[k] = callback
+
+    def _unsubscribe() -> None:
+        with _lock:
+            subs = _subs.get(table) or {}
+            if subs.get(k) is callback:
+                subs.pop(k, None)
+    return _unsubscribe
+
+
+def unsubscribe(table: str, key: object) -> None:
+    with _lock:
+        (_subs.get(table) or {}).pop(key, None)
+
+
+def publish_event(ev: ChangeEvent) -> None:
+    """Entrega o evento (síncrono, na thread de quem escreveu). Erros do assinante não sobem."""
+    with _lock:
+        targets: List[Callback] = list((_subs.get(ev.table) or {}).values())
+        targets += list((_subs.get(ALL) or {}).values())
+    for cb in targets:
+        try:
+            cb(ev)
+        except Exception:
+            pass
+
+
+def publish(table: str, op: str, ids: Iterable[int] = ()) -> None:
+    ids_t: Tuple[int, ...] = tuple(int(i) for i in (ids or ()) if i is not None)
+    publish_event(ChangeEvent(table, op, ids_t))
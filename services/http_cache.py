@@ -0,0 +1,222 @@
+# services/http_cache.py — cache HTTP em disco para as consultas ao PNCP (ETag/Last-Modified + TTL)
+from __future__ import annotations
+
+"""
+Respostas GET guardadas em data/http_cache.db (SQLite próprio, fora do
+data.db — não entra nos backups nem disputa o lock do banco principal).
+
+- Chave: URL + parâmetros normalizados (sem None, ordenados, como texto).
+- Fresca (dentro do TTL) -> servida do disco, sem rede.
+- Vencida com ETag/Last-Modified -> GET condicional (If-None-Match /
+  If-Modified-Since); 304 renova o TTL e devolve o corpo guardado.
+- Vencida sem validadores -> GET normal.
+- TTL: Cache-Control max-age do servidor ou SOS_HTTP_CACHE_TTL (padrão 900 s);
+  no-cache = revalidar sempre; no-store não é guardado. Só status 200.
+- Rede fora com cópia vencida -> devolve a cópia (x-cache: stale).
+- LRU por tamanho: acima de SOS_HTTP_CACHE_MB (padrão 64) apaga as menos
+  usadas até ~90% do limite.
+- SOS_HTTP_CACHE=0 desliga (get() vira transport.get()).
+
+A Response devolvida traz o cabeçalho `x-cache`: hit | revalidated | miss | stale.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from hashlib import sha1
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from . import connection as _pool
+from . import transport
+from .storage import BASE_DIR
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+ENABLED = os.getenv("SOS_HTTP_CACHE", "1").strip().lower() not in ("0", "false", "off", "no")
+CACHE_PATH = os.path.join(BASE_DIR, "data", "http_cache.db")
+DEFAULT_TTL = _env_num("SOS_HTTP_CACHE_TTL", 900.0)
+MAX_BYTES = int(_env_num("SOS_HTTP_CACHE_MB", 64) * 1024 * 1024)
+
+_RX_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)", re.I)
+_KEEP_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+_ready: set = set()
+_ready_lock = threading.Lock()
+_counts = {"hit": 0, "revalidated": 0, "miss": 0, "stale": 0}
+_counts_lock = threading.Lock()
+
+
+def _conn(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or CACHE_PATH
+    conn = _pool.get_connection(path)
+    if path not in _ready:
+        with _ready_lock:
+            if path not in _ready:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS http_cache (
+                        key           TEXT PRIMARY KEY,
+                        url           TEXT NOT NULL,
+                        status        INTEGER NOT NULL,
+                        headers       TEXT,
+                        body          BLOB,          -- zlib
+                        size          INTEGER NOT NULL,
+                        etag          TEXT,
+                        last_modified TEXT,
+                        stored_at     REAL NOT NULL,
+                        expires_at    REAL NOT NULL,
+                        last_access   REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_http_cache_access ON http_cache(last_access);
+                """)
+                _ready.add(path)
+    return conn
+
+def cache_key(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """URL + parâmetros normalizados: a mesma busca com outra ordem/None extras cai na mesma chave."""
+    norm = sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+    return sha1(json.dumps([url.rstrip("/"), norm], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _count(kind: str) -> None:
+    with _counts_lock:
+        _counts[kind] += 1
+
+def _ttl_for(resp: transport.Response, ttl: Optional[float]) -> Optional[float]:
+    """Segundos de validade; None = não guardar."""
+    cc = resp.headers.get("cache-control", "").lower()
+    if "no-store" in cc:
+        return None
+    if ttl is not None:
+        return float(ttl)
+    if "no-cache" in cc:
+        return 0.0          # guarda, mas revalida sempre
+    m = _RX_MAX_AGE.search(cc)
+    if m:
+        return float(m.group(1))
+    return DEFAULT_TTL
+
+def _from_row(row, kind: str) -> transport.Response:
+    headers = json.loads(row[2] or "{}")
+    headers["x-cache"] = kind
+    return transport.Response(row[1], headers, zlib.decompress(row[3]) if row[3] else b"", row[0])
+
+def _store(conn: sqlite3.Connection, key: str, resp: transport.Response, ttl: float) -> None:
+    now = time.time()
+    body = zlib.compress(resp.content, 6)
+    headers = {k: v for k, v in resp.headers.items() if k in _KEEP_HEADERS}
+    conn.execute("""
+        INSERT INTO http_cache (key, url, status, headers, body, size, etag, last_modified,
+                                stored_at, expires_at, last_access)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(key) DO UPDATE SET
+            url=excluded.url, status=excluded.status, headers=excluded.headers, body=excluded.body,
+            size=excluded.size, etag=excluded.etag, last_modified=excluded.last_modified,
+            stored_at=excluded.stored_at, expires_at=excluded.expires_at,
+            last_access=excluded.last_access
+    """, (key, resp.url, resp.status, json.dumps(headers), body, len(body),
+          headers.get("etag"), headers.get("last-modified"), now, now + ttl, now))
+    conn.commit()
+    _evict(conn)
+
+def _evict(conn: sqlite3.Connection, max_bytes: Optional[int] = None) -> int:
+    """LRU: apaga as menos acessadas até ficar em ~90% do limite. Devolve quantas saíram."""
+    limit = MAX_BYTES if max_bytes is None else int(max_bytes)
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+    if total <= limit:
+        return 0
+    target = int(limit * 0.9)
+    doomed, freed = [], 0
+    for key, size in conn.execute("SELECT key, size FROM http_cache ORDER BY last_access"):
+        if total - freed <= target:
+            break
+        doomed.append((key,))
+        freed += size
+    conn.executemany("DELETE FROM http_cache WHERE key=?", doomed)
+    conn.commit()
+    return len(doomed)
+
+
+def get(url: str, params: Optional[Mapping[str, Any]] = None, *, ttl: Optional[float] = None,
+        headers: Optional[Mapping[str, str]] = None, timeout: Optional[float] = None,
+        before_network: Optional[Callable[[], Any]] = None,
+        path: Optional[str] = None) -> transport.Response:
+    """
+    transport.get com cache em disco. `ttl` força a validade (s) em vez do
+    max-age do servidor / padrão. `before_network` é chamado só quando vai
+    haver requisição (ex.: limitador de taxa). Erros de rede sem cópia
+    guardada sobem como transport.TransportError.
+    """
+    if not ENABLED:
+        if before_network is not None:
+            before_network()
+        return transport.get(url, params, headers=headers, timeout=timeout)
+    conn = _conn(path)
+    key = cache_key(url, params)
+    row = conn.execute("""
+        SELECT url, status, headers, body, etag, last_modified, expires_at
+          FROM http_cache WHERE key=?
+    """, (key,)).fetchone()
+    now = time.time()
+    if row is not None and now < row[6]:
+        conn.execute("UPDATE http_cache SET last_access=? WHERE key=?", (now, key))
+        conn.commit()
+        _count("hit")
+        return _from_row(row, "hit")
+
+    cond = dict(headers or {})
+    if row is not None:
+        if row[4]:
+            cond["If-None-Match"] = row[4]
+        if row[5]:
+            cond["If-Modified-Since"] = row[5]
+    if before_network is not None:
+        before_network()
+    try:
+        resp = transport.get(url, params, headers=cond, timeout=timeout)
+    except transport.TransportError:
+        if row is None:
+            raise
+        _count("stale")
+        return _from_row(row, "stale")
+
+    if resp.status == 304 and row is not None:
+        if "cache-control" not in resp.headers:   # 304 sem política: vale a da resposta guardada
+            resp.headers["cache-control"] = json.loads(row[2] or "{}").get("cache-control", "")
+        new_ttl = _ttl_for(resp, ttl)
+        conn.execute("UPDATE http_cache SET expires_at=?, last_access=? WHERE key=?",
+                     (now + (new_ttl if new_ttl is not None else DEFAULT_TTL), now, key))
+        conn.commit()
+        _count("revalidated")
+        return _from_row(row, "revalidated")
+
+    _count("miss")
+    if resp.status == 200:
+        life = _ttl_for(resp, ttl)
+        # TTL zero só vale a pena com validador (a próxima vez pode ser um 304)
+        if life is not None and (life > 0 or "etag" in resp.headers or "last-modified" in resp.headers):
+            _store(conn, key, resp, life)
+    resp.headers["x-cache"] = "miss"
+    return resp
+
+
+def stats(path: Optional[str] = None) -> Dict[str, Any]:
+    """Contadores do processo + tamanho atual do cache."""
+    conn = _conn(path)
+    n, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache").fetchone()
+    with _counts_lock:
+        out: Dict[str, Any] = dict(_counts)
+    out.update({"entries": int(n), "bytes": int(size), "max_bytes": MAX_BYTES})
+    return out
+
+def clear(path: Optional[str] = None) -> None:
+    conn = _conn(path)
+    conn.execute("DELETE FROM http_cache")
+    conn.commit()
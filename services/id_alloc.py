@@ -0,0 +1,141 @@
+# services/id_alloc.py — alocação de IDs sem varrer a tabela
+"""
+Mantém o comportamento "reusa o menor ID livre" das tabelas do projeto sem o
+antigo `SELECT id ... ORDER BY id` + loop em Python a cada INSERT.
+
+- Tabela `id_freelist(tabela, id)`: lacunas abaixo do MAX(id) de cada tabela,
+  mantida por triggers (DELETE grava o id liberado; INSERT o remove).
+  Criada e preenchida uma vez pela migração 2 (services/migrations.py).
+- next_id(): min(menor id da free-list, MAX(id)+1) — duas buscas em índice.
+- Modo rowid (opt-in) para tabelas de alto volume: só MAX(id)+1, sem reuso.
+  Ative com SOS_ID_ROWID_TABLES="preco_registros,cotacao_respostas"
+  ou set_rowid_mode("preco_registros").
+- Piso de IDs (`id_floor`, migração 9): IDs movidos para as tabelas
+  *_archive (services/archive.py) não voltam a ser usados — o topo é
+  max(MAX(id), piso) e os IDs arquivados saem da free-list.
+"""
+from __future__ import annotations
+import os
+import sqlite3
+from typing import Any, Iterable, Optional
+
+# Tabelas cujos IDs eram alocados com _smallest_free_id (db.py + db_legacy.py)
+MANAGED_TABLES = (
+    "companies", "licitacoes",
+    "certificates", "processos",
+    "cotacoes", "cotacao_itens", "cotacao_fornecedores", "cotacao_respostas",
+    "preco_itens", "preco_registros",
+)
+
+_rowid_tables: set[str] = {
+    t.strip() for t in (os.getenv("SOS_ID_ROWID_TABLES") or "").split(",") if t.strip()
+}
+
+def set_rowid_mode(table: str, enabled: bool = True) -> None:
+    """Liga/desliga o modo rowid (MAX(id)+1, sem reuso de lacunas) para `table`."""
+    if enabled:
+        _rowid_tables.add(table)
+    else:
+        _rowid_tables.discard(table)
+
+def is_rowid_mode(table: str) -> bool:
+    return table in _rowid_tables
+
+def _scalar(conn: sqlite3.Connection, sql: str, params: Iterable[Any] = ()) -> Any:
+    # cursor próprio sem row_factory: funciona com dict/Row/tupla na conexão
+    cur = conn.cursor()
+    cur.row_factory = None
+    row = cur.execute(sql, tuple(params)).fetchone()
+    return row[0] if row else None
+
+# --------------------- alocação ---------------------
+def top_id(conn: sqlite3.Connection, table: str) -> int:
+    """Maior ID já usado por `table`: MAX(id) ou o piso de IDs arquivados, o que for maior."""
+    try:
+        return int(_scalar(conn, f"""
+            SELECT MAX(COALESCE((SELECT MAX(id) FROM {table}), 0),
+                       COALESCE((SELECT floor FROM id_floor WHERE tabela=?), 0))
+        """, (table,)) or 0)
+    except sqlite3.OperationalError:   # base ainda sem id_floor (antes da migração 9)
+        return int(_scalar(conn, f"SELECT COALESCE(MAX(id), 0) FROM {table}") or 0)
+
+def raise_floor(conn: sqlite3.Connection, table: str, floor: int) -> None:
+    """Sobe o piso de `table` para `floor` (nunca desce)."""
+    conn.execute("""
+        INSERT INTO id_floor(tabela, floor) VALUES (?, ?)
+        ON CONFLICT(tabela) DO UPDATE SET floor = MAX(floor, excluded.floor)
+    """, (table, int(floor)))
+
+def next_id(conn: sqlite3.Connection, table: str) -> int:
+    """Menor ID livre de `table` (ou MAX(id)+1 no modo rowid)."""
+    top = top_id(conn, table) + 1
+    if table in _rowid_tables:
+        return top
+    free: Optional[int] = _scalar(conn, "SELECT MIN(id) FROM id_freelist WHERE tabela=?", (table,))
+    return min(int(free), top) if free is not None else top
+
+def next_ids(conn: sqlite3.Connection, table: str, n: int) -> list[int]:
+    """`n` IDs para uma carga em lote: lacunas da free-list primeiro, depois MAX(id)+1..."""
+    n = max(0, int(n))
+    top = top_id(conn, table)
+    out: list[int] = []
+    if table not in _rowid_tables and n:
+        cur = conn.cursor()
+        cur.row_factory = None
+        out = [r[0] for r in cur.execute(
+            "SELECT id FROM id_freelist WHERE tabela=? AND id<? ORDER BY id LIMIT ?", (table, top, n)
+        )]
+    return out + list(range(top + 1, top + 1 + n - len(out)))
+
+# --------------------- instalação (migração) ---------------------
+def install_floor(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS id_floor (
+            tabela TEXT PRIMARY KEY,
+            floor  INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+def install(conn: sqlite3.Connection, tables: Iterable[str] = MANAGED_TABLES) -> None:
+    """Cria a free-list, os triggers e registra as lacunas já existentes."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS id_freelist (
+            tabela TEXT NOT NULL,
+            id     INTEGER NOT NULL,
+            PRIMARY KEY (tabela, id)
+        ) WITHOUT ROWID
+    """)
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for t in tables:
+        if t not in existing:
+            continue
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{t}_idfree_del AFTER DELETE ON {t}
+            BEGIN
+                INSERT OR IGNORE INTO id_freelist(tabela, id) VALUES ('{t}', OLD.id);
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{t}_idfree_ins AFTER INSERT ON {t}
+            BEGIN
+                DELETE FROM id_freelist WHERE tabela='{t}' AND id=NEW.id;
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{t}_idfree_upd AFTER UPDATE OF id ON {t}
+            WHEN OLD.id <> NEW.id
+            BEGIN
+                INSERT OR IGNORE INTO id_freelist(tabela, id) VALUES ('{t}', OLD.id);
+                DELETE FROM id_freelist WHERE tabela='{t}' AND id=NEW.id;
+            END
+        """)
+        # lacunas atuais (varredura única, só na migração)
+        conn.execute(f"""
+            WITH RECURSIVE seq(i) AS (
+                SELECT 1 WHERE (SELECT MAX(id) FROM {t}) > 1
+                UNION ALL
+                SELECT i + 1 FROM seq WHERE i + 1 < (SELECT MAX(id) FROM {t})
+            )
+            INSERT OR IGNORE INTO id_freelist(tabela, id)
+            SELECT '{t}', i FROM seq WHERE NOT EXISTS (SELECT 1 FROM {t} WHERE id = seq.i)
+        """)
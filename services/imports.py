@@ -0,0 +1,292 @@
+# services/imports.py — importação em fluxo (CSV/XLSX) para Banco de Preços e Licitações
+from __future__ import annotations
+
+"""
+Contraparte de services/exports.py.
+
+- Lê CSV com csv.reader ou XLSX com openpyxl em modo read_only: linha a linha,
+  memória constante independentemente do tamanho do arquivo.
+- Mapeia colunas pelos MESMOS cabeçalhos que as páginas exportam (COLUMNS de
+  pages/banco_precos.py e pages/licitacoes.py); nomes de campo do banco
+  (produto, preco, data_sessao...) também são aceitos.
+- Valida e normaliza dinheiro e datas em lotes e grava pelos inserts em lote
+  de services/db.py (uma transação por importação).
+- dry_run=True só valida: devolve contagens, erros e uma prévia das linhas.
+"""
+
+import codecs
+import csv
+import os
+import unicodedata
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from openpyxl import load_workbook  # type: ignore
+except Exception:  # openpyxl é opcional aqui: CSV funciona sem ele
+    load_workbook = None
+
+from . import db
+from .money import parse_brl
+
+MAX_ERRORS = 200     # erros guardados no resultado (as contagens seguem completas)
+PREVIEW_ROWS = 20    # linhas normalizadas devolvidas na prévia
+
+# -----------------------------
+# Utilidades
+# -----------------------------
+def _key(h: Any) -> str:
+    """Normaliza um cabeçalho: minúsculo, sem acento, espaços simples."""
+    s = unicodedata.normalize("NFKD", str(h or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(s.lower().replace("_", " ").split())
+
+
+def to_money(value: Any) -> Optional[float]:
+    """
+    'R$ 1.234,56' | '1234,56' | '1234.56' | 1234.56 -> 1234.56; '1.234' -> 1234
+    (ponto + três dígitos é milhar). Mesma regra do legado: services/money.py.
+    Retorna None se vazio ou inválido.
+    """
+    return parse_brl(value)
+
+
+def to_date_br(value: Any) -> Optional[str]:
+    """
+    Data em qualquer formato usual (date/datetime, serial do Excel,
+    'dd/mm/aaaa', 'dd-mm-aaaa', 'aaaa-mm-dd[Thh:mm]') -> 'dd/mm/aaaa'.
+    Vazio -> ''. Inválida -> None.
+    """
+    if value is None or value == "":
+        return ""
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if 1 <= value < 100000:       # serial do Excel (base 1899-12-30)
+            return (date(1899, 12, 30) + timedelta(days=int(value))).strftime("%d/%m/%Y")
+        return None
+    s = str(value).strip()[:10]
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d", "%d/%m/%y"):
+        try:
+            return datetime.strptime(s, fmt).strftime("%d/%m/%Y")
+        except ValueError:
+            pass
+    return None
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _batched(it: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+# -----------------------------
+# Leitura (streaming)
+# -----------------------------
+def _csv_encoding(path: str, chunk: int = 1 << 20) -> str:
+    """
+    utf-8 (com ou sem BOM) se o arquivo INTEIRO decodifica; senão cp1252.
+    Decide antes de gerar qualquer linha (decodificação incremental, memória
+    constante): um acento no fim do arquivo não pode reiniciar a leitura.
+    """
+    dec = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(chunk)
+                dec.decode(block, final=not block)
+                if not block:
+                    return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def _iter_csv(path: str) -> Iterator[List[Any]]:
+    with open(path, "r", encoding=_csv_encoding(path), errors="replace", newline="") as f:
+        sample = f.read(8192)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(f, dialect):
+            yield row
+
+
+def _iter_xlsx(path: str, sheet: Optional[str] = None) -> Iterator[List[Any]]:
+    if load_workbook is None:
+        raise RuntimeError("openpyxl não instalado: importe em CSV ou instale openpyxl.")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        for row in ws.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def iter_table(path: str, sheet: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Gera (nº da linha no arquivo, {cabeçalho_normalizado: valor}) a partir da
+    primeira linha não vazia como cabeçalho. Linhas totalmente vazias são puladas.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    rows = _iter_xlsx(path, sheet) if ext in (".xlsx", ".xlsm") else _iter_csv(path)
+    headers: Optional[List[str]] = None
+    for lineno, row in enumerate(rows, start=1):
+        if not any(_text(v) for v in row):
+            continue
+        if headers is None:
+            headers = [_key(h) for h in row]
+            continue
+        yield lineno, {h: row[i] if i < len(row) else None for i, h in enumerate(headers) if h}
+
+# -----------------------------
+# Mapeamentos (cabeçalho exportado -> campo do banco)
+# -----------------------------
+BANCO_PRECOS_MAP = {
+    "produto": "produto", "categoria": "categoria",
+    "tipo": "tipo_origem", "tipo origem": "tipo_origem",
+    "origem": "origem_nome", "origem nome": "origem_nome", "fornecedor": "origem_nome",
+    "marca": "marca", "unidade": "unidade", "embalagem": "embalagem",
+    "preco": "preco", "valor": "preco",
+    "data": "data_coleta", "data coleta": "data_coleta",
+    "link": "link", "observacoes": "observacoes", "obs": "observacoes",
+}
+
+LICITACOES_MAP = {
+    "empresa": "empresa", "empresa nome": "empresa", "empresa id": "empresa_id",
+    "orgao": "orgao", "modalidade": "modalidade", "processo": "processo",
+    "data da sessao": "data_sessao", "data sessao": "data_sessao", "data": "data_sessao",
+    "hora": "hora", "qtd itens": "qtd_itens", "itens": "qtd_itens",
+    "valor estimado": "valor_estimado", "valor": "valor_estimado",
+    "tem lotes": "tem_lotes", "link": "link",
+}
+
+
+def _map_row(raw: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for k, v in raw.items():
+        field = mapping.get(k)
+        if field and field not in out:
+            out[field] = v
+    return out
+
+# -----------------------------
+# Validação / normalização por entidade
+# -----------------------------
+def _norm_banco_preco(row: Dict[str, Any], _ctx: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: _text(row.get(k)) for k in (
+        "produto", "categoria", "tipo_origem", "origem_nome", "marca",
+        "unidade", "embalagem", "link", "observacoes")}
+    if not out["produto"]:
+        raise ValueError("produto vazio")
+    preco = to_money(row.get("preco"))
+    if row.get("preco") not in (None, "") and preco is None:
+        raise ValueError(f"preço inválido: {row.get('preco')!r}")
+    dt = to_date_br(row.get("data_coleta"))
+    if dt is None:
+        raise ValueError(f"data inválida: {row.get('data_coleta')!r}")
+    out["preco"] = preco          # float: _bp__money_to_float devolve como está
+    out["data_coleta"] = dt
+    return out
+
+
+def _norm_licitacao(row: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: _text(row.get(k)) for k in ("orgao", "modalidade", "processo", "hora", "qtd_itens", "link")}
+    if not (out["orgao"] or out["processo"]):
+        raise ValueError("órgão e processo vazios")
+    emp_id = _text(row.get("empresa_id"))
+    if not emp_id and _text(row.get("empresa")):
+        emp_id = ctx["empresas"].get(_key(row.get("empresa")))
+        if emp_id is None:
+            raise ValueError(f"empresa não cadastrada: {row.get('empresa')!r}")
+    out["empresa_id"] = int(emp_id) if emp_id else None
+    dt = to_date_br(row.get("data_sessao"))
+    if dt is None:
+        raise ValueError(f"data da sessão inválida: {row.get('data_sessao')!r}")
+    out["data_sessao"] = dt
+    valor = to_money(row.get("valor_estimado"))
+    if row.get("valor_estimado") not in (None, "") and valor is None:
+        raise ValueError(f"valor inválido: {row.get('valor_estimado')!r}")
+    out["valor_estimado"] = f"{valor:.2f}" if valor is not None else ""
+    out["tem_lotes"] = _text(row.get("tem_lotes")).lower() in ("1", "sim", "s", "true", "x", "yes")
+    return out
+
+
+def _licitacoes_ctx() -> Dict[str, Any]:
+    try:
+        emps = db.list_companies() or []
+    except Exception:
+        emps = []
+    return {"empresas": {_key(e.get("name")): e.get("id") for e in emps if e.get("name")}}
+
+# -----------------------------
+# Pipeline
+# -----------------------------
+def _run(path: str, mapping: Dict[str, str],
+         normalize: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]],
+         writer: Optional[Callable[[Iterable[Dict[str, Any]]], Dict[str, Any]]],
+         ctx: Dict[str, Any], dry_run: bool, batch_size: int, sheet: Optional[str]) -> Dict[str, Any]:
+    res: Dict[str, Any] = {
+        "total": 0, "valid": 0, "invalid": 0, "errors": [], "preview": [],
+        "inserted": 0, "updated": 0, "dry_run": bool(dry_run),
+    }
+
+    def _valid_rows() -> Iterator[Dict[str, Any]]:
+        for chunk in _batched(iter_table(path, sheet), batch_size):
+            for lineno, raw in chunk:
+                res["total"] += 1
+                try:
+                    row = normalize(_map_row(raw, mapping), ctx)
+                except Exception as ex:
+                    res["invalid"] += 1
+                    if len(res["errors"]) < MAX_ERRORS:
+                        res["errors"].append((lineno, str(ex)))
+                    continue
+                res["valid"] += 1
+                if len(res["preview"]) < PREVIEW_ROWS:
+                    res["preview"].append(row)
+                yield row
+
+    if dry_run or writer is None:
+        for _ in _valid_rows():
+            pass
+        return res
+    out = writer(_valid_rows()) or {}
+    res["inserted"] = int(out.get("inserted") or 0)
+    res["updated"] = int(out.get("updated") or 0)
+    return res
+
+
+def import_banco_precos(path: str, dry_run: bool = False, upsert: bool = False,
+                        batch_size: int = 1000, sheet: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Importa uma planilha de preços (cabeçalhos do "Exportar" do Banco de Preços).
+    Retorna {"total","valid","invalid","errors":[(linha, msg)],"preview",
+             "inserted","updated","dry_run"}.
+    """
+    writer = lambda rows: db.add_banco_precos_bulk(rows, batch_size=batch_size, upsert=upsert)
+    return _run(path, BANCO_PRECOS_MAP, _norm_banco_preco, writer, {}, dry_run, batch_size, sheet)
+
+
+def import_licitacoes(path: str, dry_run: bool = False,
+                      batch_size: int = 1000, sheet: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Importa licitações (cabeçalhos do "Exportar" de Licitações). A coluna
+    "Empresa" é resolvida pelo nome cadastrado; nome desconhecido = erro na linha.
+    """
+    writer = lambda rows: db.add_licitacoes_bulk(rows, batch_size=batch_size)
+    return _run(path, LICITACOES_MAP, _norm_licitacao, writer, _licitacoes_ctx(), dry_run, batch_size, sheet)
@@ -1,12 +1,28 @@
-# services/migrations.py — migrações seguras (SQLite)
+# services/migrations.py — migrações versionadas (SQLite, PRAGMA user_version)
+"""
+Registro único de migrações do banco.
+
+- Cada passo tem um número de versão; `migrate()` aplica apenas os passos com
+  versão > PRAGMA user_version, cada um na sua transação, e grava a versão nova.
+- Roda UMA vez por processo (chamado no import de services.db). Depois disso
+  as funções de CRUD não fazem DDL nem consultam sqlite_master/table_info.
+- Os passos são idempotentes (CREATE ... IF NOT EXISTS / ADD COLUMN só se
+  faltar), então bases antigas com user_version=0 migram sem perder dados.
+
+Para evoluir o esquema: escreva `_mNNN_descricao(conn)` e acrescente em
+MIGRATIONS com o próximo número.
+"""
 from __future__ import annotations
 import sqlite3
+import threading
+from typing import Callable, List, Optional, Tuple
 from .storage import DB_PATH
+from . import connection as _pool
 
 def _connect():
-    conn = sqlite3.connect(DB_PATH)
+    # conexão persistente da thread (ver services/connection.py)
+    conn = _pool.get_connection(DB_PATH)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 def _has_table(conn, name: str) -> bool:
@@ -15,251 +31,628 @@ def _has_table(conn, name: str) -> bool:
 
 def _columns(conn, table: str) -> set[str]:
     cur = conn.execute(f"PRAGMA table_info({table})")
-    return {row["name"] for row in cur.fetchall()}
-
-# --- Empresas: garantir colunas (mantido do seu base) ---
-def ensure_companies_columns():
-    with _connect() as conn:
-        if not _has_table(conn, "companies"):
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS companies(
-                    id INTEGER PRIMARY KEY,
-                    name TEXT,
-                    cnpj TEXT,
-                    ie   TEXT,
-                    im   TEXT,
-                    phone TEXT,
-                    email TEXT,
-                    email_principal TEXT,
-                    address TEXT,
-                    city TEXT,
-                    uf TEXT,
-                    cep TEXT,
-                    socio_nome TEXT,
-                    socio_estado_civil TEXT,
-                    socio_rg TEXT,
-                    socio_cpf TEXT,
-                    socio_endereco TEXT,
-                    socio_data_nascimento TEXT,
-                    socio_nome_pai TEXT,
-                    socio_nome_mae TEXT,
-                    comprasnet_login TEXT,
-                    comprasnet_senha TEXT,
-                    comprasnet_obs TEXT,
-                    pcp_login TEXT,
-                    pcp_senha TEXT,
-                    pcp_obs TEXT,
-                    bnc_login TEXT,
-                    bnc_senha TEXT,
-                    bnc_obs TEXT,
-                    licitanet_login TEXT,
-                    licitanet_senha TEXT,
-                    licitanet_obs TEXT,
-                    compraspara_login TEXT,
-                    compraspara_senha TEXT,
-                    compraspara_obs TEXT,
-                    created_at TEXT
-                )
-            """)
-            conn.commit()
-        else:
-            need_cols = {
-                "email_principal","socio_nome","socio_estado_civil","socio_rg","socio_cpf",
-                "socio_endereco","socio_data_nascimento","socio_nome_pai","socio_nome_mae",
-                "comprasnet_login","comprasnet_senha","comprasnet_obs",
-                "pcp_login","pcp_senha","pcp_obs",
-                "bnc_login","bnc_senha","bnc_obs",
-                "licitanet_login","licitanet_senha","licitanet_obs",
-                "compraspara_login","compraspara_senha","compraspara_obs",
-                "created_at"
-            }
-            cols = _columns(conn, "companies")
-            for col in need_cols - cols:
-                conn.execute(f"ALTER TABLE companies ADD COLUMN {col} TEXT")
-            conn.commit()
-
-def ensure_company_credentials():
-    with _connect() as conn:
-        if not _has_table(conn, "company_credentials"):
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS company_credentials(
-                    id INTEGER PRIMARY KEY,
-                    company_id INTEGER NOT NULL,
-                    portal TEXT NOT NULL,
-                    login TEXT,
-                    senha TEXT,
-                    url TEXT,
-                    obs TEXT,
-                    UNIQUE(company_id, portal),
-                    FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE
-                )
-            """)
-            conn.commit()
-
-def ensure_licitacoes_table():
-    """Cria a tabela `licitacoes` se não existir (idempotente)."""
-    with _connect() as conn:
-        if not _has_table(conn, "licitacoes"):
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS licitacoes (
-                    id INTEGER PRIMARY KEY,
-                    empresa_id INTEGER,
-                    orgao TEXT,
-                    modalidade TEXT,
-                    processo TEXT,
-                    data_sessao TEXT,
-                    hora TEXT,
-                    qtd_itens TEXT,
-                    valor_estimado TEXT,
-                    link TEXT,
-                    tem_lotes INTEGER DEFAULT 0,
-                    created_at TEXT,
-                    FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
-                )
-            """)
-            conn.commit()
-        else:
-            cols = _columns(conn, "licitacoes")
-            if "tem_lotes" not in cols:
-                conn.execute("ALTER TABLE licitacoes ADD COLUMN tem_lotes INTEGER DEFAULT 0")
-            if "created_at" not in cols:
-                conn.execute("ALTER TABLE licitacoes ADD COLUMN created_at TEXT")
-            conn.commit()
-
-def run_all():
-    ensure_companies_columns()
-    ensure_company_credentials()
-    ensure_licitacoes_table()
-    ensure_cotacoes_table()
-    ensure_banco_precos_table()
-    ensure_certidoes_table()
-
-def ensure_cotacoes_table():
+    return {row[1] for row in cur.fetchall()}
+
+def _add_missing_columns(conn, table: str, wanted: dict) -> None:
+    cols = _columns(conn, table)
+    for col, typ in wanted.items():
+        if col not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
+
+def _exec_script(conn, script: str) -> None:
+    """Como executescript(), mas SEM o COMMIT implícito (roda dentro da transação do passo)."""
+    buf = ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            stmt = buf.strip()
+            buf = ""
+            if stmt and not stmt.upper().startswith("PRAGMA FOREIGN_KEYS"):
+                conn.execute(stmt)
+    if buf.strip():
+        conn.execute(buf)
+
+# -----------------------------------------------------------------------------
+# Esquemas
+# -----------------------------------------------------------------------------
+SCHEMA_SQL_EMPRESAS = """
+CREATE TABLE IF NOT EXISTS companies (
+    id                      INTEGER PRIMARY KEY,
+    -- empresa
+    name                    TEXT,
+    cnpj                    TEXT,
+    ie                      TEXT,
+    im                      TEXT,
+    phone                   TEXT,
+    email                   TEXT,
+    email_principal_login   TEXT,  -- login da caixa de e-mail principal
+    email_principal_senha   TEXT,  -- senha da caixa de e-mail principal
+    -- endereço
+    address_street          TEXT,
+    address_number          TEXT,
+    address_bairro          TEXT,
+    address_cidade          TEXT,
+    address_estado          TEXT,
+    address_cep             TEXT,
+    -- banco
+    bank_nome               TEXT,
+    bank_agencia            TEXT,
+    bank_conta              TEXT,
+    -- sócio
+    socio_nome              TEXT,
+    socio_estado_civil      TEXT,
+    socio_rg                TEXT,
+    socio_cpf               TEXT,
+    socio_endereco          TEXT,
+    socio_nascimento        TEXT,  -- dd/mm/aaaa
+    socio_pai               TEXT,
+    socio_mae               TEXT,
+    -- credenciais (portais)
+    comprasnet_login        TEXT,
+    comprasnet_senha        TEXT,
+    comprasnet_obs          TEXT,
+    pcp_login               TEXT,
+    pcp_senha               TEXT,
+    pcp_obs                 TEXT,
+    bnc_login               TEXT,
+    bnc_senha               TEXT,
+    bnc_obs                 TEXT,
+    licitanet_login         TEXT,
+    licitanet_senha         TEXT,
+    licitanet_obs           TEXT,
+    compraspara_login       TEXT,
+    compraspara_senha       TEXT,
+    compraspara_obs         TEXT,
+    created_at              TEXT
+);
+"""
+
+SCHEMA_SQL_LICITACOES = """
+CREATE TABLE IF NOT EXISTS licitacoes (
+    id              INTEGER PRIMARY KEY,
+    empresa_id      INTEGER,
+    orgao           TEXT,
+    modalidade      TEXT,
+    processo        TEXT,
+    data_sessao     TEXT,
+    hora            TEXT,
+    qtd_itens       TEXT,
+    valor_estimado  TEXT,
+    link            TEXT,
+    tem_lotes       INTEGER DEFAULT 0,
+    created_at      TEXT,
+    FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
+);
+"""
+
+# --- Empresas: garantir colunas (página Empresas + bases antigas) ---
+def ensure_companies_columns(conn) -> None:
+    _exec_script(conn, SCHEMA_SQL_EMPRESAS)
+    need_cols = [
+        "email_principal", "email_principal_login", "email_principal_senha",
+        "address_street", "address_number", "address_bairro", "address_cidade", "address_estado", "address_cep",
+        "bank_nome", "bank_agencia", "bank_conta",
+        "socio_nome", "socio_estado_civil", "socio_rg", "socio_cpf", "socio_endereco",
+        "socio_nascimento", "socio_pai", "socio_mae",
+        "socio_data_nascimento", "socio_nome_pai", "socio_nome_mae",
+        "comprasnet_login", "comprasnet_senha", "comprasnet_obs",
+        "pcp_login", "pcp_senha", "pcp_obs",
+        "bnc_login", "bnc_senha", "bnc_obs",
+        "licitanet_login", "licitanet_senha", "licitanet_obs",
+        "compraspara_login", "compraspara_senha", "compraspara_obs",
+        "created_at",
+    ]
+    _add_missing_columns(conn, "companies", {c: "TEXT" for c in need_cols})
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_companies_cnpj ON companies(cnpj)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_companies_name ON companies(name)")
+
+def ensure_company_credentials(conn) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS company_credentials(
+            id INTEGER PRIMARY KEY,
+            company_id INTEGER NOT NULL,
+            portal TEXT NOT NULL,
+            login TEXT,
+            senha TEXT,
+            url TEXT,
+            obs TEXT,
+            UNIQUE(company_id, portal),
+            FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE
+        )
+    """)
+
+def ensure_licitacoes_table(conn) -> None:
+    """Cria/ajusta a tabela `licitacoes` (idempotente)."""
+    _exec_script(conn, SCHEMA_SQL_LICITACOES)
+    _add_missing_columns(conn, "licitacoes", {"tem_lotes": "INTEGER DEFAULT 0", "created_at": "TEXT"})
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_licitacoes_empresa ON licitacoes(empresa_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_licitacoes_data ON licitacoes(data_sessao)")
+
+def ensure_legacy_tables(conn) -> None:
+    """Tabelas do módulo legado (certificates, processos, cotações, preco_*)."""
+    from .db_legacy import SCHEMA_SQL as _LEGACY_SCHEMA_SQL
+    _exec_script(conn, _LEGACY_SCHEMA_SQL)
+
+def ensure_cotacoes_table(conn) -> None:
     """Cria/ajusta a tabela `cotacoes` (empresa_id compatível com legado)."""
-    with _connect() as conn:
-        if not _has_table(conn, "cotacoes"):
-            conn.executescript("""
-                CREATE TABLE IF NOT EXISTS cotacoes (
-                    id INTEGER PRIMARY KEY,
-                    empresa_id INTEGER,
-                    item TEXT NOT NULL,
-                    preco REAL,
-                    validade TEXT,
-                    fonte TEXT,
-                    observacoes TEXT,
-                    created_at TEXT,
-                    FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
-                );
-                CREATE INDEX IF NOT EXISTS idx_cot_empresa ON cotacoes(empresa_id);
-            """)
-            conn.commit()
-        else:
-            cols = _columns(conn, "cotacoes")
-            if "empresa_id" not in cols:
-                conn.execute("ALTER TABLE cotacoes ADD COLUMN empresa_id INTEGER")
-            if "company_id" in cols:
-                conn.execute("UPDATE cotacoes SET empresa_id=company_id WHERE empresa_id IS NULL")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_cot_empresa ON cotacoes(empresa_id)")
-            if "created_at" not in cols:
-                conn.execute("ALTER TABLE cotacoes ADD COLUMN created_at TEXT")
-            conn.commit()
-
-# --- NOVO: Banco de Preços ---
-def ensure_banco_precos_table():
+    if not _has_table(conn, "cotacoes"):
+        _exec_script(conn, """
+            CREATE TABLE IF NOT EXISTS cotacoes (
+                id INTEGER PRIMARY KEY,
+                empresa_id INTEGER,
+                item TEXT NOT NULL,
+                preco REAL,
+                validade TEXT,
+                fonte TEXT,
+                observacoes TEXT,
+                created_at TEXT,
+                FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cot_empresa ON cotacoes(empresa_id);
+        """)
+        return
+    cols = _columns(conn, "cotacoes")
+    if "empresa_id" not in cols:
+        conn.execute("ALTER TABLE cotacoes ADD COLUMN empresa_id INTEGER")
+    if "company_id" in cols:
+        conn.execute("UPDATE cotacoes SET empresa_id=company_id WHERE empresa_id IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cot_empresa ON cotacoes(empresa_id)")
+    if "created_at" not in cols:
+        conn.execute("ALTER TABLE cotacoes ADD COLUMN created_at TEXT")
+
+# --- Banco de Preços ---
+def ensure_banco_precos_table(conn) -> None:
     """
     Cria/ajusta a tabela `banco_precos` com índices.
     Campos: produto, categoria, tipo_origem, origem_nome, marca, unidade, embalagem,
             preco (REAL), data_coleta (dd/mm/aaaa), link, observacoes, created_at.
     """
-    with _connect() as conn:
-        # cria se não existir
-        if not _has_table(conn, "banco_precos"):
-            conn.executescript("""
-                CREATE TABLE IF NOT EXISTS banco_precos (
-                    id INTEGER PRIMARY KEY,
-                    produto TEXT NOT NULL,
-                    categoria TEXT,
-                    tipo_origem TEXT,        -- Mercado | Fornecedor
-                    origem_nome TEXT,        -- nome do mercado/fornecedor
-                    marca TEXT,
-                    unidade TEXT,            -- ex.: kg, pacote, un, cx
-                    embalagem TEXT,          -- ex.: 5kg, 500g, 12x500ml
-                    preco REAL,
-                    data_coleta TEXT,        -- dd/mm/aaaa
-                    link TEXT,               -- quando online
-                    observacoes TEXT,
-                    created_at TEXT DEFAULT (datetime('now'))
-                );
-                CREATE INDEX IF NOT EXISTS idx_preco_produto  ON banco_precos(produto);
-                CREATE INDEX IF NOT EXISTS idx_preco_categoria ON banco_precos(categoria);
-                CREATE INDEX IF NOT EXISTS idx_preco_tipo      ON banco_precos(tipo_origem);
-                CREATE INDEX IF NOT EXISTS idx_preco_origem    ON banco_precos(origem_nome);
-                CREATE INDEX IF NOT EXISTS idx_preco_data      ON banco_precos(data_coleta);
-            """)
-            conn.commit()
-        else:
-            # garantir colunas e índices em bases antigas
-            cols = _columns(conn, "banco_precos")
-            want = {
-                "produto":"TEXT","categoria":"TEXT","tipo_origem":"TEXT","origem_nome":"TEXT",
-                "marca":"TEXT","unidade":"TEXT","embalagem":"TEXT","preco":"REAL",
-                "data_coleta":"TEXT","link":"TEXT","observacoes":"TEXT","created_at":"TEXT"
-            }
-            for c, typ in want.items():
-                if c not in cols:
-                    conn.execute(f"ALTER TABLE banco_precos ADD COLUMN {c} {typ}")
-            conn.executescript("""
-                CREATE INDEX IF NOT EXISTS idx_preco_produto  ON banco_precos(produto);
-                CREATE INDEX IF NOT EXISTS idx_preco_categoria ON banco_precos(categoria);
-                CREATE INDEX IF NOT EXISTS idx_preco_tipo      ON banco_precos(tipo_origem);
-                CREATE INDEX IF NOT EXISTS idx_preco_origem    ON banco_precos(origem_nome);
-                CREATE INDEX IF NOT EXISTS idx_preco_data      ON banco_precos(data_coleta);
-            """)
-            conn.commit()
-
-# --- NOVO: Certidões ---
-def ensure_certidoes_table():
+    _exec_script(conn, """
+        CREATE TABLE IF NOT EXISTS banco_precos (
+            id INTEGER PRIMARY KEY,
+            produto TEXT NOT NULL,
+            categoria TEXT,
+            tipo_origem TEXT,        -- Mercado | Fornecedor
+            origem_nome TEXT,        -- nome do mercado/fornecedor
+            marca TEXT,
+            unidade TEXT,            -- ex.: kg, pacote, un, cx
+            embalagem TEXT,          -- ex.: 5kg, 500g, 12x500ml
+            preco REAL,
+            data_coleta TEXT,        -- dd/mm/aaaa
+            link TEXT,               -- quando online
+            observacoes TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        );
+    """)
+    _add_missing_columns(conn, "banco_precos", {
+        "produto": "TEXT", "categoria": "TEXT", "tipo_origem": "TEXT", "origem_nome": "TEXT",
+        "marca": "TEXT", "unidade": "TEXT", "embalagem": "TEXT", "preco": "REAL",
+        "data_coleta": "TEXT", "link": "TEXT", "observacoes": "TEXT", "created_at": "TEXT",
+    })
+    _exec_script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_preco_produto  ON banco_precos(produto);
+        CREATE INDEX IF NOT EXISTS idx_preco_categoria ON banco_precos(categoria);
+        CREATE INDEX IF NOT EXISTS idx_preco_tipo      ON banco_precos(tipo_origem);
+        CREATE INDEX IF NOT EXISTS idx_preco_origem    ON banco_precos(origem_nome);
+        CREATE INDEX IF NOT EXISTS idx_preco_data      ON banco_precos(data_coleta);
+    """)
+
+# --- Certidões ---
+def ensure_certidoes_table(conn) -> None:
     """
     Tabela `certidoes` para controlar documentos por empresa.
     """
-    with _connect() as conn:
-        if not _has_table(conn, "certidoes"):
-            conn.executescript("""
-                CREATE TABLE IF NOT EXISTS certidoes (
-                    id INTEGER PRIMARY KEY,
-                    empresa_id INTEGER,             -- FK para companies.id
-                    tipo TEXT,                      -- ex: FGTS, INSS, Municipal, Estadual...
-                    orgao_emissor TEXT,             -- quem emite
-                    numero TEXT,                    -- identificador/código
-                    situacao TEXT,                  -- Válida | Vencida | Pendente
-                    dt_emissao TEXT,                -- dd/mm/aaaa
-                    dt_validade TEXT,               -- dd/mm/aaaa
-                    link_consulta TEXT,             -- URL de conferência
-                    arquivo TEXT,                   -- caminho/identificador do arquivo (opcional)
-                    observacoes TEXT,
-                    created_at TEXT DEFAULT (datetime('now')),
-                    FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
-                );
-                CREATE INDEX IF NOT EXISTS idx_cert_empresa  ON certidoes(empresa_id);
-                CREATE INDEX IF NOT EXISTS idx_cert_tipo     ON certidoes(tipo);
-                CREATE INDEX IF NOT EXISTS idx_cert_situacao ON certidoes(situacao);
-                CREATE INDEX IF NOT EXISTS idx_cert_validade ON certidoes(dt_validade);
-            """)
-            conn.commit()
+    _exec_script(conn, """
+        CREATE TABLE IF NOT EXISTS certidoes (
+            id INTEGER PRIMARY KEY,
+            empresa_id INTEGER,             -- FK para companies.id
+            tipo TEXT,                      -- ex: FGTS, INSS, Municipal, Estadual...
+            orgao_emissor TEXT,             -- quem emite
+            numero TEXT,                    -- identificador/código
+            situacao TEXT,                  -- Válida | Vencida | Pendente
+            dt_emissao TEXT,                -- dd/mm/aaaa
+            dt_validade TEXT,               -- dd/mm/aaaa
+            link_consulta TEXT,             -- URL de conferência
+            arquivo TEXT,                   -- caminho/identificador do arquivo (opcional)
+            observacoes TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY(empresa_id) REFERENCES companies(id) ON DELETE SET NULL
+        );
+    """)
+    _add_missing_columns(conn, "certidoes", {
+        "empresa_id": "INTEGER", "tipo": "TEXT", "orgao_emissor": "TEXT", "numero": "TEXT",
+        "situacao": "TEXT", "dt_emissao": "TEXT", "dt_validade": "TEXT", "link_consulta": "TEXT",
+        "arquivo": "TEXT", "observacoes": "TEXT", "created_at": "TEXT",
+    })
+    _exec_script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_cert_empresa  ON certidoes(empresa_id);
+        CREATE INDEX IF NOT EXISTS idx_cert_tipo     ON certidoes(tipo);
+        CREATE INDEX IF NOT EXISTS idx_cert_situacao ON certidoes(situacao);
+        CREATE INDEX IF NOT EXISTS idx_cert_validade ON certidoes(dt_validade);
+    """)
+
+# --- Busca textual do banco de preços (FTS5) ---
+def ensure_banco_precos_fts(conn) -> None:
+    """
+    Índice FTS5 (external content) sobre produto/marca/origem_nome/observacoes.
+    Sem acento/caixa (unicode61 remove_diacritics 2) e com índices de prefixo
+    para a busca "conforme digita". Triggers mantêm o índice em sincronia.
+    Se o SQLite não tiver FTS5, não cria nada (db.py volta ao LIKE).
+    """
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS banco_precos_fts USING fts5(
+                produto, marca, origem_nome, observacoes,
+                content='banco_precos', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError:
+        return
+    _exec_script(conn, """
+        CREATE TRIGGER IF NOT EXISTS trg_banco_precos_fts_ai AFTER INSERT ON banco_precos
+        BEGIN
+            INSERT INTO banco_precos_fts(rowid, produto, marca, origem_nome, observacoes)
+            VALUES (NEW.id, NEW.produto, NEW.marca, NEW.origem_nome, NEW.observacoes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_banco_precos_fts_ad AFTER DELETE ON banco_precos
+        BEGIN
+            INSERT INTO banco_precos_fts(banco_precos_fts, rowid, produto, marca, origem_nome, observacoes)
+            VALUES ('delete', OLD.id, OLD.produto, OLD.marca, OLD.origem_nome, OLD.observacoes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_banco_precos_fts_au
+        AFTER UPDATE OF id, produto, marca, origem_nome, observacoes ON banco_precos
+        BEGIN
+            INSERT INTO banco_precos_fts(banco_precos_fts, rowid, produto, marca, origem_nome, observacoes)
+            VALUES ('delete', OLD.id, OLD.produto, OLD.marca, OLD.origem_nome, OLD.observacoes);
+            INSERT INTO banco_precos_fts(rowid, produto, marca, origem_nome, observacoes)
+            VALUES (NEW.id, NEW.produto, NEW.marca, NEW.origem_nome, NEW.observacoes);
+        END;
+    """)
+    # indexa o que já existe
+    conn.execute("INSERT INTO banco_precos_fts(banco_precos_fts) VALUES ('rebuild')")
+
+# --- Datas ISO "sombra" (consultas por intervalo com índice) ---
+# (tabela, coluna texto, coluna ISO, índice)
+ISO_DATE_COLUMNS = (
+    ("licitacoes",   "data_sessao", "data_sessao_iso", "idx_licitacoes_data_iso"),
+    ("certidoes",    "dt_validade", "dt_validade_iso", "idx_cert_validade_iso"),
+    ("banco_precos", "data_coleta", "data_coleta_iso", "idx_preco_data_iso"),
+)
+
+def iso_date_sql(col: str) -> str:
+    """
+    Expressão SQL que converte `col` (dd/mm/aaaa, d/m/aaaa, dd-mm-aaaa,
+    aaaa-mm-dd, aaaa/mm/dd — com ou sem hora depois) em 'aaaa-mm-dd'.
+    Formato desconhecido ou data impossível -> NULL (date() valida).
+    """
+    v = f"replace(replace(trim({col}), '-', '/'), '.', '/')"
+    return f"""(CASE
+        WHEN trim({col}) GLOB '[0-9][0-9][0-9][0-9][-/][0-9][0-9][-/][0-9][0-9]*'
+            THEN date(substr(trim({col}),1,4)||'-'||substr(trim({col}),6,2)||'-'||substr(trim({col}),9,2))
+        WHEN {v} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+            THEN date(substr({v},7,4)||'-'||substr({v},4,2)||'-'||substr({v},1,2))
+        WHEN {v} GLOB '[0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+            THEN date(substr({v},6,4)||'-'||substr({v},3,2)||'-0'||substr({v},1,1))
+        WHEN {v} GLOB '[0-9][0-9]/[0-9]/[0-9][0-9][0-9][0-9]*'
+            THEN date(substr({v},6,4)||'-0'||substr({v},4,1)||'-'||substr({v},1,2))
+        WHEN {v} GLOB '[0-9]/[0-9]/[0-9][0-9][0-9][0-9]*'
+            THEN date(substr({v},5,4)||'-0'||substr({v},3,1)||'-0'||substr({v},1,1))
+    END)"""
+
+def ensure_iso_date_columns(conn) -> None:
+    """
+    Colunas ISO mantidas por trigger (qualquer caminho de escrita: CRUD,
+    lote, legado, SQL manual), preenchidas para as linhas existentes e indexadas.
+    """
+    for table, col, iso, idx in ISO_DATE_COLUMNS:
+        if not _has_table(conn, table):
+            continue
+        _add_missing_columns(conn, table, {iso: "TEXT"})
+        _exec_script(conn, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{iso}_ins AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table} SET {iso} = {iso_date_sql("NEW." + col)} WHERE id = NEW.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{iso}_upd AFTER UPDATE OF {col} ON {table}
+            BEGIN
+                UPDATE {table} SET {iso} = {iso_date_sql("NEW." + col)} WHERE id = NEW.id;
+            END;
+        """)
+        conn.execute(f"UPDATE {table} SET {iso} = {iso_date_sql(col)}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {idx} ON {table}({iso})")
+
+# --- Dinheiro em centavos inteiros (agregações no SQLite) ---
+def brl_text_to_cents_sql(col: str) -> str:
+    """
+    Texto monetário -> centavos (INTEGER). Aceita 'R$ 1.234,56', '1234,56' e
+    '1234.56' (o que a página de licitações grava). Vazio/sem dígito -> NULL.
+    """
+    v = f"replace(replace(replace(trim({col}), 'R$', ''), ' ', ''), char(160), '')"
+    return f"""(CASE
+        WHEN {col} IS NULL OR NOT ({v} GLOB '*[0-9]*') THEN NULL
+        WHEN instr({v}, ',') > 0
+            THEN CAST(ROUND(CAST(replace(replace({v}, '.', ''), ',', '.') AS REAL) * 100) AS INTEGER)
+        ELSE CAST(ROUND(CAST({v} AS REAL) * 100) AS INTEGER)
+    END)"""
+
+def real_to_cents_sql(col: str) -> str:
+    return f"(CASE WHEN {col} IS NULL THEN NULL ELSE CAST(ROUND({col} * 100) AS INTEGER) END)"
+
+# (tabela, coluna de exibição, coluna em centavos, conversor)
+CENTS_COLUMNS = (
+    ("licitacoes",   "valor_estimado", "valor_estimado_centavos", brl_text_to_cents_sql),
+    ("banco_precos", "preco",          "preco_centavos",          real_to_cents_sql),
+)
+
+def ensure_cents_columns(conn) -> None:
+    """Colunas *_centavos mantidas por trigger e preenchidas para as linhas existentes."""
+    for table, col, cents, conv in CENTS_COLUMNS:
+        if not _has_table(conn, table):
+            continue
+        _add_missing_columns(conn, table, {cents: "INTEGER"})
+        _exec_script(conn, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{cents}_ins AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table} SET {cents} = {conv("NEW." + col)} WHERE id = NEW.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{cents}_upd AFTER UPDATE OF {col} ON {table}
+            BEGIN
+                UPDATE {table} SET {cents} = {conv("NEW." + col)} WHERE id = NEW.id;
+            END;
+        """)
+        conn.execute(f"UPDATE {table} SET {cents} = {conv(col)}")
+
+# --- Cotações (RFQ do legado) ---
+def ensure_cotacao_indexes(conn) -> None:
+    """Índices das junções do ranking/matriz de cotação (itens, fornecedores, respostas)."""
+    _exec_script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_cot_itens_cotacao ON cotacao_itens(cotacao_id);
+        CREATE INDEX IF NOT EXISTS idx_cot_forn_cotacao  ON cotacao_fornecedores(cotacao_id);
+        CREATE INDEX IF NOT EXISTS idx_cot_resp_item     ON cotacao_respostas(item_id);
+        CREATE INDEX IF NOT EXISTS idx_cot_resp_forn     ON cotacao_respostas(fornecedor_id);
+    """)
+
+def ensure_cotacao_respostas_unique(conn) -> None:
+    """
+    Uma resposta por (fornecedor, item): remove duplicatas — fica a de menor id,
+    que era a que get_preco_resposta/set_preco_resposta já enxergavam — e cria
+    o índice UNIQUE usado pelo ON CONFLICT. Ele cobre as buscas por fornecedor.
+    """
+    _exec_script(conn, """
+        DELETE FROM cotacao_respostas
+         WHERE id NOT IN (SELECT MIN(id) FROM cotacao_respostas GROUP BY fornecedor_id, item_id);
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_cot_resp_forn_item ON cotacao_respostas(fornecedor_id, item_id);
+        DROP INDEX IF EXISTS idx_cot_resp_forn;
+    """)
+
+# --- Estatísticas de preço (services/preco_stats.py) ---
+def ensure_preco_stats_tables(conn) -> None:
+    """
+    Resumo por chave (`preco_stats`) + fila de chaves a recalcular
+    (`preco_stats_dirty`), alimentada por triggers em preco_registros
+    (item_id) e banco_precos (produto normalizado). Na criação, todas as
+    chaves existentes entram na fila.
+
+    A fila do banco guarda LOWER(TRIM(produto)) do SQLite, que só dobra
+    ASCII; preco_stats.chave_produto() completa a normalização (acentos,
+    Unicode) ao consumir a fila — os triggers não dependem de função Python
+    registrada na conexão. Pelo mesmo motivo a chave Unicode de cada linha
+    (`banco_precos.chave_produto`, indexada) é preenchida pelo preco_stats:
+    linha nova chega com NULL e o trigger de UPDATE a zera quando o produto muda.
+    """
+    _add_missing_columns(conn, "banco_precos", {"chave_produto": "TEXT"})
+    _exec_script(conn, """
+        CREATE TABLE IF NOT EXISTS preco_stats (
+            fonte TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            n INTEGER, media REAL, mediana REAL, media_aparada REAL,
+            p25 REAL, p75 REAL, iqr REAL, lim_inf REAL, lim_sup REAL,
+            outliers INTEGER, referencia REAL, minimo REAL, maximo REAL,
+            atualizado_em TEXT,
+            PRIMARY KEY (fonte, chave)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS preco_stats_dirty (
+            fonte TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            PRIMARY KEY (fonte, chave)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_preco_reg_item ON preco_registros(item_id);
+        CREATE INDEX IF NOT EXISTS idx_preco_chave ON banco_precos(chave_produto);
+
+        CREATE TRIGGER IF NOT EXISTS trg_pstats_reg_ins AFTER INSERT ON preco_registros BEGIN
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('registros', CAST(NEW.item_id AS TEXT));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_pstats_reg_del AFTER DELETE ON preco_registros BEGIN
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('registros', CAST(OLD.item_id AS TEXT));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_pstats_reg_upd AFTER UPDATE OF item_id, preco_unit ON preco_registros BEGIN
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('registros', CAST(OLD.item_id AS TEXT));
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('registros', CAST(NEW.item_id AS TEXT));
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_pstats_bp_ins AFTER INSERT ON banco_precos BEGIN
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('banco', LOWER(TRIM(NEW.produto)));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_pstats_bp_del AFTER DELETE ON banco_precos BEGIN
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('banco', LOWER(TRIM(OLD.produto)));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_pstats_bp_upd AFTER UPDATE OF produto, preco, preco_centavos ON banco_precos BEGIN
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('banco', LOWER(TRIM(OLD.produto)));
+            INSERT OR IGNORE INTO preco_stats_dirty VALUES ('banco', LOWER(TRIM(NEW.produto)));
+            UPDATE banco_precos SET chave_produto = NULL
+             WHERE id = NEW.id AND NEW.produto IS NOT OLD.produto;
+        END;
+
+        INSERT OR IGNORE INTO preco_stats_dirty
+            SELECT DISTINCT 'registros', CAST(item_id AS TEXT) FROM preco_registros;
+        INSERT OR IGNORE INTO preco_stats_dirty
+            SELECT DISTINCT 'banco', LOWER(TRIM(produto)) FROM banco_precos WHERE produto IS NOT NULL;
+    """)
+
+# --- Arquivo morto (services/archive.py) ---
+# (tabela quente, coluna de data ISO que decide a idade, índices extras do arquivo)
+ARCHIVE_TABLES = (
+    ("licitacoes",   "data_sessao_iso", ("empresa_id",)),
+    ("certidoes",    "dt_validade_iso", ("empresa_id",)),
+    ("banco_precos", "data_coleta_iso", ("produto",)),
+)
+
+def ensure_archive_tables(conn) -> None:
+    """
+    Para cada tabela de ARCHIVE_TABLES: `<t>_archive` com as mesmas colunas
+    (+ archived_at) e a view `<t>_all` (quente UNION ALL arquivo, com a
+    coluna `arquivada` 0/1). Também cria o piso de IDs (id_alloc.id_floor).
+    Idempotente: acompanha colunas novas da tabela quente e recria as views —
+    chame de novo em migrações que acrescentem colunas a essas tabelas.
+    """
+    from . import id_alloc
+    id_alloc.install_floor(conn)
+    for table, date_col, extra_idx in ARCHIVE_TABLES:
+        if not _has_table(conn, table):
+            continue
+        info = [(r[1], r[2] or "") for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        cols = [name for name, _typ in info]
+        arch = f"{table}_archive"
+        if not _has_table(conn, arch):
+            defs = ", ".join("id INTEGER PRIMARY KEY" if name == "id" else f"{name} {typ}".strip()
+                             for name, typ in info)
+            conn.execute(f"CREATE TABLE {arch} ({defs}, archived_at TEXT)")
         else:
-            cols = _columns(conn, "certidoes")
-            need = {
-                "empresa_id":"INTEGER","tipo":"TEXT","orgao_emissor":"TEXT","numero":"TEXT",
-                "situacao":"TEXT","dt_emissao":"TEXT","dt_validade":"TEXT","link_consulta":"TEXT",
-                "arquivo":"TEXT","observacoes":"TEXT","created_at":"TEXT"
-            }
-            for c, t in need.items():
-                if c not in cols:
-                    conn.execute(f"ALTER TABLE certidoes ADD COLUMN {c} {t}")
-            conn.executescript("""
-                CREATE INDEX IF NOT EXISTS idx_cert_empresa  ON certidoes(empresa_id);
-                CREATE INDEX IF NOT EXISTS idx_cert_tipo     ON certidoes(tipo);
-                CREATE INDEX IF NOT EXISTS idx_cert_situacao ON certidoes(situacao);
-                CREATE INDEX IF NOT EXISTS idx_cert_validade ON certidoes(dt_validade);
-            """)
-            conn.commit()
+            have = _columns(conn, arch)
+            for name, typ in info:
+                if name not in have:
+                    conn.execute(f"ALTER TABLE {arch} ADD COLUMN {name} {typ}".rstrip())
+        for col in (date_col,) + tuple(extra_idx):
+            if col in cols:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{arch}_{col} ON {arch}({col})")
+        col_sql = ", ".join(cols)
+        conn.execute(f"DROP VIEW IF EXISTS {table}_all")
+        conn.execute(f"""
+            CREATE VIEW {table}_all AS
+                SELECT {col_sql}, NULL AS archived_at, 0 AS arquivada FROM {table}
+                UNION ALL
+                SELECT {col_sql}, archived_at, 1 AS arquivada FROM {arch}
+        """)
+
+# -----------------------------------------------------------------------------
+# Registro de migrações
+# -----------------------------------------------------------------------------
+def _m001_baseline(conn) -> None:
+    """Tudo o que antes era garantido por chamada (db.py, db_legacy.py e este módulo)."""
+    ensure_companies_columns(conn)
+    ensure_licitacoes_table(conn)
+    ensure_legacy_tables(conn)
+    ensure_company_credentials(conn)
+    ensure_cotacoes_table(conn)
+    ensure_banco_precos_table(conn)
+    ensure_certidoes_table(conn)
+
+def _m002_id_freelist(conn) -> None:
+    """Free-list de IDs + triggers (substitui a varredura de _smallest_free_id)."""
+    from . import id_alloc
+    id_alloc.install(conn)
+
+def _m003_banco_precos_fts(conn) -> None:
+    ensure_banco_precos_fts(conn)
+
+def _m004_iso_dates(conn) -> None:
+    ensure_iso_date_columns(conn)
+
+def _m005_money_cents(conn) -> None:
+    ensure_cents_columns(conn)
+
+def _m006_cotacao_indexes(conn) -> None:
+    ensure_cotacao_indexes(conn)
+
+def _m007_cotacao_respostas_unique(conn) -> None:
+    ensure_cotacao_respostas_unique(conn)
+
+def _m008_preco_stats(conn) -> None:
+    ensure_preco_stats_tables(conn)
+
+def _m009_archive(conn) -> None:
+    ensure_archive_tables(conn)
+
+def _m010_preco_stats_chaves(conn) -> None:
+    # resumo do banco passou a usar a chave Unicode (preco_stats.chave_produto):
+    # descarta o resumo antigo e põe todos os produtos na fila de recálculo
+    ensure_preco_stats_tables(conn)
+    _exec_script(conn, """
+        DELETE FROM preco_stats WHERE fonte = 'banco';
+        INSERT OR IGNORE INTO preco_stats_dirty
+            SELECT DISTINCT 'banco', LOWER(TRIM(produto)) FROM banco_precos WHERE produto IS NOT NULL;
+    """)
+
+def _m011_preco_chave_coluna(conn) -> None:
+    # chave Unicode gravada em banco_precos.chave_produto (indexada): o recálculo
+    # incremental filtra pela coluna em vez de chamar a função em toda linha
+    conn.execute("DROP TRIGGER IF EXISTS trg_pstats_bp_upd")
+    ensure_preco_stats_tables(conn)
+    ensure_archive_tables(conn)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "esquema base (empresas, licitações, legado, banco de preços, certidões)", _m001_baseline),
+    (2, "free-list de IDs para reuso de lacunas sem varredura", _m002_id_freelist),
+    (3, "índice FTS5 da busca do banco de preços", _m003_banco_precos_fts),
+    (4, "colunas de data ISO (sessão, validade, coleta) com índice", _m004_iso_dates),
+    (5, "valores em centavos inteiros (valor estimado, preço)", _m005_money_cents),
+    (6, "índices de cotação (itens, fornecedores, respostas)", _m006_cotacao_indexes),
+    (7, "resposta única por fornecedor/item (dedup + UNIQUE)", _m007_cotacao_respostas_unique),
+    (8, "resumo incremental de estatísticas de preço", _m008_preco_stats),
+    (9, "arquivo morto (*_archive, views *_all) e piso de IDs", _m009_archive),
+    (10, "chaves Unicode no resumo de preços do banco", _m010_preco_stats_chaves),
+    (11, "coluna indexada com a chave Unicode do produto (banco de preços)", _m011_preco_chave_coluna),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_lock = threading.Lock()
+_done: set[str] = set()
+
+def current_version(conn) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0] or 0)
+
+def migrate(path: Optional[str] = None) -> int:
+    """
+    Aplica as migrações pendentes e devolve a versão final do esquema.
+    Depois da primeira chamada bem-sucedida no processo, é um no-op.
+    """
+    key = path or DB_PATH
+    if key in _done:
+        return LATEST_VERSION
+    with _lock:
+        if key in _done:
+            return LATEST_VERSION
+        conn = _pool.get_connection(key)
+        prev_factory = conn.row_factory
+        conn.row_factory = sqlite3.Row
+        try:
+            version = current_version(conn)
+            for num, _desc, step in MIGRATIONS:
+                if num <= version:
+                    continue
+                if conn.in_transaction:
+                    conn.commit()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # outro processo pode ter migrado enquanto esperávamos o lock
+                    if current_version(conn) >= num:
+                        conn.rollback()
+                        continue
+                    step(conn)
+                    conn.execute(f"PRAGMA user_version = {int(num)}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                version = num
+        finally:
+            conn.row_factory = prev_factory
+        _done.add(key)
+        return version
+
+def run_all() -> int:
+    """Compat: antigo ponto de entrada das migrações."""
+    return migrate()
@@ -0,0 +1,37 @@
+# services/money.py — leitura de valores monetários digitados/importados (formato BR)
+from __future__ import annotations
+
+"""
+Uma regra só para texto de dinheiro, usada pela importação (services/imports.py)
+e pela gravação de preços do legado (services/db_legacy.py):
+
+- 'R$ 1.234,56' | '1234,56' -> 1234.56 (vírgula decimal, ponto de milhar);
+- '1.234.567' -> 1234567 (só milhar);
+- '1.234' | '12.345' -> 1234 | 12345: um ponto seguido de exatamente três
+  dígitos é milhar, como se digita no Brasil (não 1,234 / 12,345);
+- '1234.5' | '1234.56' -> decimal com ponto (planilha/sistema em formato US).
+"""
+
+import re
+from typing import Any, Optional
+
+_MILHAR = re.compile(r"[-+]?\d+\.\d{3}")
+
+
+def parse_brl(value: Any) -> Optional[float]:
+    """Número de um valor monetário; None se vazio ou inválido."""
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = str(value).strip().replace("R$", "").replace("\xa0", "").replace(" ", "")
+    if not s:
+        return None
+    if "," in s:                                   # ponto = milhar, vírgula = decimal
+        s = s.replace(".", "").replace(",", ".")
+    elif s.count(".") > 1 or _MILHAR.fullmatch(s):  # 1.234.567 / 1.234 (só milhar)
+        s = s.replace(".", "")
+    try:
+        return float(s)
+    except ValueError:
+        return None
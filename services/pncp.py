@@ -1,14 +1,13 @@
 # === services/pncp.py ===
 from __future__ import annotations
-import os, json, time, threading, datetime as dt
-from typing import List, Dict, Any, Optional
+import os, json, time, hashlib, threading, datetime as dt
+from typing import List, Dict, Any, Iterator, Optional
 
-# Dependências opcionais (rodamos com fallback se não estiverem instaladas)
-try:
-    import requests  # type: ignore
-except Exception:
-    requests = None  # fallback
+# HTTP: transporte compartilhado (pool keep-alive; sem `requests`, urllib)
+from services import transport
+from services.pncp_client import PNCPClient, PNCPError
 
+# Dependências opcionais (rodamos com fallback se não estiverem instaladas)
 try:
     from PyPDF2 import PdfReader  # type: ignore
 except Exception:
@@ -28,9 +27,15 @@ EDITAIS_DIR = os.path.join(DATA_DIR, "editais")
 os.makedirs(EDITAIS_DIR, exist_ok=True)
 LOG_PATH = os.path.join(DATA_DIR, "pncp_job.log")
 FILTERS_PATH = os.path.join(DATA_DIR, "pncp_filtros.json")
+SYNC_STATE_PATH = os.path.join(DATA_DIR, "pncp_sync.json")   # marcas do sync incremental
+
+# API de consulta do PNCP (o cliente escolhe /licitacoes ou /compras; se nada responder, o fallback simula)
+PNCP_API_BASE = "https://pncp.gov.br/api/consulta/v1"
+PAGE_SIZE = 50
+MAX_PAGES = 20
 
-# Endpoint do PNCP (exemplo plausível; se mudar, o fallback simula)
-PNCP_SEARCH_URL = "https://pncp.gov.br/api/consulta/v1/contratacoes"  # endpoint de referência
+_client: Optional[PNCPClient] = None
+_client_lock = threading.Lock()
 
 # ----------------------------- utilitários -----------------------------
 def _log(msg: str) -> None:
@@ -89,53 +94,90 @@ def search_opportunities(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
       - data_ini: dd/mm/aaaa (opcional)
       - data_fim: dd/mm/aaaa (opcional)
     """
-    # Persistimos os filtros para serem usados pelo job diário
-    _save_filters_to_disk(filters)
+    rows: List[Dict[str, Any]] = []
+    try:
+        for batch in iter_opportunities(filters):
+            rows.extend(batch)
+    except (PNCPError, transport.TransportError) as ex:
+        # falhou no meio: as páginas reais já obtidas valem (nada de simulado junto)
+        _log(f"PNCP interrompido após {len(rows)} oportunidade(s): {ex}")
+    return rows
+
+def _get_client() -> PNCPClient:
+    # um cliente por processo: tela e job diário dividem o mesmo limite de taxa e o cache
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PNCPClient(PNCP_API_BASE, timeout=25)
+    return _client
+
+def _oportunidade_id(r: Dict[str, Any], i: int) -> Any:
+    # sem id do PNCP: órgão + processo + publicação (o nº de processo sozinho se repete entre órgãos);
+    # hash curto porque o id também vira nome de arquivo do edital
+    if r.get("id_remoto"):
+        return r["id_remoto"]
+    parts = [_clean_text(r.get(k)).lower() for k in ("orgao", "numero_processo", "data_publicacao")]
+    if not any(parts):
+        return 10000 + i
+    return "p" + hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def _to_oportunidade(r: Dict[str, Any], i: int) -> Dict[str, Any]:
+    # linha normalizada do PNCPClient -> formato de oportunidade (tela/DB)
+    return {
+        "id": _oportunidade_id(r, i),
+        "uf": r.get("uf") or "",
+        "municipio": r.get("municipio") or "",
+        "orgao": r.get("orgao") or "",
+        "objeto": r.get("objeto") or "",
+        "data_sessao": r.get("data_sessao") or "",
+        "data_publicacao": r.get("data_publicacao") or "",
+        "valor_estimado": r.get("valor_estimado") or "",
+        "link": r.get("link_edital") or "",
+        "edital_url": r.get("link_edital") or "",
+    }
 
-    if requests is None:
-        _log("requests ausente — retornando resultados simulados.")
-        return _simulate_results(filters)
-
-    # Monta query (ajuste conforme docs do PNCP)
-    params = {}
-    if filters.get("ufs"):
-        params["uf"] = ",".join(filters["ufs"])
-    if filters.get("municipios"):
-        params["municipio"] = ",".join(filters["municipios"])
-    if filters.get("orgaos"):
-        params["orgao"] = ",".join(filters["orgaos"])
-    if _clean_text(filters.get("objeto")):
-        params["objeto"] = _clean_text(filters["objeto"])
-    if _clean_text(filters.get("data_ini")):
-        params["dataInicial"] = _clean_text(filters["data_ini"])
-    if _clean_text(filters.get("data_fim")):
-        params["dataFinal"] = _clean_text(filters["data_fim"])
+def _iter_pages(filters: Dict[str, Any],
+                info: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Páginas de oportunidades conforme chegam; PNCPError se a API não responder.
+    `info`, se passado, recebe o last_stats do cliente ao fim (ex.: "stop").
+    """
+    client = _get_client()
+    i = 0
+    for page in client.iter_licitacoes(
+        termo=_clean_text(filters.get("objeto")) or None,
+        uf=",".join(filters.get("ufs") or []) or None,
+        municipio=",".join(filters.get("municipios") or []) or None,
+        orgao_nome=",".join(filters.get("orgaos") or []) or None,
+        data_ini=_clean_text(filters.get("data_ini")) or None,
+        data_fim=_clean_text(filters.get("data_fim")) or None,
+        tamanho=PAGE_SIZE, limite_paginas=MAX_PAGES, por_pagina=True,
+    ):
+        yield [_to_oportunidade(r, i + k) for k, r in enumerate(page)]
+        i += len(page)
+    if info is not None:
+        info.update(client.last_stats)
 
+def iter_opportunities(filters: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Como search_opportunities, mas em lotes (uma página do PNCP por vez) para
+    a tela ir preenchendo a tabela. Sem rede/API logo na 1ª página, um único
+    lote simulado; falha depois de lotes reais sobe como PNCPError (os lotes
+    já entregues valem, nada simulado é misturado a eles).
+    """
+    # Persistimos os filtros para serem usados pelo job diário
+    _save_filters_to_disk(filters)
+    entregues = 0
     try:
-        r = requests.get(PNCP_SEARCH_URL, params=params, timeout=25)
-        if r.status_code != 200:
-            _log(f"PNCP HTTP {r.status_code} — usando fallback.")
-            return _simulate_results(filters)
-        data = r.json() if callable(getattr(r, "json", None)) else []
-    except Exception as ex:
-        _log(f"PNCP erro de rede: {ex} — usando fallback.")
-        return _simulate_results(filters)
-
-    results: List[Dict[str, Any]] = []
-    for i, raw in enumerate(data or []):
-        # Adaptar conforme o schema real do PNCP
-        results.append({
-            "id": raw.get("id") or (10000 + i),
-            "uf": raw.get("uf") or "",
-            "municipio": raw.get("municipio") or "",
-            "orgao": raw.get("orgao") or "",
-            "objeto": raw.get("objeto") or "",
-            "data_sessao": raw.get("dataSessao") or "",
-            "valor_estimado": raw.get("valorEstimado") or "",
-            "link": raw.get("linkPublicacao") or "",
-            "edital_url": raw.get("editalUrl") or "",
-        })
-    return results
+        for batch in _iter_pages(filters):
+            entregues += 1
+            yield batch
+    except (PNCPError, transport.TransportError) as ex:
+        if entregues:
+            raise
+        _log(f"PNCP indisponível: {ex} — usando fallback.")
+        yield _simulate_results(filters)
 
 def download_edital(url: str, *, oportunidade_id: Any) -> Optional[str]:
     """Baixa o PDF do edital, salva em data/editais/<id>.pdf e retorna o caminho.
@@ -146,19 +188,11 @@ def download_edital(url: str, *, oportunidade_id: Any) -> Optional[str]:
     if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
         return file_path
 
-    if requests is None:
-        _log("requests ausente — não foi possível baixar edital.")
-        return None
-
     try:
-        with requests.get(url, stream=True, timeout=30) as r:
-            if r.status_code != 200:
-                _log(f"Falha baixando edital ({r.status_code}) {url}")
-                return None
-            with open(file_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+        status = transport.download(url, file_path, timeout=30)
+        if status != 200:
+            _log(f"Falha baixando edital ({status}) {url}")
+            return None
         return file_path
     except Exception as ex:
         _log(f"Erro baixando edital: {ex}")
@@ -190,10 +224,15 @@ def upsert_oportunidades(rows: List[Dict[str, Any]]) -> int:
     Tenta inserir/atualizar oportunidades no DB, caso as funções existam.
     Retorna quantos foram gravados.
     """
-    if not rows:
-        return 0
+    return len(_upsert(rows) or [])
+
+def _upsert(rows: List[Dict[str, Any]]) -> Optional[List[str]]:
+    """
+    upsert_oportunidades devolvendo os IDs (texto) efetivamente gravados;
+    None se o DB não tem onde gravar oportunidades.
+    """
     if db is None:
-        return 0
+        return None
     # Procuramos função(s)
     f_add = None
     for n in ["add_oportunidade", "oportunidade_add", "nova_oportunidade"]:
@@ -205,17 +244,196 @@ def upsert_oportunidades(rows: List[Dict[str, Any]]) -> int:
             if hasattr(db, n):
                 f_add = getattr(db, n); break
     if not callable(f_add):
-        return 0
+        return None
 
-    ok = 0
+    ok: List[str] = []
     for r in rows:
         try:
             f_add(r)
-            ok += 1
+            ok.append(str(r.get("id")))
         except Exception as ex:
             _log(f"Falha add oportunidade: {ex}")
     return ok
 
+# ----------------------------- Sync incremental -----------------------------
+# Por filtro salvo guardamos a maior data de publicação já vista (marca) e os
+# IDs vistos a partir de (marca - sobreposição). A próxima execução só pede a
+# janela desde a marca - sobreposição e descarta os IDs já vistos: o custo
+# diário acompanha o que foi publicado de novo, não o histórico inteiro.
+# - 1ª execução (sem marca): janela dos últimos SYNC_BOOTSTRAP_DAYS dias.
+# - Janela maior que MAX_PAGES páginas: a API ordena por publicação DESC, então
+#   a execução continua em sub-janelas (data_fim = dia mais antigo já visto)
+#   até uma página curta/vazia.
+# - A marca só avança quando a janela veio inteira: erro de página/rede deixa
+#   a marca onde estava. Exceção: sem marca anterior e um único dia com mais
+#   que o limite, a marca nasce na publicação mais nova vista (ponto de partida).
+# - Só entram em "vistos" os IDs de fato gravados; a marca não passa da
+#   publicação mais antiga que falhou ao gravar; sem onde gravar, a marca fica.
+_SYNC_COMPLETE = ("pagina_curta", "pagina_vazia")
+SYNC_OVERLAP_DAYS = 1
+SYNC_BOOTSTRAP_DAYS = 30
+_SYNC_MAX_IDS = 5000
+_sync_lock = threading.Lock()
+
+def _filter_key(filters: Dict[str, Any]) -> str:
+    # a janela de datas não faz parte da identidade do filtro
+    ident = {k: v for k, v in (filters or {}).items() if k not in ("data_ini", "data_fim") and v not in (None, "", [])}
+    return json.dumps(ident, ensure_ascii=False, sort_keys=True)
+
+def _pub_day(v: Any) -> Optional[dt.date]:
+    """'aaaa-mm-dd[Thh:mm...]' ou 'dd/mm/aaaa' -> date."""
+    s = _clean_text(v)[:10]
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return dt.datetime.strptime(s, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+def _load_sync_state() -> Dict[str, Any]:
+    try:
+        with open(SYNC_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
+
+def _save_sync_state(state: Dict[str, Any]) -> None:
+    # atômico: arquivo temporário + os.replace (nunca deixa um JSON pela metade)
+    tmp = SYNC_STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, SYNC_STATE_PATH)
+
+def sync_incremental(filters: Optional[Dict[str, Any]] = None,
+                     overlap_days: int = SYNC_OVERLAP_DAYS,
+                     bootstrap_days: int = SYNC_BOOTSTRAP_DAYS) -> Dict[str, Any]:
+    """
+    Busca só o que saiu desde a última marca do filtro (padrão: filtros salvos),
+    grava as novas oportunidades e avança a marca. Falha de rede, janela
+    incompleta ou DB sem onde gravar não avançam a marca (a próxima execução
+    repete a mesma janela).
+    Retorna {"obtidas", "novas", "gravadas", "desde", "marca", "completa"}.
+    """
+    filters = dict(filters if filters is not None else _load_filters_from_disk())
+    key = _filter_key(filters)
+    with _sync_lock:
+        mark = _load_sync_state().get(key) or {}
+    last = _pub_day(mark.get("ultima_publicacao"))
+    hoje = dt.date.today()
+    overlap = dt.timedelta(days=max(0, int(overlap_days)))
+    if last is not None:
+        desde = last - overlap
+    else:
+        desde = hoje - dt.timedelta(days=max(0, int(bootstrap_days)))
+    user_ini = _pub_day(filters.get("data_ini"))
+    if user_ini is None or user_ini < desde:
+        filters["data_ini"] = desde.strftime("%d/%m/%Y")
+    else:
+        desde = user_ini
+
+    # streaming: cada página é filtrada e gravada assim que chega (memória ~ uma página)
+    seen = {str(i) for i in (mark.get("ids") or {})}
+    obtidas = novas = gravadas = 0
+    top: Optional[dt.date] = None              # publicação mais nova desta execução
+    fresh: Dict[str, Optional[dt.date]] = {}   # id gravado -> publicação, desta execução
+    failed: Optional[dt.date] = None           # publicação mais antiga que não gravou
+    sem_destino = False                        # services.db sem função de oportunidade
+    fim = _pub_day(filters.get("data_fim"))
+    prev_oldest: Optional[dt.date] = None
+    stop = None
+    try:
+        while True:
+            janela = dict(filters)
+            if fim is not None:
+                janela["data_fim"] = fim.strftime("%d/%m/%Y")
+            info: Dict[str, Any] = {}
+            oldest: Optional[dt.date] = None
+            for page in _iter_pages(janela, info):
+                obtidas += len(page)
+                batch = [r for r in page if str(r.get("id")) not in seen]
+                done = _upsert(batch) if batch else []
+                if done is None:
+                    sem_destino = True
+                else:
+                    novas += len(batch)
+                saved = set(done or [])
+                gravadas += len(saved)
+                pending = {str(r.get("id")) for r in batch}
+                for r in page:
+                    d = _pub_day(r.get("data_publicacao"))
+                    if d is not None:
+                        top = d if top is None else max(top, d)
+                        oldest = d if oldest is None else min(oldest, d)
+                    rid = str(r.get("id"))
+                    if rid in saved:
+                        fresh[rid] = d
+                        seen.add(rid)
+                    elif done is not None and rid in pending:
+                        day = d or hoje
+                        failed = day if failed is None else min(failed, day)
+            stop = info.get("stop")
+            if stop != "limite_paginas":
+                break
+            # mais que MAX_PAGES na janela: segue do dia mais antigo visto para trás
+            # (mesmo dia incluso; os IDs já gravados são descartados)
+            if oldest is None or (prev_oldest is not None and oldest >= prev_oldest):
+                break   # um só dia passa do limite: não dá para fatiar mais
+            prev_oldest = fim = oldest
+    except (PNCPError, transport.TransportError) as ex:
+        # os já gravados ainda entram em "vistos"; a marca fica (tratado como incompleta)
+        _log(f"Sync incremental: PNCP indisponível ({ex}).")
+        stop = "erro"
+
+    completa = stop in _SYNC_COMPLETE and not sem_destino
+    new_mark: Optional[dt.date] = last
+    if sem_destino:
+        _log("Sync incremental: services.db não tem onde gravar oportunidades — marca mantida.")
+    elif completa:
+        # nova marca: maior publicação vista (sem datas, o dia de hoje)
+        new_mark = max((d for d in (last, top) if d is not None), default=hoje)
+    elif last is None and stop == "limite_paginas":
+        # sem marca e um dia além do limite: começa da publicação mais nova (DESC: veio primeiro)
+        new_mark = top or hoje
+        _log(f"Sync incremental: 1ª execução além do limite de páginas — marca inicial {new_mark}.")
+    else:
+        # parte da janela não veio: marca antiga, para a próxima execução pedir tudo de novo
+        _log(f"Sync incremental: janela incompleta ({stop}) — marca mantida.")
+    if new_mark is not None and failed is not None:
+        # volta até a falha: a próxima janela (marca - sobreposição) a inclui de novo
+        new_mark = min(new_mark, failed + overlap)
+
+    corte = (new_mark - overlap) if new_mark else None
+    # IDs vistos (id -> dia de publicação) só enquanto ainda caem na sobreposição
+    ids = {i: d for i, d in (mark.get("ids") or {}).items()
+           if corte is None or (_pub_day(d) or hoje) >= corte}
+    for i, d in fresh.items():
+        if corte is None or (d or hoje) >= corte:
+            ids[i] = (d or hoje).isoformat()
+    marca = new_mark.isoformat() if new_mark else None
+    with _sync_lock:
+        state = _load_sync_state()
+        state[key] = {
+            "ultima_publicacao": marca,
+            "ids": dict(sorted(ids.items(), key=lambda kv: kv[1], reverse=True)[:_SYNC_MAX_IDS]),
+            "atualizado_em": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        _save_sync_state(state)
+    _log(f"Sync incremental: {obtidas} obtidas desde {desde}; "
+         f"{novas} novas; {gravadas} gravadas; marca {marca or '-'}.")
+    return {"obtidas": obtidas, "novas": novas, "gravadas": gravadas,
+            "desde": desde.isoformat(), "marca": marca, "completa": completa,
+            **({"erro": True} if stop == "erro" else {})}
+
+def reset_sync(filters: Optional[Dict[str, Any]] = None) -> None:
+    """Esquece a marca do filtro (ou de todos, com filters=None): próxima sync é completa."""
+    with _sync_lock:
+        state = _load_sync_state() if filters is not None else {}
+        if filters is not None:
+            state.pop(_filter_key(filters), None)
+        _save_sync_state(state)
+
 # ----------------------------- Agendamento diário -----------------------------
 _job_thread: Optional[threading.Thread] = None
 _job_stop = threading.Event()
@@ -239,12 +457,11 @@ def _job_loop(hour: int, minute: int):
         if _job_stop.is_set():
             break
 
-        # Executa pull com os filtros salvos
+        # Pull incremental com os filtros salvos (só a janela desde a última marca)
         try:
-            filters = _load_filters_from_disk()
-            rows = search_opportunities(filters)
-            saved = upsert_oportunidades(rows)
-            _log(f"Job executado: {len(rows)} obtidas; {saved} gravadas no DB.")
+            res = sync_incremental()
+            _log(f"Job executado: {res['obtidas']} obtidas; {res['novas']} novas; "
+                 f"{res['gravadas']} gravadas no DB.")
         except Exception as ex:
             _log(f"Job erro: {ex}")
 
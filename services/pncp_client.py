@@ -2,24 +2,90 @@
 # Cliente PNCP (consulta pública) – Python 3.11+ / sem dependências obrigatórias
 from __future__ import annotations
 
-import json
+import os
+import threading
 import time
 import datetime as dt
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-try:
-    import requests  # type: ignore
-    _HAS_REQUESTS = True
-except Exception:
-    import urllib.request
-    import urllib.parse
-    _HAS_REQUESTS = False
+from . import http_cache, transport
 
 
 class PNCPError(Exception):
     pass
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+# Limites padrão de acesso à API (requisições/s e paralelismo); ajustáveis por env
+DEFAULT_RPS = _env_float("SOS_PNCP_RPS", 3.0)
+DEFAULT_WORKERS = max(1, int(_env_float("SOS_PNCP_WORKERS", 4)))
+_RETRY_STATUS = (429, 503)      # "devagar": espera e tenta de novo a mesma página
+_RETRIES = 3
+
+
+class _TokenBucket:
+    """
+    Limitador de taxa compartilhado pelas threads: `rate` fichas/s, até
+    `burst` acumuladas. acquire() bloqueia até haver ficha; pause() (após
+    429/503) segura todo mundo por alguns segundos.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1.0, float(burst if burst is not None else self.rate))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._hold_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Pega uma ficha; devolve quanto tempo (s) esperou."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if now >= self._hold_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = max(self._hold_until - now, (1.0 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._hold_until = max(self._hold_until, time.monotonic() + max(0.0, seconds))
+            self._tokens = 0.0
+
+
+class _RunStats:
+    """Contadores de uma execução de fetch_licitacoes (somados pelas threads)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.wait_s = 0.0
+        self.retries = 0
+        self.cache_hits = 0
+
+    def add(self, requests: int = 0, nbytes: int = 0, wait_s: float = 0.0, retries: int = 0,
+            cache_hits: int = 0) -> None:
+        with self.lock:
+            self.requests += requests
+            self.bytes += nbytes
+            self.wait_s += wait_s
+            self.retries += retries
+            self.cache_hits += cache_hits
+
+
 def _iso_date(d: dt.date | dt.datetime | str | None) -> Optional[str]:
     if d is None:
         return None
@@ -49,36 +115,57 @@ class PNCPClient:
     O cliente tenta /licitacoes e cai para /compras se necessário.
     """
 
-    def __init__(self, base_url: str = "https://pncp.gov.br/api/consulta/v1", timeout: int = 30):
+    def __init__(self, base_url: str = "https://pncp.gov.br/api/consulta/v1", timeout: int = 30,
+                 rps: Optional[float] = None, workers: Optional[int] = None,
+                 cache: bool = True, cache_ttl: Optional[float] = None):
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
+        # cache em disco (services/http_cache.py); cache_ttl=None usa max-age/padrão
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        # um balde por cliente: chamadas simultâneas dividem o mesmo limite
+        self.rps = float(rps or DEFAULT_RPS)
+        self.workers = max(1, int(workers or DEFAULT_WORKERS))
+        self._bucket = _TokenBucket(self.rps)
+        self.last_stats: Dict[str, Any] = {}
 
     # -------- HTTP --------
-    def _get(self, path: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any] | List[Any] | str]:
+    def _get(self, path: str, params: Dict[str, Any], stats: Optional[_RunStats] = None,
+             before_network=None) -> Tuple[int, Dict[str, Any] | List[Any] | str]:
+        # transporte compartilhado (services/transport.py): pool keep-alive, gzip, fallback urllib;
+        # com cache, respostas frescas nem chegam à rede (before_network não é chamado)
         url = f"{self.base_url}{path}"
-        if _HAS_REQUESTS:
-            try:
-                r = requests.get(url, params=params, timeout=self.timeout)
-                ct = r.headers.get("content-type", "")
-                if "application/json" in (ct or "").lower():
-                    return r.status_code, r.json()
-                return r.status_code, r.text
-            except Exception as ex:
-                raise PNCPError(f"Falha HTTP (requests): {ex}") from ex
-        else:
+        try:
+            if self.cache:
+                resp = http_cache.get(url, params, ttl=self.cache_ttl, timeout=self.timeout,
+                                      before_network=before_network)
+            else:
+                if before_network is not None:
+                    before_network()
+                resp = transport.get(url, params, timeout=self.timeout)
+        except transport.TransportError as ex:
+            raise PNCPError(str(ex)) from ex
+        if stats is not None:
+            hit = resp.headers.get("x-cache") in ("hit", "stale")
+            stats.add(requests=0 if hit else 1, nbytes=0 if hit else len(resp.content),
+                      cache_hits=1 if hit else 0)
+        if resp.is_json:
             try:
-                qs = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
-                with urllib.request.urlopen(f"{url}?{qs}", timeout=self.timeout) as resp:
-                    raw = resp.read()
-                    ctype = resp.headers.get("content-type", "")
-                    if "application/json" in (ctype or "").lower():
-                        return resp.status, json.loads(raw.decode("utf-8", errors="ignore"))
-                    return resp.status, raw.decode("utf-8", errors="ignore")
-            except Exception as ex:
-                raise PNCPError(f"Falha HTTP (urllib): {ex}") from ex
+                return resp.status, resp.json()
+            except ValueError:
+                return resp.status, resp.text
+        return resp.status, resp.text
 
     # -------- Consulta principal --------
-    def fetch_licitacoes(
+    def fetch_licitacoes(self, *args: Any, keep_raw: bool = True, **kwargs: Any) -> List[Dict[str, Any]]:
+        """
+        Retorna lista de licitações normalizada com filtros chave (mesmos
+        parâmetros de iter_licitacoes, tudo acumulado em memória). Cada linha
+        traz `raw` com o item original, salvo keep_raw=False.
+        """
+        return list(self.iter_licitacoes(*args, keep_raw=keep_raw, **kwargs))
+
+    def iter_licitacoes(
         self,
         termo: Optional[str] = None,           # objeto / palavra‑chave
         uf: Optional[str] = None,              # sigla UF
@@ -91,10 +178,25 @@ class PNCPClient:
         pagina: int = 0,
         tamanho: int = 50,
         limite_paginas: int = 6,
-        pausa_s: float = 0.35,
-    ) -> List[Dict[str, Any]]:
+        pausa_s: Optional[float] = None,
+        workers: Optional[int] = None,
+        keep_raw: bool = False,
+        por_pagina: bool = False,
+    ) -> Iterator[Any]:
         """
-        Retorna lista de licitações normalizada com filtros chave.
+        Gera as licitações normalizadas à medida que as páginas chegam (na
+        ordem das páginas): linha a linha ou, com por_pagina=True, uma lista
+        por página. Só a janela de páginas em voo fica em memória; `raw` (o
+        item original da API) só vai nas linhas com keep_raw=True.
+
+        Paginação: a 1ª página descobre o endpoint; as seguintes saem em
+        paralelo (até `workers` em voo, padrão do cliente) sob o limitador de
+        taxa do cliente (`rps`), em vez de uma pausa fixa entre páginas.
+        `pausa_s`, se informado, vira um limite próprio de 1/pausa_s req/s.
+        Página curta/vazia/erro encerra: as seguintes são descartadas.
+        Parar de consumir o gerador (break/close) cancela as páginas pendentes.
+        Nenhum endpoint respondendo -> PNCPError antes da 1ª linha.
+        Estatísticas em `self.last_stats` quando o gerador termina.
         """
         data_ini = _iso_date(data_ini)
         data_fim = _iso_date(data_fim)
@@ -142,39 +244,115 @@ class PNCPClient:
             }
             return {k: v for k, v in params.items() if v is not None}
 
+        bucket = _TokenBucket(1.0 / pausa_s) if pausa_s else self._bucket
+        n_workers = max(1, int(workers or self.workers))
+        stats = _RunStats()
+        t0 = time.perf_counter()
+
+        def _fetch(path: str, p: int) -> Tuple[int, Any]:
+            def _take() -> None:
+                stats.add(wait_s=bucket.acquire())
+
+            for attempt in range(_RETRIES + 1):
+                status, body = self._get(path, _mount_params(p), stats, before_network=_take)
+                if status not in _RETRY_STATUS or attempt == _RETRIES:
+                    return status, body
+                stats.add(retries=1)
+                bucket.pause(2.0 ** attempt)
+            return status, body
+
         candidates = ["/licitacoes", "/compras"]
         chosen: Optional[str] = None
-        results: List[Dict[str, Any]] = []
+        first: List[Dict[str, Any]] = []
+        pages_used = 0
+        n_items = 0
+        stop = "limite_paginas"
 
         # primeiro disparo para descobrir endpoint
         for cand in candidates:
-            status, body = self._get(cand, _mount_params(pagina))
+            status, body = _fetch(cand, pagina)
             if status == 200:
                 chosen = cand
-                results.extend(self._adapt_list(body))
+                first = self._adapt_list(body, keep_raw)
+                if len(first) < tamanho:
+                    stop = "pagina_curta"
                 break
         if not chosen:
             raise PNCPError("Nenhum endpoint público de consulta respondeu (tentativas: /licitacoes, /compras).")
 
-        # paginação sequencial
-        current = pagina + 1
-        while current < pagina + limite_paginas:
-            time.sleep(pausa_s)
-            status, body = self._get(chosen, _mount_params(current))
-            if status != 200:
-                break
-            page_items = self._adapt_list(body)
-            if not page_items:
-                break
-            results.extend(page_items)
-            if len(page_items) < tamanho:
-                break
-            current += 1
+        try:
+            if first:
+                pages_used, n_items = 1, len(first)
+                if por_pagina:
+                    yield first
+                else:
+                    yield from first
+            del first
 
-        return results
+            # demais páginas em paralelo; janela de `n_workers` em voo, entrega em ordem
+            pages = range(pagina + 1, pagina + limite_paginas) if stop == "limite_paginas" else range(0)
+            if pages:
+                with ThreadPoolExecutor(max_workers=min(n_workers, len(pages)),
+                                        thread_name_prefix="pncp") as ex:
+                    inflight: List[Tuple[int, Future]] = []
+                    it = iter(pages)
+
+                    def _fill() -> None:
+                        while len(inflight) < n_workers:
+                            p = next(it, None)
+                            if p is None:
+                                return
+                            inflight.append((p, ex.submit(_fetch, chosen, p)))
+
+                    _fill()
+                    try:
+                        while inflight:
+                            _p, fut = inflight.pop(0)
+                            status, body = fut.result()
+                            page_items = self._adapt_list(body, keep_raw) if status == 200 else []
+                            del body
+                            if status != 200:
+                                stop = f"http_{status}"
+                            elif not page_items:
+                                stop = "pagina_vazia"
+                            if status != 200 or not page_items:
+                                break
+                            pages_used += 1
+                            n_items += len(page_items)
+                            short = len(page_items) < tamanho
+                            if not short:
+                                _fill()   # próximas já em voo enquanto o consumidor processa esta
+                            if por_pagina:
+                                yield page_items
+                            else:
+                                yield from page_items
+                            if short:
+                                stop = "pagina_curta"
+                                break
+                    finally:
+                        for _p, fut in inflight:   # páginas além do fim: não dispara as que não saíram
+                            fut.cancel()
+        except GeneratorExit:
+            stop = "interrompido"
+            raise
+        finally:
+            self.last_stats = {
+                "endpoint": chosen,
+                "pages": pages_used,                 # páginas aproveitadas
+                "requests": stats.requests,          # inclui descartadas e novas tentativas
+                "retries": stats.retries,
+                "cache_hits": stats.cache_hits,      # páginas servidas do cache em disco
+                "items": n_items,                    # entregues ao consumidor (páginas inteiras)
+                "bytes": stats.bytes,
+                "wall_s": round(time.perf_counter() - t0, 3),
+                "rate_wait_s": round(stats.wait_s, 3),
+                "workers": n_workers,
+                "rps": bucket.rate,
+                "stop": stop,
+            }
 
     # -------- Adaptador de resposta --------
-    def _adapt_list(self, body: Dict[str, Any] | List[Any] | str) -> List[Dict[str, Any]]:
+    def _adapt_list(self, body: Dict[str, Any] | List[Any] | str, keep_raw: bool = True) -> List[Dict[str, Any]]:
         if isinstance(body, str):
             return []
         if isinstance(body, dict):
@@ -204,7 +382,7 @@ class PNCPClient:
             valor = r.get("valorEstimado") or r.get("valorTotalEstimado") or r.get("valor") or ""
             link = r.get("linkEdital") or r.get("urlEdital") or r.get("link") or r.get("url") or ""
 
-            rows.append({
+            row = {
                 "id_remoto": str(r.get("id") or r.get("idCompra") or r.get("identificador") or ""),
                 "numero_processo": str(numero).strip(),
                 "modalidade": str(modalidade).strip(),
@@ -218,6 +396,8 @@ class PNCPClient:
                 "hora_sessao": str(hora_sess).strip(),
                 "valor_estimado": valor,
                 "link_edital": link,
-                "raw": r,
-            })
+            }
+            if keep_raw:
+                row["raw"] = r
+            rows.append(row)
         return rows
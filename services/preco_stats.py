@@ -0,0 +1,336 @@
+# services/preco_stats.py — preço de referência (mediana, percentis, outliers) por item
+from __future__ import annotations
+
+"""
+Estatísticas de pesquisa de preços sobre `preco_registros` (por item_id) e
+`banco_precos` (por produto normalizado).
+
+- Por item/grupo: n, média, mediana, média aparada, P25/P75, IQR, limites
+  (P25 − k·IQR, P75 + k·IQR), nº de outliers e o preço de referência
+  (mediana dos valores dentro dos limites).
+- Agrupamento opcional (UF/cidade/fonte nos registros; categoria/tipo de
+  origem no banco) e janela de datas.
+- Os preços vêm do SQLite já ordenados por (chave, grupo, preço): cada grupo é
+  um trecho contíguo e todos os grupos são calculados de uma vez com NumPy
+  (índices + somas acumuladas). Sem NumPy, o mesmo cálculo roda em Python puro.
+- Resumo persistido em `preco_stats` (migração 8). Triggers marcam as chaves
+  alteradas em `preco_stats_dirty`; atualizar_resumo() recalcula só elas,
+  achando as linhas do banco pela coluna indexada `chave_produto` (migração 11).
+"""
+
+import json
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # NumPy é opcional: cai no cálculo em Python puro
+    np = None
+
+from . import connection as _pool
+from . import migrations as _migrations
+from .storage import DB_PATH
+
+TRIM = 0.10      # fração cortada de cada ponta na média aparada
+IQR_K = 1.5      # fator de Tukey para outliers
+
+FONTES = ("registros", "banco")
+
+# chave/grupo/preço/data por fonte (chave sempre TEXT, como em preco_stats)
+_SRC = {
+    "registros": {
+        "table": "preco_registros",
+        "chave": "CAST(item_id AS TEXT)",
+        "preco": "preco_unit",
+        "data": _migrations.iso_date_sql("data"),
+        "dirty": "item_id IN (SELECT CAST(value AS INTEGER) FROM json_each(?))",
+        "grupos": {"uf": "UPPER(TRIM(COALESCE(uf,'')))", "cidade": "TRIM(COALESCE(cidade,''))",
+                   "fonte": "TRIM(COALESCE(fonte,''))"},
+    },
+    "banco": {
+        "table": "banco_precos",
+        "chave": "chave_produto",
+        "preco": "preco_centavos / 100.0",
+        "data": "data_coleta_iso",
+        "dirty": "chave_produto IN (SELECT value FROM json_each(?))",
+        "grupos": {"categoria": "COALESCE(categoria,'')", "tipo_origem": "COALESCE(tipo_origem,'')",
+                   "origem": "COALESCE(origem_nome,'')"},
+    },
+}
+
+
+def chave_produto(produto: Any) -> Optional[str]:
+    """
+    Chave do produto no banco: sem espaços nas pontas, NFC e casefold.
+    Diferente do LOWER() do SQLite (só ASCII), "ÁGUA MINERAL" e "água mineral"
+    caem na mesma chave. Registrada como sos_chave_produto() nas conexões
+    deste módulo.
+    """
+    if produto is None:
+        return None
+    return unicodedata.normalize("NFC", str(produto).strip()).casefold()
+
+
+def _chave(fonte: str, c: Any) -> str:
+    return (chave_produto(c) or "") if fonte == "banco" else str(int(c))
+
+
+_CAMPOS = ("n", "media", "mediana", "media_aparada", "p25", "p75", "iqr",
+           "lim_inf", "lim_sup", "outliers", "referencia", "minimo", "maximo")
+
+# -----------------------------
+# Cálculo (trechos ordenados)
+# -----------------------------
+def _calc_numpy(vals: List[float], starts: List[int], lens: List[int],
+                trim: float, k: float) -> Tuple[Dict[str, List[Any]], List[bool]]:
+    v = np.asarray(vals, dtype=float)
+    s = np.asarray(starts, dtype=np.int64)
+    n = np.asarray(lens, dtype=np.int64)
+
+    def q(p, s=s, n=n):
+        # percentil com interpolação linear (= numpy 'linear') no trecho [s, s+n)
+        pos = s + p * (n - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, s + n - 1)
+        return v[lo] + (v[hi] - v[lo]) * (pos - lo)
+
+    cs = np.concatenate(([0.0], np.cumsum(v)))
+    t = np.floor(trim * n).astype(np.int64)
+    p25, med, p75 = q(0.25), q(0.5), q(0.75)
+    iqr = p75 - p25
+    li, ls = p25 - k * iqr, p75 + k * iqr
+    seg = np.repeat(np.arange(len(s)), n)
+    low, high = v < li[seg], v > ls[seg]
+    nlow = np.bincount(seg, weights=low, minlength=len(s)).astype(np.int64)
+    nhigh = np.bincount(seg, weights=high, minlength=len(s)).astype(np.int64)
+    # sem outliers, o que sobra é contíguo no trecho ordenado
+    ref = q(0.5, s + nlow, n - nlow - nhigh)
+    out = {
+        "n": n, "media": (cs[s + n] - cs[s]) / n, "mediana": med,
+        "media_aparada": (cs[s + n - t] - cs[s + t]) / (n - 2 * t),
+        "p25": p25, "p75": p75, "iqr": iqr, "lim_inf": li, "lim_sup": ls,
+        "outliers": nlow + nhigh, "referencia": ref, "minimo": v[s], "maximo": v[s + n - 1],
+    }
+    return {c: a.tolist() for c, a in out.items()}, (low | high).tolist()
+
+
+def _calc_python(vals: List[float], starts: List[int], lens: List[int],
+                 trim: float, k: float) -> Tuple[Dict[str, List[Any]], List[bool]]:
+    out: Dict[str, List[Any]] = {c: [] for c in _CAMPOS}
+    flags: List[bool] = []
+
+    def q(p, s, n):
+        pos = s + p * (n - 1)
+        lo = int(pos)
+        hi = min(lo + 1, s + n - 1)
+        return vals[lo] + (vals[hi] - vals[lo]) * (pos - lo)
+
+    for s, n in zip(starts, lens):
+        seg = vals[s:s + n]
+        t = int(trim * n)
+        p25, med, p75 = q(0.25, s, n), q(0.5, s, n), q(0.75, s, n)
+        iqr = p75 - p25
+        li, ls = p25 - k * iqr, p75 + k * iqr
+        fl = [x < li or x > ls for x in seg]
+        nlow = sum(1 for x in seg if x < li)
+        nhigh = sum(1 for x in seg if x > ls)
+        flags.extend(fl)
+        for c, val in (("n", n), ("media", sum(seg) / n), ("mediana", med),
+                       ("media_aparada", sum(seg[t:n - t]) / (n - 2 * t)),
+                       ("p25", p25), ("p75", p75), ("iqr", iqr), ("lim_inf", li), ("lim_sup", ls),
+                       ("outliers", nlow + nhigh), ("referencia", q(0.5, s + nlow, n - nlow - nhigh)),
+                       ("minimo", seg[0]), ("maximo", seg[-1])):
+            out[c].append(val)
+    return out, flags
+
+
+def _calc(vals, starts, lens, trim=TRIM, k=IQR_K):
+    if not starts:
+        return {c: [] for c in _CAMPOS}, []
+    fn = _calc_numpy if np is not None else _calc_python
+    return fn(vals, starts, lens, trim, k)
+
+# -----------------------------
+# Leitura
+# -----------------------------
+def _preencher_chaves(conn) -> None:
+    # linhas novas/alteradas do banco ficam com chave_produto NULL (ver migração 11)
+    conn.execute("UPDATE banco_precos SET chave_produto = sos_chave_produto(produto) "
+                 "WHERE chave_produto IS NULL AND produto IS NOT NULL")
+
+
+@contextmanager
+def _conn():
+    _migrations.migrate()
+    with _pool.connection(DB_PATH) as conn:
+        conn.create_function("sos_chave_produto", 1, chave_produto, deterministic=True)
+        aberta = conn.in_transaction
+        _preencher_chaves(conn)
+        if not aberta and conn.in_transaction:
+            conn.commit()
+        yield conn
+
+
+def _load(conn, fonte: str, por: Optional[str], where: List[str], args: List[Any]):
+    src = _fonte(fonte)
+    if por and por not in src["grupos"]:
+        raise ValueError(f"agrupamento inválido para {fonte}: {por!r} (use {', '.join(src['grupos'])})")
+    grupo = src["grupos"][por] if por else "''"
+    wh = [f"{src['preco']} IS NOT NULL"] + where
+    cur = conn.execute(f"""
+        SELECT {src['chave']} AS chave, {grupo} AS grupo, {src['preco']} AS preco, id
+          FROM {src['table']}
+         WHERE {' AND '.join(wh)}
+         ORDER BY 1, 2, 3
+    """, args)
+    keys: List[Tuple[str, str]] = []
+    starts: List[int] = []
+    lens: List[int] = []
+    vals: List[float] = []
+    ids: List[int] = []
+    prev = None
+    for chave, g, preco, rid in cur:
+        if (chave, g) != prev:
+            prev = (chave, g)
+            keys.append(prev)
+            starts.append(len(vals))
+            lens.append(0)
+        lens[-1] += 1
+        vals.append(float(preco))
+        ids.append(rid)
+    return keys, starts, lens, vals, ids
+
+
+def _iso(v: Any) -> Optional[str]:
+    if hasattr(v, "isoformat"):
+        return v.isoformat()[:10]
+    s = str(v).strip()[:10]
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+def _fonte(fonte: str) -> Dict[str, Any]:
+    src = _SRC.get(fonte)
+    if src is None:
+        raise ValueError(f"fonte inválida: {fonte!r} (use {', '.join(FONTES)})")
+    return src
+
+
+def _filtros(fonte: str, chaves: Optional[Iterable[Any]], de: Any, ate: Any):
+    src = _fonte(fonte)
+    where: List[str] = []
+    args: List[Any] = []
+    if chaves is not None:
+        ks = [_chave(fonte, c) for c in chaves]
+        where.append(f"{src['chave']} IN ({','.join('?' * len(ks)) or 'NULL'})")
+        args.extend(ks)
+    for op, v in ((">=", de), ("<=", ate)):
+        if v not in (None, ""):
+            d = _iso(v)
+            if d:
+                where.append(f"{src['data']} {op} ?")
+                args.append(d)
+    return where, args
+
+
+def estatisticas(fonte: str = "registros", chaves: Optional[Iterable[Any]] = None,
+                 por: Optional[str] = None, de: Any = None, ate: Any = None,
+                 detalhe: bool = False, trim: float = TRIM, k: float = IQR_K) -> List[Dict[str, Any]]:
+    """
+    Estatísticas por chave (item_id nos registros, produto no banco) e, com
+    `por`, por grupo (registros: 'uf' | 'cidade' | 'fonte'; banco: 'categoria' |
+    'tipo_origem' | 'origem'). `de`/`ate` limitam pela data do preço.
+    Cada linha: {"chave","grupo", n, media, mediana, media_aparada, p25, p75,
+    iqr, lim_inf, lim_sup, outliers, referencia, minimo, maximo}; com
+    detalhe=True também "valores": [{"id","preco","outlier"}].
+    Calculado na hora (não usa o resumo).
+    """
+    where, args = _filtros(fonte, chaves, de, ate)
+    with _conn() as conn:
+        keys, starts, lens, vals, ids = _load(conn, fonte, por, where, args)
+    res, flags = _calc(vals, starts, lens, trim, k)
+    out = []
+    for i, (chave, grupo) in enumerate(keys):
+        row = {"chave": chave, "grupo": grupo}
+        row.update({c: res[c][i] for c in _CAMPOS})
+        if detalhe:
+            s, n = starts[i], lens[i]
+            row["valores"] = [{"id": ids[j], "preco": vals[j], "outlier": bool(flags[j])}
+                              for j in range(s, s + n)]
+        out.append(row)
+    return out
+
+# -----------------------------
+# Resumo persistido (incremental)
+# -----------------------------
+def atualizar_resumo(completo: bool = False) -> Dict[str, int]:
+    """
+    Recalcula o resumo `preco_stats` das chaves marcadas em `preco_stats_dirty`
+    (todas, com completo=True) numa transação. Retorna {fonte: chaves recalculadas}.
+    """
+    feitos: Dict[str, int] = {}
+    agora = datetime.now().isoformat(timespec="seconds")
+    with _conn() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        _preencher_chaves(conn)   # de novo já na transação: nada escrito no meio fica sem chave
+        for fonte in FONTES:
+            src = _SRC[fonte]
+            if completo:
+                conn.execute("DELETE FROM preco_stats WHERE fonte=?", (fonte,))
+                where: List[str] = []
+                args: List[Any] = []
+            else:
+                # fila do banco vem com LOWER(TRIM()) do SQLite: normaliza aqui, como no resumo
+                fila = sorted({_chave(fonte, r[0]) for r in conn.execute(
+                    "SELECT chave FROM preco_stats_dirty WHERE fonte=?", (fonte,))})
+                if not fila:
+                    continue
+                args = [json.dumps(fila, ensure_ascii=False)]
+                conn.execute("DELETE FROM preco_stats WHERE fonte=? AND chave IN "
+                             "(SELECT value FROM json_each(?))", [fonte] + args)
+                where = [src["dirty"]]
+            keys, starts, lens, vals, _ids = _load(conn, fonte, None, where, args)
+            res, _flags = _calc(vals, starts, lens)
+            conn.executemany(f"""
+                INSERT INTO preco_stats(fonte, chave, {', '.join(_CAMPOS)}, atualizado_em)
+                VALUES (?, ?, {', '.join('?' * len(_CAMPOS))}, ?)
+            """, [(fonte, chave) + tuple(res[c][i] for c in _CAMPOS) + (agora,)
+                  for i, (chave, _g) in enumerate(keys)])
+            conn.execute("DELETE FROM preco_stats_dirty WHERE fonte=?", (fonte,))
+            feitos[fonte] = len(keys)
+        conn.commit()
+    return feitos
+
+
+def resumo(fonte: str = "registros", chaves: Optional[Iterable[Any]] = None,
+           atualizar: bool = True) -> List[Dict[str, Any]]:
+    """
+    Linhas do resumo persistido (uma por chave, sem grupo/janela). Com
+    atualizar=True aplica antes as pendências de preco_stats_dirty.
+    """
+    _fonte(fonte)
+    if atualizar:
+        atualizar_resumo()
+    sql = f"SELECT chave, {', '.join(_CAMPOS)}, atualizado_em FROM preco_stats WHERE fonte=?"
+    args: List[Any] = [fonte]
+    if chaves is not None:
+        ks = [_chave(fonte, c) for c in chaves]
+        sql += f" AND chave IN ({','.join('?' * len(ks)) or 'NULL'})"
+        args.extend(ks)
+    with _pool.connection(DB_PATH) as conn:
+        cur = conn.execute(sql + " ORDER BY chave", args)
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def preco_referencia(item_id: int) -> Optional[float]:
+    """Preço de referência (mediana sem outliers) de um item de preco_registros."""
+    rows = resumo("registros", [item_id])
+    return rows[0]["referencia"] if rows else None
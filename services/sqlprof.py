@@ -0,0 +1,319 @@
+# services/sqlprof.py — perfil opcional das instruções SQL (tempo, p95, log de lentas)
+from __future__ import annotations
+
+"""
+Instrumentação opt-in de todas as conexões abertas por services/connection.py
+(portanto db.py, db_legacy.py, credentials.py e migrations.py).
+
+Ative com SOS_SQL_PROFILE=1. Então:
+- as conexões usam ProfConnection/ProfCursor: cada execute/executemany é
+  cronometrado (incluindo os fetch* que leem o resultado) e agregado por
+  instrução normalizada (espaços colapsados, listas IN (?,?,…) unificadas);
+- set_trace_callback conta o que não passa pelo cursor: BEGIN/COMMIT
+  implícitos e os comandos disparados por triggers;
+- instruções acima de SOS_SQL_SLOW_MS (padrão 100) vão para logs/sql_slow.log
+  (rotativo, 1 MB × 3) com o formato dos parâmetros (tipos, não valores) e o
+  EXPLAIN QUERY PLAN (uma vez por instrução);
+- stats() devolve chamadas, total/média/p95/máx em ms por instrução; no
+  encerramento o resumo é gravado em logs/sql_stats.json
+  (lido por tools/audit_project.py).
+
+Desligado, nada disso é carregado: connection.py abre conexões comuns.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Any, Deque, Dict, List, Optional
+
+from .storage import BASE_DIR
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+ENABLED = (os.getenv("SOS_SQL_PROFILE", "").strip().lower() in ("1", "true", "yes", "on"))
+SLOW_MS = _env_float("SOS_SQL_SLOW_MS", 100.0)
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+SLOW_LOG = os.path.join(LOGS_DIR, "sql_slow.log")
+STATS_FILE = os.path.join(LOGS_DIR, "sql_stats.json")
+_SAMPLES = 1000          # durações guardadas por instrução (para o p95)
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, Any]] = {}
+_explained: set = set()
+_log: Optional[logging.Logger] = None
+_tls = threading.local()
+
+_RX_WS = re.compile(r"\s+")
+_RX_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RX_VALUES = re.compile(r"(\(\?[?,\s]*\))(?:\s*,\s*\(\?[?,\s]*\))+")
+
+
+def normalize(sql: str) -> str:
+    """Chave de agregação: espaços colapsados e listas de ? de tamanho variável unificadas."""
+    s = _RX_WS.sub(" ", str(sql or "")).strip()
+    s = _RX_VALUES.sub(r"\1, …", s)
+    return _RX_IN.sub("(?, …)", s)
+
+
+def _shape(params: Any) -> str:
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    try:
+        return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+    except TypeError:
+        return type(params).__name__
+
+
+def _shape_many(seq: Any) -> str:
+    if isinstance(seq, (list, tuple)) and seq:
+        return f"{_shape(seq[0])} × {len(seq)}"
+    return "(lote)"
+
+
+def _logger() -> logging.Logger:
+    global _log
+    if _log is None:
+        lg = logging.getLogger("sos.sql_slow")
+        lg.propagate = False
+        if not lg.handlers:
+            os.makedirs(LOGS_DIR, exist_ok=True)
+            h = RotatingFileHandler(SLOW_LOG, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+            h.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            lg.addHandler(h)
+        lg.setLevel(logging.INFO)
+        _log = lg
+    return _log
+
+
+def _entry(key: str) -> Dict[str, Any]:
+    ent = _stats.get(key)
+    if ent is None:
+        ent = _stats[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "untimed": 0,
+                             "samples": deque(maxlen=_SAMPLES)}
+    return ent
+
+
+def record(sql: str, ms: float, params: Any = None, conn: Optional[sqlite3.Connection] = None,
+           many: bool = False) -> None:
+    key = normalize(sql)
+    with _lock:
+        ent = _entry(key)
+        ent["calls"] += 1
+        ent["total_ms"] += ms
+        ent["max_ms"] = max(ent["max_ms"], ms)
+        samples: Deque[float] = ent["samples"]
+        samples.append(ms)
+        first_slow = ms >= SLOW_MS and key not in _explained
+        if first_slow:
+            _explained.add(key)
+    if ms < SLOW_MS:
+        return
+    plan = ""
+    if first_slow and conn is not None and not many:
+        plan = _explain(conn, sql, params)
+    try:
+        _logger().info("%.1f ms | %s | params %s%s", ms, key,
+                       _shape_many(params) if many else _shape(params),
+                       ("\n    plano: " + plan) if plan else "")
+    except Exception:
+        pass
+
+
+def _explain(conn: sqlite3.Connection, sql: str, params: Any) -> str:
+    head = str(sql).lstrip().split(None, 1)[0].upper() if str(sql).strip() else ""
+    if head not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT", "REPLACE"):
+        return ""
+    _tls.busy = True
+    try:
+        cur = sqlite3.Cursor(conn)
+        cur.row_factory = None
+        rows = cur.execute("EXPLAIN QUERY PLAN " + sql, params if params is not None else ()).fetchall()
+        return " / ".join(str(r[-1]) for r in rows)
+    except Exception as ex:
+        return f"(sem plano: {ex})"
+    finally:
+        _tls.busy = False
+
+
+def _trace(sql: str) -> None:
+    # só o que o cursor não vê: transação implícita e comandos de trigger
+    if getattr(_tls, "busy", False):
+        return
+    s = sql.lstrip()
+    if s.startswith("--") or s[:6].upper() in ("BEGIN", "COMMIT", "ROLLBA", "SAVEPO", "RELEAS"):
+        key = normalize(s)
+        with _lock:
+            ent = _entry(key)
+            ent["calls"] += 1
+            ent["untimed"] += 1
+
+
+class ProfCursor(sqlite3.Cursor):
+    """Cursor que cronometra execute/executemany + leitura do resultado."""
+
+    def _flush(self) -> None:
+        pend = self.__dict__.pop("_prof", None)
+        if pend is not None:
+            sql, params, ms, many = pend
+            record(sql, ms, params, self.connection, many)
+
+    def _timed(self, method, sql, params, many):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return method(sql, params) if params is not None else method(sql)
+        finally:
+            self.__dict__["_prof"] = (sql, params, (time.perf_counter() - t0) * 1000.0, many)
+            if self.description is None:   # sem resultado a ler: fecha a conta já
+                self._flush()
+
+    def _add(self, t0: float, done: bool) -> None:
+        pend = self.__dict__.get("_prof")
+        if pend is not None:
+            self.__dict__["_prof"] = pend[:2] + (pend[2] + (time.perf_counter() - t0) * 1000.0, pend[3])
+            if done:
+                self._flush()
+
+    def execute(self, sql, params=None):
+        return self._timed(super().execute, sql, params, False)
+
+    def executemany(self, sql, seq):
+        return self._timed(super().executemany, sql, seq, True)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._add(t0, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(t0, not rows)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._add(t0, True)
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(t0, True)
+            raise
+        self._add(t0, False)
+        return row
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._flush()
+        except Exception:
+            pass
+
+
+class ProfConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) são ProfCursor."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_trace)
+
+    def cursor(self, factory=ProfCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+def connect(path: str, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect com a fábrica de perfil (usado por services/connection.py)."""
+    return sqlite3.connect(path, factory=ProfConnection, **kwargs)
+
+
+def _p95(samples: Deque[float]) -> float:
+    if not samples:
+        return 0.0
+    arr = sorted(samples)
+    return arr[min(len(arr) - 1, int(round(0.95 * (len(arr) - 1))))]
+
+
+def stats(top: Optional[int] = None, sort: str = "total_ms") -> List[Dict[str, Any]]:
+    """
+    [{"sql","calls","total_ms","mean_ms","p95_ms","max_ms","untimed"}], do maior
+    `sort` para o menor. p95 sobre as últimas 1000 execuções de cada instrução.
+    """
+    with _lock:
+        rows = []
+        for key, e in _stats.items():
+            timed = e["calls"] - e["untimed"]
+            rows.append({
+                "sql": key, "calls": e["calls"], "total_ms": round(e["total_ms"], 3),
+                "mean_ms": round(e["total_ms"] / timed, 3) if timed else 0.0,
+                "p95_ms": round(_p95(e["samples"]), 3), "max_ms": round(e["max_ms"], 3),
+                "untimed": e["untimed"],
+            })
+    rows.sort(key=lambda r: r.get(sort) or 0, reverse=True)
+    return rows[:top] if top else rows
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _explained.clear()
+
+
+def dump(path: str = STATS_FILE) -> Optional[str]:
+    """Grava stats() em JSON (padrão logs/sql_stats.json). Devolve o caminho."""
+    data = stats()
+    if not data:
+        return None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"gerado_em": time.strftime("%Y-%m-%d %H:%M:%S"), "slow_ms": SLOW_MS,
+                       "stats": data}, fh, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        return path
+    except Exception:
+        return None
+
+
+def load_dump(path: str = STATS_FILE) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception:
+        return None
+
+
+if ENABLED:
+    atexit.register(dump)
@@ -0,0 +1,229 @@
+# services/transport.py — transporte HTTP compartilhado (pool de conexões, gzip, fallback urllib)
+from __future__ import annotations
+
+"""
+Um único ponto de saída HTTP para services/pncp_client.py e services/pncp.py.
+
+- Com `requests`: uma Session do processo com HTTPAdapter em pool
+  (keep-alive — sem novo handshake TLS a cada página/edital), tamanho do
+  pool configurável e nova tentativa só em falha de conexão.
+- Sem `requests`: urllib com os mesmos cabeçalhos, descompressão gzip e o
+  mesmo contrato (status HTTP de erro volta como Response, não exceção).
+- Sempre: Accept-Encoding gzip, timeouts separados de conexão e leitura,
+  download em streaming para arquivo .part + os.replace.
+- Falha de rede/timeout -> TransportError.
+
+Ajustes por variável de ambiente (opcionais):
+  SOS_HTTP_POOL             (padrão 8 conexões por host)
+  SOS_HTTP_CONNECT_TIMEOUT  (padrão 5 s)
+  SOS_HTTP_READ_TIMEOUT     (padrão 30 s)
+"""
+
+import gzip
+import json
+import os
+import threading
+import zlib
+from typing import Any, Mapping, Optional
+
+try:
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+except Exception:
+    requests = None  # fallback urllib
+    HTTPAdapter = None
+
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+POOL_SIZE = max(1, int(_env_num("SOS_HTTP_POOL", 8)))
+CONNECT_TIMEOUT = _env_num("SOS_HTTP_CONNECT_TIMEOUT", 5.0)
+READ_TIMEOUT = _env_num("SOS_HTTP_READ_TIMEOUT", 30.0)
+USER_AGENT = "SOS-Licitacoes/1.0 (+https://pncp.gov.br)"
+
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "application/json, */*;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+
+class TransportError(Exception):
+    """Falha de rede/timeout (sem resposta HTTP)."""
+
+
+class Response:
+    """Resposta já lida: status, cabeçalhos (chaves minúsculas) e corpo descomprimido."""
+    __slots__ = ("status", "headers", "content", "url")
+
+    def __init__(self, status: int, headers: Mapping[str, str], content: bytes, url: str = ""):
+        self.status = int(status)
+        self.headers = {str(k).lower(): str(v) for k, v in (headers or {}).items()}
+        self.content = content or b""
+        self.url = url
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "").lower()
+
+    @property
+    def is_json(self) -> bool:
+        return "json" in self.content_type
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="ignore")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+# ----------------------------- sessão (requests) -----------------------------
+_session = None
+_session_lock = threading.Lock()
+
+def session():
+    """Session compartilhada (criada na 1ª chamada) ou None sem `requests`."""
+    global _session
+    if requests is None:
+        return None
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                try:
+                    from urllib3.util.retry import Retry  # type: ignore
+                    retries: Any = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+                except Exception:
+                    retries = 2
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+                                      max_retries=retries)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers.update(DEFAULT_HEADERS)
+                _session = s
+    return _session
+
+def close() -> None:
+    """Fecha o pool (ex.: no encerramento ou em testes)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            try:
+                _session.close()
+            except Exception:
+                pass
+        _session = None
+
+def _timeout(timeout: Optional[float]):
+    return (CONNECT_TIMEOUT, float(timeout) if timeout else READ_TIMEOUT)
+
+# ----------------------------- fallback urllib -----------------------------
+def _decode_body(raw: bytes, encoding: str) -> bytes:
+    enc = (encoding or "").lower()
+    if "gzip" in enc:
+        return gzip.decompress(raw)
+    if "deflate" in enc:
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+    return raw
+
+def _urllib_open(url: str, headers: Mapping[str, str], timeout: Optional[float]):
+    req = urllib.request.Request(url, headers={**DEFAULT_HEADERS, **dict(headers or {})})
+    # urllib só tem um timeout: usamos o de leitura (o maior)
+    return urllib.request.urlopen(req, timeout=_timeout(timeout)[1])
+
+def _with_query(url: str, params: Optional[Mapping[str, Any]]) -> str:
+    if not params:
+        return url
+    qs = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None}, doseq=True)
+    return f"{url}{'&' if '?' in url else '?'}{qs}" if qs else url
+
+# ----------------------------- API -----------------------------
+def get(url: str, params: Optional[Mapping[str, Any]] = None, *,
+        headers: Optional[Mapping[str, str]] = None, timeout: Optional[float] = None) -> Response:
+    """GET com o pool compartilhado. Status de erro volta na Response; rede -> TransportError."""
+    s = session()
+    if s is not None:
+        try:
+            r = s.get(url, params={k: v for k, v in (params or {}).items() if v is not None},
+                      headers=dict(headers or {}), timeout=_timeout(timeout))
+            return Response(r.status_code, r.headers, r.content, r.url)
+        except Exception as ex:
+            raise TransportError(f"Falha HTTP (requests): {ex}") from ex
+    full = _with_query(url, params)
+    try:
+        with _urllib_open(full, headers or {}, timeout) as resp:
+            raw = resp.read()
+            hdrs = dict(resp.headers.items())
+            return Response(resp.status, hdrs, _decode_body(raw, hdrs.get("Content-Encoding", "")), full)
+    except urllib.error.HTTPError as ex:
+        hdrs = dict(ex.headers.items()) if ex.headers else {}
+        try:
+            body = _decode_body(ex.read() or b"", hdrs.get("Content-Encoding", ""))
+        except Exception:
+            body = b""
+        return Response(ex.code, hdrs, body, full)
+    except Exception as ex:
+        raise TransportError(f"Falha HTTP (urllib): {ex}") from ex
+
+def download(url: str, dest_path: str, *, params: Optional[Mapping[str, Any]] = None,
+             headers: Optional[Mapping[str, str]] = None, timeout: Optional[float] = None,
+             chunk_size: int = 64 * 1024) -> int:
+    """
+    Baixa `url` em streaming para `dest_path` (via dest_path.part + os.replace).
+    Devolve o status HTTP; só grava o arquivo com 2xx. Rede -> TransportError.
+    """
+    part = dest_path + ".part"
+    s = session()
+    try:
+        if s is not None:
+            with s.get(url, params=params, headers={"Accept": "*/*", **dict(headers or {})},
+                       timeout=_timeout(timeout), stream=True) as r:
+                if not (200 <= r.status_code < 300):
+                    return r.status_code
+                with open(part, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):   # já descomprime gzip
+                        if chunk:
+                            f.write(chunk)
+                status = r.status_code
+        else:
+            try:
+                resp_cm = _urllib_open(_with_query(url, params),
+                                       {"Accept": "*/*", **dict(headers or {})}, timeout)
+            except urllib.error.HTTPError as ex:
+                return ex.code
+            with resp_cm as resp:
+                enc = (resp.headers.get("Content-Encoding") or "").lower()
+                src = gzip.GzipFile(fileobj=resp) if "gzip" in enc else resp
+                with open(part, "wb") as f:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                status = resp.status
+        os.replace(part, dest_path)
+        return status
+    except Exception as ex:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        if isinstance(ex, TransportError):
+            raise
+        raise TransportError(f"Falha baixando {url}: {ex}") from ex
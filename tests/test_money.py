@@ -0,0 +1,43 @@
+# === tests/test_money.py ===
+import unittest
+
+from services import db_legacy, imports
+from services.money import parse_brl
+
+
+class ParseBrlTest(unittest.TestCase):
+    def test_formatos(self):
+        casos = {
+            "R$ 1.234,56": 1234.56,
+            "1234,56": 1234.56,
+            "1234.56": 1234.56,
+            "12.5": 12.5,
+            "1.234.567": 1234567.0,
+            12: 12.0,
+            "": None,
+            "abc": None,
+        }
+        for v, esperado in casos.items():
+            self.assertEqual(parse_brl(v), esperado, v)
+
+    def test_ponto_com_tres_digitos_e_milhar(self):
+        self.assertEqual(parse_brl("1.234"), 1234.0)
+        self.assertEqual(parse_brl("12.345"), 12345.0)
+        self.assertEqual(parse_brl("R$ 12.345"), 12345.0)
+
+    def test_preco_num_do_legado(self):
+        self.assertEqual(db_legacy._preco_num("1.234"), 1234.0)
+        self.assertEqual(db_legacy._preco_num("12.345"), 12345.0)
+        self.assertEqual(db_legacy._preco_num("12,50"), 12.5)
+        self.assertIsNone(db_legacy._preco_num("x"))
+
+    def test_to_money_da_importacao(self):
+        self.assertEqual(imports.to_money("1.234"), 1234.0)
+        self.assertEqual(imports.to_money("12.345"), 12345.0)
+        self.assertEqual(imports.to_money("R$ 1.234,56"), 1234.56)
+        self.assertEqual(imports.to_money("1234.56"), 1234.56)
+        self.assertIsNone(imports.to_money(True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# === tests/test_pncp_sync.py ===
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+from services import pncp
+from services.pncp_client import PNCPClient
+
+
+class _FakeClient(PNCPClient):
+    """PNCP em memória: filtra por dataInicial/dataFinal e ordena por publicação DESC."""
+
+    def __init__(self, items):
+        super().__init__("http://pncp.invalido", cache=False, rps=1000)
+        self.items = sorted(items, key=lambda r: r["dataPublicacao"], reverse=True)
+        self.calls = []
+
+    def _get(self, path, params, stats=None, before_network=None):
+        self.calls.append(dict(params))
+        ini, fim = params.get("dataInicial"), params.get("dataFinal")
+        rows = [r for r in self.items
+                if (not ini or r["dataPublicacao"] >= ini) and (not fim or r["dataPublicacao"] <= fim)]
+        p, n = params["page"], params["size"]
+        return 200, {"content": rows[p * n:(p + 1) * n]}
+
+
+def _items(n, por_dia, hoje):
+    # n publicações, `por_dia` por dia, a partir de hoje para trás
+    return [{"id": f"x{i}", "dataPublicacao": (hoje - dt.timedelta(days=i // por_dia)).isoformat(),
+             "objeto": f"item {i}"} for i in range(n)]
+
+
+class SyncIncrementalTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.saved = []
+        patches = {
+            "SYNC_STATE_PATH": os.path.join(tmp.name, "sync.json"),
+            "LOG_PATH": os.path.join(tmp.name, "job.log"),
+            "_upsert": lambda rows: self.saved.extend(str(r["id"]) for r in rows) or [str(r["id"]) for r in rows],
+            "_client": None,
+        }
+        for k, v in patches.items():
+            self.addCleanup(setattr, pncp, k, getattr(pncp, k))
+            setattr(pncp, k, v)
+        self.hoje = dt.date.today()
+
+    def test_sem_marca_com_mais_de_mil_resultados(self):
+        # 1500 publicações em 15 dias: passa de MAX_PAGES x PAGE_SIZE numa janela só
+        pncp._client = client = _FakeClient(_items(1500, 100, self.hoje))
+        r = pncp.sync_incremental({})
+        self.assertTrue(r["completa"])
+        self.assertEqual(r["marca"], self.hoje.isoformat())
+        self.assertEqual(r["novas"], 1500)
+        self.assertEqual(len(set(self.saved)), 1500)
+        self.assertIsNotNone(client.calls[0].get("dataInicial"))   # janela inicial, não o histórico
+
+        # dia seguinte: só a sobreposição é pedida e nada volta como novo
+        client.calls.clear()
+        r = pncp.sync_incremental({})
+        self.assertEqual(r["novas"], 0)
+        self.assertEqual(client.calls[0]["dataInicial"], (self.hoje - dt.timedelta(days=1)).isoformat())
+        self.assertEqual(r["obtidas"], 200)   # hoje + ontem, não os 15 dias
+
+    def test_sem_marca_um_dia_alem_do_limite(self):
+        # 1200 publicações no mesmo dia: não dá para fatiar, mas a marca nasce mesmo assim
+        pncp._client = _FakeClient(_items(1200, 1200, self.hoje))
+        r = pncp.sync_incremental({})
+        self.assertFalse(r["completa"])
+        self.assertEqual(r["marca"], self.hoje.isoformat())
+        self.assertEqual(r["novas"], pncp.MAX_PAGES * pncp.PAGE_SIZE)
+
+    def test_sem_onde_gravar_mantem_marca(self):
+        pncp._upsert = lambda rows: None
+        pncp._client = _FakeClient(_items(30, 10, self.hoje))
+        r = pncp.sync_incremental({})
+        self.assertFalse(r["completa"])
+        self.assertIsNone(r["marca"])
+        self.assertEqual(r["novas"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -103,6 +103,57 @@ def check_db_funcs(dbmod):
         present[area] = {f: hasattr(dbmod, f) for f in funcs}
     return present
 
+RX_DB_ATTR = re.compile(r"(?<![\w/.])db\.([A-Za-z_]\w*)")
+RX_NAME_STR = re.compile(r"[\"']([a-z][a-z0-9_]*)[\"']")
+
+def scan_compat(dbmod):
+    """
+    Varre pages/, services/ e components/ atrás de nomes que só existem via
+    compat de services.db: aliases (COMPAT_ALIASES), nomes do legado e
+    nomes sondados (db.x / "x" em listas de hasattr) que não existem.
+    """
+    aliases = getattr(dbmod, "COMPAT_ALIASES", {}) or {}
+    native = {n for n in vars(dbmod) if not n.startswith("_")}
+    found = {}
+    for folder in ("pages", "services", "components"):
+        for path in sorted((ROOT / folder).glob("*.py")):
+            if path.name in ("db.py", "db_legacy.py"):
+                continue
+            code = read(path)
+            rel = path.relative_to(ROOT).as_posix()
+            names = set(RX_DB_ATTR.findall(code)) - {"py"}   # "db.py" em comentários
+            names |= {n for n in RX_NAME_STR.findall(code) if n in aliases}
+            for n in names:
+                if n.startswith("_"):
+                    continue        # helpers privados de services.db não são compat
+                if n in aliases:
+                    kind = f"alias -> {aliases[n]}"
+                elif n in native:
+                    continue
+                elif hasattr(dbmod, n):
+                    kind = "legado (db_legacy)"
+                else:
+                    kind = "inexistente"
+                found.setdefault((n, kind), []).append(rel)
+    return found
+
+def sql_profile(top=15):
+    """
+    Resumo do perfil SQL (services/sqlprof.py): o logs/sql_stats.json gravado
+    ao fim de uma execução com SOS_SQL_PROFILE=1 ou, se o próprio audit roda
+    com o perfil ligado, as estatísticas ao vivo.
+    """
+    try:
+        from services import sqlprof
+    except Exception:
+        return None, []
+    data = sqlprof.load_dump()
+    if data and data.get("stats"):
+        return f"{sqlprof.STATS_FILE} ({data.get('gerado_em', '?')})", data["stats"][:top]
+    if sqlprof.ENABLED:
+        return "execução atual", sqlprof.stats(top=top)
+    return None, []
+
 def main():
     report = []
     report.append(f"# Auditoria — {ROOT.name}\n")
@@ -145,6 +196,30 @@ def main():
             for fname, ok in funcs.items():
                 report.append(f"- {fname}: {'OK' if ok else 'FALTA'}")
 
+        report.append("\n## services.db — compat ainda em uso\n")
+        found = scan_compat(dbmod)
+        if not found:
+            report.append("- nenhum alias/legado referenciado.")
+        for (name, kind), files in sorted(found.items()):
+            report.append(f"- {name} [{kind}]: {', '.join(files)}")
+        report.append("\n(Uso em execução: SOS_DB_COMPAT_REPORT=1 ou services.db.compat_report().)")
+
+    report.append("\n## SQL (perfil)\n")
+    origem, rows = sql_profile()
+    if not rows:
+        report.append("- sem dados. Rode o app com SOS_SQL_PROFILE=1 (lentas: SOS_SQL_SLOW_MS, "
+                      "padrão 100) e gere o relatório de novo.")
+    else:
+        report.append(f"Fonte: {origem}\n")
+        report.append("| chamadas | total ms | p95 ms | máx ms | SQL |")
+        report.append("|---:|---:|---:|---:|---|")
+        for r in rows:
+            sql = str(r.get("sql", "")).replace("|", "\\|")
+            if len(sql) > 160:
+                sql = sql[:157] + "..."
+            report.append(f"| {r.get('calls', 0)} | {r.get('total_ms', 0):.1f} | "
+                          f"{r.get('p95_ms', 0):.1f} | {r.get('max_ms', 0):.1f} | `{sql}` |")
+
     out = ROOT / "audit_report.md"
     out.write_text("\n".join(report), encoding="utf-8")
     print(f"Relatório gerado em: {out}")